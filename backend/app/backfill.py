@@ -0,0 +1,291 @@
+"""
+Parallel, resumable historical backfill.
+
+A job covers a wall-clock range. On its first run the range is mapped to blocks and split into
+BACKFILL_RANGE_BLOCKS-sized sub-ranges, which are processed concurrently on a thread pool.
+Every sub-range stores a resume cursor (next_block) that is advanced after each committed page,
+so a restarted instance continues where the previous one stopped. A lease per job makes sure
+only one instance runs a job at a time.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import coordination, database, models, tasks
+from .config import settings
+from .klines import get_kline_store
+
+logger = logging.getLogger("background_tasks")
+
+ACTIVE_STATUSES = ("pending", "running")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a range worker when its job has been cancelled.
+    """
+
+
+def job_lease_name(job_id: int) -> str:
+    return f"backfill_job:{job_id}"
+
+
+def split_block_range(start_block: int, end_block: int, range_blocks: int) -> List[tuple]:
+    """
+    Split [start_block, end_block] into consecutive inclusive sub-ranges of at most range_blocks blocks.
+    """
+    range_blocks = max(1, range_blocks)
+    return [
+        (first, min(first + range_blocks - 1, end_block))
+        for first in range(start_block, end_block + 1, range_blocks)
+    ]
+
+
+def create_job(db: Session, start_time: datetime, end_time: datetime, pool: str = None) -> models.BackfillJob:
+    """
+    Record a new pending backfill job for a pool (POOL_ADDRESS if None).
+    """
+    job = models.BackfillJob(start_time=start_time, end_time=end_time, status="pending",
+                             pool_address=(pool or settings.POOL_ADDRESS).lower())
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int) -> Optional[models.BackfillJob]:
+    return db.query(models.BackfillJob).filter(models.BackfillJob.id == job_id).first()
+
+
+def cancel_job(db: Session, job_id: int) -> Optional[models.BackfillJob]:
+    """
+    Mark a job as cancelled; its range workers stop after their current page.
+    """
+    job = get_job(db, job_id)
+    if job is not None and job.status not in TERMINAL_STATUSES:
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        db.refresh(job)
+    return job
+
+
+def job_status(db: Session, job: models.BackfillJob) -> dict:
+    """
+    Return progress and throughput of a job, aggregated over its ranges.
+    """
+    ranges = db.query(models.BackfillRange).filter(models.BackfillRange.job_id == job.id).all()
+    blocks_total = sum(r.end_block - r.start_block + 1 for r in ranges)
+    blocks_done = sum(min(r.next_block, r.end_block + 1) - r.start_block for r in ranges)
+    rows_inserted = sum(r.rows_inserted for r in ranges)
+    elapsed = None
+    if job.started_at is not None:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "start_time": job.start_time,
+        "end_time": job.end_time,
+        "start_block": job.start_block,
+        "end_block": job.end_block,
+        "pool_address": job.pool_address or settings.POOL_ADDRESS,
+        "ranges_total": len(ranges),
+        "ranges_completed": sum(1 for r in ranges if r.status == "completed"),
+        "blocks_total": blocks_total,
+        "blocks_done": blocks_done,
+        "progress": blocks_done / blocks_total if blocks_total else 0.0,
+        "rows_fetched": sum(r.rows_fetched for r in ranges),
+        "rows_inserted": rows_inserted,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": rows_inserted / elapsed if elapsed else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error,
+    }
+
+
+def _is_cancelled(db: Session, job_id: int) -> bool:
+    status = db.query(models.BackfillJob.status).filter(models.BackfillJob.id == job_id).scalar()
+    return status == "cancelled"
+
+
+def _plan_job(db: Session, job: models.BackfillJob):
+    """
+    Resolve the job's block range and create its sub-ranges (only on the first run).
+    """
+    if job.start_block is None or job.end_block is None:
+        job.start_block, job.end_block = tasks.resolve_block_range(job.start_time, job.end_time)
+    has_ranges = db.query(func.count(models.BackfillRange.id)).filter(models.BackfillRange.job_id == job.id).scalar()
+    if not has_ranges:
+        for first, last in split_block_range(job.start_block, job.end_block, settings.BACKFILL_RANGE_BLOCKS):
+            db.add(models.BackfillRange(job_id=job.id, start_block=first, end_block=last, next_block=first,
+                                        status="pending", rows_fetched=0, rows_inserted=0))
+    db.commit()
+
+
+def _prepare_prices(job: models.BackfillJob):
+    """
+    Load the ETH/USDT candles of the job's time range, so that fees are priced at block time
+    without a network call per page. Returns the price lookup for process_transactions.
+    """
+    store = get_kline_store()
+    start_ts, end_ts = int(job.start_time.timestamp()), int(job.end_time.timestamp())
+    try:
+        if not store.ensure_range(start_ts, end_ts, fetch=settings.BACKFILL_FETCH_KLINES):
+            logger.warning(f"Backfill job {job.id}: ETH price candles are incomplete; "
+                           f"transactions in missing minutes use the current price.")
+    except Exception as e:
+        logger.error(f"Backfill job {job.id}: could not load ETH price candles: {e}")
+    return store.price_at
+
+
+def run_range(job_id: int, range_id: int, eth_price, holder: str, price_at=None):
+    """
+    Process one block sub-range page by page, committing the resume cursor after every page.
+    A page whose insert fails marks the range failed with its cursor still before that page.
+    """
+    db = database.SessionLocal()
+    try:
+        block_range = db.query(models.BackfillRange).filter(models.BackfillRange.id == range_id).one()
+        job = get_job(db, job_id)
+        start_ts = int(job.start_time.timestamp())
+        end_ts = int(job.end_time.timestamp())
+        if block_range.next_block > block_range.end_block:
+            block_range.status = "completed"
+            db.commit()
+            return
+        block_range.status = "running"
+        db.commit()
+        pool = job.pool_address or settings.POOL_ADDRESS
+        for transactions in tasks.iter_block_pages(block_range.next_block, block_range.end_block, pool=pool):
+            if _is_cancelled(db, job_id):
+                raise JobCancelled()
+            in_range = [txn for txn in transactions if start_ts <= int(txn.get("timeStamp", 0)) <= end_ts]
+            # The range belongs to this job alone, so no hash sharding is applied.
+            inserted, _ = tasks.process_transactions(in_range, eth_price, db, sharded=False, price_at=price_at)
+            # The last block may continue on the next page, so it is fetched again on resume.
+            block_range.next_block = max(block_range.next_block, int(transactions[-1].get("blockNumber", 0)))
+            block_range.rows_fetched += len(transactions)
+            block_range.rows_inserted += inserted
+            db.commit()
+            coordination.acquire_lease(db, job_lease_name(job_id), holder, settings.BACKFILL_LEASE_TTL)
+        block_range.next_block = block_range.end_block + 1
+        block_range.status = "completed"
+        db.commit()
+    except JobCancelled:
+        db.rollback()
+        db.query(models.BackfillRange).filter(models.BackfillRange.id == range_id).update(
+            {"status": "cancelled"}, synchronize_session=False)
+        db.commit()
+        raise
+    except Exception:
+        db.rollback()
+        db.query(models.BackfillRange).filter(models.BackfillRange.id == range_id).update(
+            {"status": "failed"}, synchronize_session=False)
+        db.commit()
+        raise
+    finally:
+        db.close()
+
+
+def run_job(job_id: int):
+    """
+    Run (or resume) a backfill job to completion on this instance, unless another instance
+    holds its lease.
+    """
+    holder = coordination.worker_identity()
+    db = database.SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None or job.status in TERMINAL_STATUSES:
+            return
+        if not coordination.acquire_lease(db, job_lease_name(job_id), holder, settings.BACKFILL_LEASE_TTL):
+            logger.info(f"Backfill job {job_id} is running on another instance.")
+            return
+        try:
+            _plan_job(db, job)
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = f"Could not resolve block range: {e}"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            logger.error(f"Backfill job {job_id} failed: {job.error}")
+            return
+        job.status = "running"
+        job.started_at = job.started_at or datetime.utcnow()
+        db.commit()
+
+        range_ids = [
+            range_id for (range_id,) in db.query(models.BackfillRange.id)
+            .filter(models.BackfillRange.job_id == job_id)
+            .filter(models.BackfillRange.status != "completed")
+            .order_by(models.BackfillRange.start_block)
+        ]
+        price_at = _prepare_prices(job)
+        # Only used for transactions whose minute has no candle.
+        eth_price = tasks.fetch_eth_price()
+        errors = []
+        cancelled = False
+        with ThreadPoolExecutor(max_workers=max(1, settings.BACKFILL_WORKERS),
+                                thread_name_prefix=f"backfill-{job_id}") as pool:
+            futures = [pool.submit(run_range, job_id, range_id, eth_price, holder, price_at) for range_id in range_ids]
+            for future in futures:
+                try:
+                    future.result()
+                except JobCancelled:
+                    cancelled = True
+                except Exception as e:
+                    errors.append(str(e))
+
+        db.expire_all()
+        job = get_job(db, job_id)
+        if cancelled or job.status == "cancelled":
+            job.status = "cancelled"
+        elif errors:
+            job.status = "failed"
+            job.error = "; ".join(errors[:5])
+        else:
+            job.status = "completed"
+        job.finished_at = job.finished_at or datetime.utcnow()
+        db.commit()
+        coordination.release_lease(db, job_lease_name(job_id), holder)
+        logger.info(f"Backfill job {job_id} finished with status {job.status}.")
+    except Exception as e:
+        logger.error(f"Error in backfill job {job_id}: {e}")
+    finally:
+        db.close()
+
+
+def start_job(job_id: int) -> threading.Thread:
+    """
+    Run a backfill job on a background thread.
+    """
+    thread = threading.Thread(target=run_job, args=(job_id,), daemon=True, name=f"backfill-job-{job_id}")
+    thread.start()
+    return thread
+
+
+def resume_jobs():
+    """
+    Restart every unfinished job; jobs already running on another instance are skipped by
+    their lease.
+    """
+    db = database.SessionLocal()
+    try:
+        job_ids = [
+            job_id for (job_id,) in db.query(models.BackfillJob.id)
+            .filter(models.BackfillJob.status.in_(ACTIVE_STATUSES))
+        ]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        logger.info(f"Resuming backfill job {job_id}.")
+        start_job(job_id)
@@ -0,0 +1,238 @@
+"""
+Timestamp-to-block index.
+
+Block timestamps increase strictly with the block number, so a sorted array of known
+(block_number, timestamp) samples brackets every timestamp between two known blocks. The samples
+are kept in memory as two parallel arrays and persisted in the block_timestamps table. They come
+from two places: every ingested page contributes the blocks it saw, and lookups that are not
+answered by the samples alone probe block headers over JSON-RPC. Every worker re-reads the table
+every BLOCK_INDEX_REFRESH_INTERVAL seconds, so it also gets the samples the other workers saw.
+
+A lookup binary-searches the samples for the bracket around the timestamp. If the bracketing
+blocks are adjacent, the answer is exact without any network call; otherwise the bracket is
+narrowed by interpolation search over block headers (falling back to bisection when the
+interpolation does not halve the bracket), and every probed header is added to the index.
+"""
+import bisect
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from . import crud, database, models
+from .config import settings
+from .rpc import get_rpc_client
+
+logger = logging.getLogger("background_tasks")
+
+# (block_number, timestamp)
+Sample = Tuple[int, int]
+
+
+class BlockIndex:
+    """
+    Sorted (block_number, timestamp) samples with exact timestamp-to-block lookups.
+    """
+
+    def __init__(self, fetch_header: Optional[Callable[[object], Sample]] = None, spacing: int = 0,
+                 refresh_interval: float = 0, clock: Callable[[], float] = time.monotonic):
+        self.fetch_header = fetch_header or (lambda block: get_rpc_client().get_block_header(block))
+        # Samples from ingested pages closer than this many blocks to a known sample are dropped.
+        self.spacing = spacing
+        # Seconds after which the persisted samples are read again (0: only once).
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.blocks = array("q")
+        self.timestamps = array("q")
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    @property
+    def stale(self) -> bool:
+        """
+        Whether the persisted samples have not been read yet, or not within refresh_interval.
+        """
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            return True
+        return bool(self.refresh_interval) and self.clock() - loaded_at >= self.refresh_interval
+
+    def load(self, db=None):
+        """
+        Read the persisted samples when the index is stale, through db if given (e.g. the sync
+        session of an AsyncSession in run_sync) or a new session. Async routes call this off the
+        event loop before block_bounds, which then only reads memory.
+        """
+        if not self.stale:
+            return
+        session = db or database.SessionLocal()
+        try:
+            rows = (
+                session.query(models.BlockTimestamp.block_number, models.BlockTimestamp.time_stamp)
+                .order_by(models.BlockTimestamp.block_number)
+                .all()
+            )
+        finally:
+            if db is None:
+                session.close()
+        with self._lock:
+            # Samples already known are skipped, so a concurrent refresh does no harm.
+            for block_number, time_stamp in rows:
+                self._insert(block_number, time_stamp)
+            self._loaded_at = self.clock()
+
+    def _insert(self, block_number: int, time_stamp: int, spacing: int = 0) -> bool:
+        """
+        Insert a sample, keeping both arrays sorted. Must be called with the lock held.
+        """
+        position = bisect.bisect_left(self.blocks, block_number)
+        if position < len(self.blocks) and self.blocks[position] == block_number:
+            return False
+        if spacing and (
+            (position > 0 and block_number - self.blocks[position - 1] < spacing)
+            or (position < len(self.blocks) and self.blocks[position] - block_number < spacing)
+        ):
+            return False
+        self.blocks.insert(position, block_number)
+        self.timestamps.insert(position, time_stamp)
+        return True
+
+    def add_samples(self, samples: Iterable[Sample], spacing: int = 0) -> int:
+        """
+        Add samples to the index and persist the new ones. Returns the number of new samples.
+        """
+        self.load()
+        with self._lock:
+            new = [
+                {"block_number": block_number, "time_stamp": time_stamp}
+                for block_number, time_stamp in samples
+                if self._insert(block_number, time_stamp, spacing)
+            ]
+        if new:
+            db = database.SessionLocal()
+            try:
+                db.execute(crud.insert_ignore(db, models.BlockTimestamp.__table__), new)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Could not persist {len(new)} block timestamps: {e}")
+            finally:
+                db.close()
+        return len(new)
+
+    def record_transactions(self, transactions: List[dict]):
+        """
+        Add the first and last block of an upstream page (Etherscan rows) to the index.
+        """
+        if not transactions:
+            return
+        samples = []
+        for txn in (transactions[0], transactions[-1]):
+            try:
+                samples.append((int(txn["blockNumber"]), int(txn["timeStamp"])))
+            except (KeyError, TypeError, ValueError):
+                continue
+        try:
+            self.add_samples(samples, self.spacing)
+        except Exception as e:
+            logger.error(f"Could not record block timestamps: {e}")
+
+    def bracket(self, timestamp: int) -> Tuple[Optional[Sample], Optional[Sample]]:
+        """
+        Return the known samples around timestamp: the last one at or before it and the first
+        one after it (None where no such sample is known).
+        """
+        self.load()
+        with self._lock:
+            position = bisect.bisect_right(self.timestamps, timestamp)
+            lower = (self.blocks[position - 1], self.timestamps[position - 1]) if position > 0 else None
+            upper = (self.blocks[position], self.timestamps[position]) if position < len(self.blocks) else None
+        return lower, upper
+
+    def block_bounds(self, start_time: Optional[datetime], end_time: Optional[datetime]):
+        """
+        Return (min_block, max_block) such that every block mined in [start_time, end_time] lies
+        within them, using the known samples only (no network calls). Either bound is None when
+        no sample limits it.
+        """
+        min_block = max_block = None
+        if start_time is not None:
+            lower, _ = self.bracket(int(start_time.timestamp()))
+            if lower is not None:
+                min_block = lower[0]
+        if end_time is not None:
+            _, upper = self.bracket(int(end_time.timestamp()))
+            if upper is not None:
+                max_block = upper[0] - 1
+        return min_block, max_block
+
+    def _search(self, timestamp: int) -> Sample:
+        """
+        Return the sample of the last block mined at or before timestamp.
+        """
+        lower, upper = self.bracket(timestamp)
+        probes = []
+        try:
+            if lower is None:
+                # The genesis block carries timestamp 0.
+                lower = (0, 0)
+            if upper is None:
+                head = self.fetch_header("latest")
+                probes.append(head)
+                if head[1] <= timestamp:
+                    return head
+                upper = head
+            bisect_next = False
+            while upper[0] - lower[0] > 1:
+                width = upper[0] - lower[0]
+                if bisect_next:
+                    guess = lower[0] + width // 2
+                else:
+                    guess = lower[0] + (timestamp - lower[1]) * width // (upper[1] - lower[1])
+                guess = min(max(guess, lower[0] + 1), upper[0] - 1)
+                probe = self.fetch_header(guess)
+                probes.append(probe)
+                if probe[1] <= timestamp:
+                    lower = probe
+                else:
+                    upper = probe
+                bisect_next = upper[0] - lower[0] > width // 2
+            return lower
+        finally:
+            if probes:
+                self.add_samples(probes)
+
+    def block_before(self, timestamp: int) -> int:
+        """
+        Return the number of the last block mined at or before the UNIX timestamp.
+        """
+        return self._search(timestamp)[0]
+
+    def block_after(self, timestamp: int) -> int:
+        """
+        Return the number of the first block mined at or after the UNIX timestamp.
+        """
+        block_number, time_stamp = self._search(timestamp)
+        return block_number if time_stamp == timestamp else block_number + 1
+
+
+_index: Optional[BlockIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_block_index() -> BlockIndex:
+    """
+    Return the process-wide block index, creating it on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BlockIndex(spacing=settings.BLOCK_INDEX_SPACING,
+                                    refresh_interval=settings.BLOCK_INDEX_REFRESH_INTERVAL)
+    return _index
@@ -0,0 +1,249 @@
+"""
+Conversion of the transactions table to the compact schema (COMPACT_SCHEMA=1, see app.sqltypes).
+
+    python -m app.compact status             # schema, rows and sizes of the transactions tables
+    python -m app.compact copy               # copy rows into transactions_compact (resumable)
+    python -m app.compact swap               # catch up, then swap the tables and build the indexes
+    python -m app.compact migrate            # copy + swap
+    python -m app.compact drop-legacy        # drop the old table once the compact one is in use
+
+The copy runs in id order, one transaction per batch, and resumes after the highest id already
+copied, so it can run (and be interrupted) while the backends keep ingesting. Ids are kept, so
+pagination cursors stay valid. Stop the backends before swap: it copies the rows stored since,
+carries over swap prices decoded after their row was copied, renames transactions to
+transactions_legacy and transactions_compact to transactions, and builds the indexes. Then
+restart the backends with COMPACT_SCHEMA=1. The legacy table is kept (without its secondary
+indexes) until drop-legacy, so a rollback is a rename back.
+"""
+import argparse
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import Column, MetaData, Table, bindparam, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import database, migrations, models
+from .config import settings
+from .sqltypes import COMPACT_TYPES, TransactionTypes
+
+logger = logging.getLogger("background_tasks")
+
+TABLE = "transactions"
+SHADOW_TABLE = "transactions_compact"
+LEGACY_TABLE = "transactions_legacy"
+# Columns whose type differs between the schemas, by TransactionTypes field.
+TYPED_COLUMNS = {
+    "tx_hash": "tx_hash",
+    "from_address": "address",
+    "to_address": "address",
+    "pool_address": "address",
+    "fee_eth": "fee_eth",
+    "fee_usdt": "fee_usdt",
+}
+
+
+def transaction_table(metadata: MetaData, name: str, types: TransactionTypes) -> Table:
+    """
+    Return a Core table with the columns of models.Transaction (without indexes) and the given
+    column types.
+    """
+    columns = []
+    for column in models.Transaction.__table__.columns:
+        column_type = getattr(types, TYPED_COLUMNS[column.name]) if column.name in TYPED_COLUMNS else column.type
+        server_default = None
+        if column.server_default is not None:
+            # created_at defaults to the SQL expression CURRENT_TIMESTAMP, not to a string literal.
+            server_default = text(column.server_default.arg)
+        columns.append(Column(column.name, column_type, primary_key=column.primary_key,
+                              nullable=column.nullable, server_default=server_default))
+    return Table(name, metadata, *columns)
+
+
+def declared_type(connection: Connection, table: str, column: str) -> Optional[str]:
+    """
+    Return the declared SQL type of a column (e.g. "BINARY(32)"), or None if it does not exist.
+    """
+    if connection.dialect.name == "sqlite":
+        # The SQLite dialect reflects BINARY(n) as NUMERIC; read the declaration itself.
+        rows = connection.execute(text(f"PRAGMA table_info({table})")).fetchall()
+        types = {row[1]: row[2] for row in rows}
+    else:
+        types = {info["name"]: str(info["type"]) for info in inspect(connection).get_columns(table)}
+    declared = types.get(column)
+    return declared.upper() if declared is not None else None
+
+
+def is_compact(connection: Connection, table: str = TABLE) -> bool:
+    declared = declared_type(connection, table, "tx_hash") or ""
+    return declared.startswith(("BINARY", "VARBINARY", "BLOB"))
+
+
+def check_schema(engine: Engine):
+    """
+    Raise RuntimeError if COMPACT_SCHEMA does not match the schema of the transactions table, since
+    every query would fail on values of the other representation.
+    """
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(TABLE):
+            return
+        compact = is_compact(connection)
+    if compact != settings.COMPACT_SCHEMA:
+        raise RuntimeError(
+            f"The transactions table uses the {'compact' if compact else 'string'} schema but "
+            f"COMPACT_SCHEMA={'1' if settings.COMPACT_SCHEMA else '0'}; see python -m app.compact.")
+
+
+def _max_id(connection: Connection, table: Table) -> int:
+    return connection.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+
+
+def copy_rows(engine: Engine, batch_size: int = 5000) -> int:
+    """
+    Copy the rows of the transactions table that are not in transactions_compact yet, in id order.
+    Returns the number of copied rows.
+    """
+    with engine.begin() as connection:
+        if is_compact(connection):
+            raise RuntimeError("The transactions table already uses the compact schema.")
+    metadata = MetaData()
+    # Reflected, so rows are read as stored, whatever COMPACT_SCHEMA says.
+    source = Table(TABLE, metadata, autoload_with=engine)
+    target = transaction_table(metadata, SHADOW_TABLE, COMPACT_TYPES)
+    target.create(bind=engine, checkfirst=True)
+    copied = 0
+    while True:
+        with engine.begin() as connection:
+            last_id = _max_id(connection, target)
+            rows = connection.execute(
+                source.select().where(source.c.id > last_id).order_by(source.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            connection.execute(target.insert(), [
+                # Tables from before 0003_pools have no pool column: all of their rows are the default pool's.
+                dict({column.name: row.get(column.name) for column in target.columns},
+                     pool_address=row.get("pool_address") or settings.POOL_ADDRESS)
+                for row in rows
+            ])
+        copied += len(rows)
+        logger.info(f"Copied {copied} transactions to {SHADOW_TABLE} (up to id {rows[-1]['id']}).")
+    return copied
+
+
+def sync_swap_prices(connection: Connection, source: Table, target: Table, batch_size: int = 5000) -> int:
+    """
+    Copy swap prices decoded after their row was copied. Returns the number of updated rows.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in connection.execute(
+            select(target.c.id).where(target.c.swap_price.is_(None)).where(target.c.id > last_id)
+            .order_by(target.c.id).limit(batch_size))]
+        if not ids:
+            return updated
+        last_id = ids[-1]
+        prices = connection.execute(
+            select(source.c.id, source.c.swap_price).where(source.c.id.in_(ids)).where(source.c.swap_price.isnot(None))
+        ).fetchall()
+        if prices:
+            connection.execute(
+                target.update().where(target.c.id == bindparam("b_id")).values(swap_price=bindparam("b_swap_price")),
+                [{"b_id": transaction_id, "b_swap_price": swap_price} for transaction_id, swap_price in prices],
+            )
+        updated += len(prices)
+
+
+def _drop_indexes(connection: Connection, table: str):
+    for index in inspect(connection).get_indexes(table):
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"DROP INDEX {index['name']} ON {table}"))
+        else:
+            connection.execute(text(f"DROP INDEX {index['name']}"))
+
+
+def swap_tables(engine: Engine, batch_size: int = 5000):
+    """
+    Copy the remaining rows, then make transactions_compact the transactions table (with all
+    indexes) and keep the old one as transactions_legacy.
+    """
+    copy_rows(engine, batch_size)
+    metadata = MetaData()
+    source = Table(TABLE, metadata, autoload_with=engine)
+    target = transaction_table(metadata, SHADOW_TABLE, COMPACT_TYPES)
+    with engine.begin() as connection:
+        synced = sync_swap_prices(connection, source, target, batch_size)
+        logger.info(f"Carried over {synced} swap prices decoded during the copy.")
+        # Index names are global in SQLite, and the legacy table is an archive from now on.
+        _drop_indexes(connection, TABLE)
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"RENAME TABLE {TABLE} TO {LEGACY_TABLE}, {SHADOW_TABLE} TO {TABLE}"))
+        else:
+            connection.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}"))
+            connection.execute(text(f"ALTER TABLE {SHADOW_TABLE} RENAME TO {TABLE}"))
+        for index in models.Transaction.__table__.indexes:
+            index.create(bind=connection)
+        migrations.add_transaction_list_indexes(connection)
+        migrations.add_pool_index(connection)
+    logger.info(f"{TABLE} now uses the compact schema; restart the backends with COMPACT_SCHEMA=1.")
+
+
+def drop_legacy(engine: Engine):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {LEGACY_TABLE}"))
+
+
+def table_sizes(engine: Engine, table: str) -> Optional[Dict[str, int]]:
+    """
+    Return the data and index bytes of a table, or None if the database cannot tell (SQLite
+    without the dbstat table).
+    """
+    with engine.connect() as connection:
+        if connection.dialect.name == "mysql":
+            row = connection.execute(text(
+                "SELECT data_length, index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :table"), {"table": table}).first()
+            return {"data_bytes": int(row[0]), "index_bytes": int(row[1])} if row else None
+        if connection.dialect.name == "sqlite":
+            try:
+                sizes = dict(connection.execute(text(
+                    "SELECT m.type, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+                    "WHERE m.tbl_name = :table GROUP BY m.type"), {"table": table}).fetchall())
+            except Exception:
+                return None
+            return {"data_bytes": int(sizes.get("table", 0)), "index_bytes": int(sizes.get("index", 0))}
+    return None
+
+
+def status(engine: Engine) -> dict:
+    result = {}
+    with engine.connect() as connection:
+        tables = inspect(connection).get_table_names()
+        for table in (TABLE, SHADOW_TABLE, LEGACY_TABLE):
+            if table not in tables:
+                continue
+            rows = connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            result[table] = {"schema": "compact" if is_compact(connection, table) else "string", "rows": rows}
+    for table in result:
+        result[table]["sizes"] = table_sizes(engine, table)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the transactions table to the compact schema.")
+    parser.add_argument("command", choices=["status", "copy", "swap", "migrate", "drop-legacy"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+    engine = database.engine
+    if args.command in ("copy", "migrate"):
+        print(f"Copied {copy_rows(engine, args.batch_size)} transactions.")
+    if args.command in ("swap", "migrate"):
+        swap_tables(engine, args.batch_size)
+    if args.command == "drop-legacy":
+        drop_legacy(engine)
+    for table, info in status(engine).items():
+        print(f"{table}: {info}")
+
+
+if __name__ == "__main__":
+    main()
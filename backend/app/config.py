@@ -8,6 +8,17 @@ class Settings:
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', 'password')
     DB_NAME = os.getenv('DB_NAME', 'uniswap')
+    # Connection pool of each engine (the sync one of background work, the async one of the API
+    # routes): connections kept open, extra connections opened under load, seconds to wait for a
+    # free connection and seconds after which a connection is replaced
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+    # API routes query through an asyncio driver (aiomysql or asyncmy). Without the driver installed,
+    # or with DB_ASYNC=0, they run the sync engine on the threadpool instead
+    DB_ASYNC = os.getenv('DB_ASYNC', '1') == '1'
+    DB_ASYNC_DRIVER = os.getenv('DB_ASYNC_DRIVER', 'aiomysql')
 
     # Etherscan API settings
     ETHERSCAN_API_KEY = os.getenv('ETHERSCAN_API_KEY', '')
@@ -15,16 +26,162 @@ class Settings:
 
     # Binance API URL for fetching ETH/USDT price
     BINANCE_API_URL = "https://api.binance.com/api/v3/ticker/price?symbol=ETHUSDT"
+    # Binance klines endpoint for the historical ETH/USDT price store
+    BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+
+    # ETH price feed: seconds between background refreshes, maximum age of the price used for
+    # ingestion before it is refreshed synchronously, and whether workers share the latest
+    # price through the database
+    PRICE_REFRESH_INTERVAL = float(os.getenv('PRICE_REFRESH_INTERVAL', '10'))
+    PRICE_MAX_AGE = float(os.getenv('PRICE_MAX_AGE', '60'))
+    PRICE_SHARED = os.getenv('PRICE_SHARED', '1') == '1'
+
+    # Upstream HTTP client settings: retries with jittered exponential backoff and per-endpoint timeouts
+    UPSTREAM_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', '4'))
+    UPSTREAM_BACKOFF_BASE = float(os.getenv('UPSTREAM_BACKOFF_BASE', '0.5'))
+    UPSTREAM_BACKOFF_MAX = float(os.getenv('UPSTREAM_BACKOFF_MAX', '10'))
+    UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '10'))
+    # Threads for the blocking upstream calls of API routes (Infura receipts of swap price lookups,
+    # and the update of the decoded prices), kept apart from the threadpool and the event loop so
+    # slow upstreams cannot hold up the other requests
+    UPSTREAM_THREADS = int(os.getenv('UPSTREAM_THREADS', '32'))
+    ETHERSCAN_TIMEOUT = float(os.getenv('ETHERSCAN_TIMEOUT', '10'))
+    BINANCE_TIMEOUT = float(os.getenv('BINANCE_TIMEOUT', '5'))
+
+    # Etherscan calls per second (and burst size) shared by all workers using the same API key;
+    # the token bucket lives in the database. Set the rate to 0 to disable the limiter.
+    ETHERSCAN_RATE_LIMIT = float(os.getenv('ETHERSCAN_RATE_LIMIT', '5'))
+    ETHERSCAN_RATE_BURST = float(os.getenv('ETHERSCAN_RATE_BURST', '5'))
 
     # Polling interval in seconds for live transaction fetching
     POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', '60'))
 
+    # Live ingestion runs as a staged asyncio pipeline on the server's event loop (set to 0 to use
+    # the plain polling thread instead); workers per stage, queue bound between stages, rows per
+    # database write and seconds between cycles with a single pool (POLL_INTERVAL unless set;
+    # several pools follow the poll scheduler)
+    INGEST_PIPELINE = os.getenv('INGEST_PIPELINE', '1') == '1'
+    PIPELINE_PARSE_WORKERS = int(os.getenv('PIPELINE_PARSE_WORKERS', '1'))
+    PIPELINE_DECODE_WORKERS = int(os.getenv('PIPELINE_DECODE_WORKERS', '4'))
+    PIPELINE_WRITE_WORKERS = int(os.getenv('PIPELINE_WRITE_WORKERS', '1'))
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '8'))
+    PIPELINE_WRITE_BATCH_ROWS = int(os.getenv('PIPELINE_WRITE_BATCH_ROWS', '1000'))
+    PIPELINE_POLL_INTERVAL = float(os.getenv('PIPELINE_POLL_INTERVAL', os.getenv('POLL_INTERVAL', '60')))
+
+    # Block-cursor ingestion: blocks re-read behind the checkpoint on every poll, and how far
+    # behind the chain head the very first poll starts on an empty database
+    CHECKPOINT_OVERLAP_BLOCKS = int(os.getenv('CHECKPOINT_OVERLAP_BLOCKS', '5'))
+    INITIAL_LOOKBACK_BLOCKS = int(os.getenv('INITIAL_LOOKBACK_BLOCKS', '50'))
+    # Etherscan only returns the first 10,000 results (page * offset) of a query
+    ETHERSCAN_RESULT_WINDOW = int(os.getenv('ETHERSCAN_RESULT_WINDOW', '10000'))
+
+    # Timestamp-to-block index: block samples taken from ingested pages are only kept when they are
+    # at least this many blocks away from a known sample (lookup probes are always kept)
+    BLOCK_INDEX_SPACING = int(os.getenv('BLOCK_INDEX_SPACING', '100'))
+    # Seconds after which a worker re-reads the block_timestamps table to pick up the samples
+    # persisted by other workers (0: read it once per process)
+    BLOCK_INDEX_REFRESH_INTERVAL = float(os.getenv('BLOCK_INDEX_REFRESH_INTERVAL', '60'))
+
+    # Historical backfill: block sub-ranges processed in parallel per job, blocks per sub-range and
+    # seconds an instance keeps a job's lease without committing a page
+    BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '4'))
+    BACKFILL_RANGE_BLOCKS = int(os.getenv('BACKFILL_RANGE_BLOCKS', '5000'))
+    BACKFILL_LEASE_TTL = float(os.getenv('BACKFILL_LEASE_TTL', '300'))
+    # Download missing ETH/USDT minute candles from Binance before a backfill (set to 0 when the
+    # candles are imported from CSV files)
+    BACKFILL_FETCH_KLINES = os.getenv('BACKFILL_FETCH_KLINES', '1') == '1'
+
     # Distributed worker configuration (for sharding)
     WORKER_ID = int(os.getenv('WORKER_ID', '0'))
     TOTAL_WORKERS = int(os.getenv('TOTAL_WORKERS', '1'))
 
+    # Worker coordination: "shard" (every worker fetches all pages and keeps its own shard) or
+    # "leader" (the holder of a lease in the database fetches once and queues rows per shard)
+    INGEST_COORDINATION = os.getenv('INGEST_COORDINATION', 'shard')
+    # Seconds a leader keeps the ingest lease without renewing it; renewed every poll cycle
+    LEASE_TTL = float(os.getenv('LEASE_TTL', str(3 * int(os.getenv('POLL_INTERVAL', '60')))))
+    # Number of queued rows a worker claims per batch in "leader" mode
+    QUEUE_BATCH_SIZE = int(os.getenv('QUEUE_BATCH_SIZE', '1000'))
+
+    # Swap price cache of GET /transactions/swapprice: entries, seconds a decoded price is kept and
+    # seconds a failed decode (price 0) is remembered before Infura is asked again
+    SWAP_PRICE_CACHE_SIZE = int(os.getenv('SWAP_PRICE_CACHE_SIZE', '10000'))
+    SWAP_PRICE_CACHE_TTL = float(os.getenv('SWAP_PRICE_CACHE_TTL', '3600'))
+    SWAP_PRICE_NEGATIVE_TTL = float(os.getenv('SWAP_PRICE_NEGATIVE_TTL', '60'))
+
+    # Durable swap price decoding: new transactions are queued in swap_decode_queue instead of being
+    # decoded before the insert; SWAP_DECODE_WORKERS threads drain the queue in batches, retrying
+    # failed receipts with exponential backoff (SWAP_DECODE_RETRY_BASE doubling up to
+    # SWAP_DECODE_RETRY_MAX seconds) until SWAP_DECODE_MAX_ATTEMPTS, when an entry is dead-lettered.
+    # A claimed entry is retried by another decoder after SWAP_DECODE_CLAIM_TTL seconds.
+    SWAP_DECODE_QUEUE = os.getenv('SWAP_DECODE_QUEUE', '1') == '1'
+    SWAP_DECODE_WORKERS = int(os.getenv('SWAP_DECODE_WORKERS', '2'))
+    SWAP_DECODE_BATCH_SIZE = int(os.getenv('SWAP_DECODE_BATCH_SIZE', '50'))
+    SWAP_DECODE_MAX_ATTEMPTS = int(os.getenv('SWAP_DECODE_MAX_ATTEMPTS', '8'))
+    SWAP_DECODE_RETRY_BASE = float(os.getenv('SWAP_DECODE_RETRY_BASE', '5'))
+    SWAP_DECODE_RETRY_MAX = float(os.getenv('SWAP_DECODE_RETRY_MAX', '3600'))
+    SWAP_DECODE_CLAIM_TTL = float(os.getenv('SWAP_DECODE_CLAIM_TTL', '300'))
+    SWAP_DECODE_POLL_INTERVAL = float(os.getenv('SWAP_DECODE_POLL_INTERVAL', '2'))
+
+    # Compact transactions schema: BINARY(32) hashes, BINARY(20) addresses and integer fees (in
+    # 10^-18 units, DECIMAL(38, 0)) instead of hex strings and DECIMAL(30, 18). Convert an existing table with
+    # "python -m app.compact migrate" before enabling it
+    COMPACT_SCHEMA = os.getenv('COMPACT_SCHEMA', '0') == '1'
+
+    # Maximum number of rows per multi-row INSERT statement in the bulk ingest path
+    INSERT_CHUNK_SIZE = int(os.getenv('INSERT_CHUNK_SIZE', '500'))
+
+    # Rows fetched from the server-side cursor and written per response chunk by GET /transactions/export
+    EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', '5000'))
+
+    # Maximum number of hashes per POST /transactions/batch and /transactions/swapprice/batch request
+    BATCH_LOOKUP_MAX_HASHES = int(os.getenv('BATCH_LOOKUP_MAX_HASHES', '5000'))
+
+    # Encode transaction lists (GET /transactions, POST /transactions/batch) straight from the
+    # selected columns with orjson (or json) instead of a pydantic model per row; same wire format
+    FAST_JSON = os.getenv('FAST_JSON', '1') == '1'
+
+    # Read-through cache of GET /summary, GET /transactions/ and GET /transactions/{tx_hash} with
+    # ETags: entries (at most RESPONSE_CACHE_SIZE) are served while the data version in the database
+    # is unchanged; a worker reads the version at most once per RESPONSE_CACHE_VERSION_TTL seconds
+    RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', '1') == '1'
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1000'))
+    RESPONSE_CACHE_VERSION_TTL = float(os.getenv('RESPONSE_CACHE_VERSION_TTL', '1'))
+
+    # Uniswap pools whose swaps are ingested (comma-separated). POOL_ADDRESS (USDC/ETH 0.05%) is the
+    # default pool: transactions stored before pools were tracked belong to it
+    POOL_ADDRESS = os.getenv('POOL_ADDRESS', '0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640').lower()
+    POOL_ADDRESSES = [
+        address.strip().lower() for address in os.getenv('POOL_ADDRESSES', POOL_ADDRESS).split(',') if address.strip()
+    ]
+
+    # Live poll scheduler: pools polled at the same time, and the bounds of the per-pool poll
+    # interval, which halves while polls return at least POOL_BUSY_ROWS rows and doubles while they
+    # return none (quiet pools are polled rarely, busy ones often)
+    POOL_POLL_CONCURRENCY = int(os.getenv('POOL_POLL_CONCURRENCY', '4'))
+    POOL_POLL_MIN_INTERVAL = float(os.getenv('POOL_POLL_MIN_INTERVAL', '12'))
+    POOL_POLL_MAX_INTERVAL = float(os.getenv('POOL_POLL_MAX_INTERVAL', '600'))
+    POOL_BUSY_ROWS = int(os.getenv('POOL_BUSY_ROWS', '100'))
+
+    # Ingest source: "etherscan" (tokentx rows, swap prices decoded from receipts) or "logs" (the
+    # pool's Swap logs via eth_getLogs, with gas and fees from batched receipts). eth_getLogs
+    # windows start at LOGS_WINDOW_BLOCKS blocks, are halved whenever the node's result limit is
+    # hit and doubled (up to LOGS_MAX_WINDOW_BLOCKS) while a window returns fewer than half of
+    # LOGS_TARGET_RESULTS logs
+    INGEST_SOURCE = os.getenv('INGEST_SOURCE', 'etherscan')
+    LOGS_WINDOW_BLOCKS = int(os.getenv('LOGS_WINDOW_BLOCKS', '2000'))
+    LOGS_MAX_WINDOW_BLOCKS = int(os.getenv('LOGS_MAX_WINDOW_BLOCKS', '10000'))
+    LOGS_TARGET_RESULTS = int(os.getenv('LOGS_TARGET_RESULTS', '5000'))
+
     # Infura URL for connecting to Ethereum node (replace YOUR_INFURA_PROJECT_ID with your actual project ID)
     INFURA_URL = os.getenv('INFURA_URL', 'https://mainnet.infura.io/v3/YOUR_INFURA_PROJECT_ID')
 
+    # JSON-RPC client settings: calls per batch request, request timeout and keep-alive pool size
+    RPC_BATCH_SIZE = int(os.getenv('RPC_BATCH_SIZE', '50'))
+    RPC_TIMEOUT = float(os.getenv('RPC_TIMEOUT', '10'))
+    RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', '10'))
+    # Batch requests of one batch_call sent in parallel (at most RPC_POOL_SIZE are useful)
+    RPC_BATCH_CONCURRENCY = int(os.getenv('RPC_BATCH_CONCURRENCY', '4'))
+
 
 settings = Settings()
@@ -0,0 +1,143 @@
+"""
+Fetch-once coordination between backend instances.
+
+In "leader" mode, one instance per poll cycle holds the ingest lease. It fetches the upstream
+pages once and writes the raw rows into the ingest_queue table, partitioned by hash shard
+(int(tx_hash, 16) % TOTAL_WORKERS). Every instance then drains only its own shard; the leader
+also queues its own shard when it polls from the plain polling thread, while the ingest pipeline
+writes the leader's shard straight from the fetched pages (see app.pipeline.leader_source).
+Leadership moves to another instance when the lease expires, so the number of upstream calls
+per cycle does not grow with the number of workers.
+"""
+import json
+import os
+import socket
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import crud, models
+
+
+def worker_identity() -> str:
+    """
+    Return an identifier that is unique per running backend process.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def hash_shard(tx_hash: str, total_shards: int) -> int:
+    """
+    Return the shard that owns tx_hash; this is the same rule process_transactions applies.
+    """
+    return int(tx_hash[2:] if tx_hash.startswith("0x") else tx_hash, 16) % total_shards
+
+
+def acquire_lease(db: Session, name: str, holder: str, ttl: float) -> bool:
+    """
+    Acquire or renew the named lease for ttl seconds.
+
+    The lease is granted if nobody holds it, if holder already holds it, or if the current
+    lease has expired. The conditional UPDATE makes the check-and-take atomic across instances.
+    Returns True if holder owns the lease afterwards.
+    """
+    now = time.time()
+    table = models.IngestLease.__table__
+    db.execute(crud.insert_ignore(db, table).values(name=name, holder=holder, expires_at=now + ttl))
+    result = db.execute(
+        table.update()
+        .where(table.c.name == name)
+        .where((table.c.holder == holder) | (table.c.expires_at < now))
+        .values(holder=holder, expires_at=now + ttl)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def release_lease(db: Session, name: str, holder: str):
+    """
+    Give up the named lease if holder owns it, so another instance can take over immediately.
+    """
+    table = models.IngestLease.__table__
+    db.execute(table.delete().where(table.c.name == name).where(table.c.holder == holder))
+    db.commit()
+
+
+def enqueue_transactions(db: Session, transactions: Iterable[dict], eth_price: Decimal, total_shards: int,
+                         exclude_shard: Optional[int] = None) -> int:
+    """
+    Write raw upstream rows into the work queue, one entry per transaction hash, tagged with
+    the shard that owns the hash. Rows of exclude_shard (processed by the caller itself) are not
+    queued. Returns the number of queued entries.
+    """
+    items = []
+    seen = set()
+    for txn in transactions:
+        tx_hash = txn.get("hash")
+        if not tx_hash or tx_hash in seen:
+            continue
+        try:
+            shard = hash_shard(tx_hash, total_shards)
+        except ValueError:
+            continue
+        if shard == exclude_shard:
+            continue
+        seen.add(tx_hash)
+        items.append({"shard": shard, "tx_hash": tx_hash, "payload": json.dumps(txn), "eth_price": eth_price})
+    if items:
+        db.execute(models.IngestQueueItem.__table__.insert(), items)
+        db.commit()
+    return len(items)
+
+
+def claim_shard_batch(db: Session, shard: int, limit: int, after_id: int = 0) -> List[models.IngestQueueItem]:
+    """
+    Return up to limit of the oldest queued entries of the given shard with an id above after_id.
+    Entries stay in the queue until they are acknowledged with ack_items.
+    """
+    return (
+        db.query(models.IngestQueueItem)
+        .filter(models.IngestQueueItem.shard == shard)
+        .filter(models.IngestQueueItem.id > after_id)
+        .order_by(models.IngestQueueItem.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def group_by_price(items: Iterable[models.IngestQueueItem]) -> Dict[Decimal, Tuple[List[int], List[dict]]]:
+    """
+    Decode queued entries back into raw upstream rows, grouped by the ETH price they were
+    fetched with, together with the ids of their entries (to acknowledge once stored).
+    """
+    groups = defaultdict(lambda: ([], []))
+    for item in items:
+        ids, transactions = groups[item.eth_price]
+        ids.append(item.id)
+        transactions.append(json.loads(item.payload))
+    return groups
+
+
+def ack_items(db: Session, ids: List[int]):
+    """
+    Remove processed entries from the queue.
+    """
+    if ids:
+        db.query(models.IngestQueueItem).filter(models.IngestQueueItem.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+def queue_depth(db: Session) -> Dict[int, int]:
+    """
+    Return the number of queued entries per shard.
+    """
+    rows = (
+        db.query(models.IngestQueueItem.shard, func.count(models.IngestQueueItem.id))
+        .group_by(models.IngestQueueItem.shard)
+        .all()
+    )
+    return {shard: count for shard, count in rows}
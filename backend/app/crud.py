@@ -1,7 +1,19 @@
+import base64
+from sqlalchemy import and_, bindparam, insert, or_
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, rollups, schemas
+from .config import settings
 from datetime import datetime
 from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class BulkInsertResult(NamedTuple):
+    inserted: int
+    skipped: int
+    # Hashes that were not stored before the batch and were sent to the database.
+    new_hashes: List[str]
+
 
 def create_transaction(db: Session, transaction: schemas.TransactionCreate):
     db_transaction = models.Transaction(
@@ -15,8 +27,11 @@ def create_transaction(db: Session, transaction: schemas.TransactionCreate):
         gas_used=transaction.gas_used,
         fee_eth=transaction.fee_eth,
         fee_usdt=transaction.fee_usdt,
+        pool_address=transaction.pool_address or settings.POOL_ADDRESS,
     )
     db.add(db_transaction)
+    rollups.add_transactions(db, [transaction.dict()])
+    bump_data_version(db)
     db.commit()
     db.refresh(db_transaction)
     return db_transaction
@@ -24,26 +39,104 @@ def create_transaction(db: Session, transaction: schemas.TransactionCreate):
 def get_transaction_by_hash(db: Session, tx_hash: str):
     return db.query(models.Transaction).filter(models.Transaction.tx_hash == tx_hash).first()
 
-def get_transactions(db: Session, tx_hash: str = None, start_time: datetime = None, end_time: datetime = None, skip: int = 0, limit: int = 50):
-    query = db.query(models.Transaction)
+def _transaction_entities(columns: Optional[List[str]]):
+    """
+    What to query for transactions: the ORM entity, or only the named columns (which yields plain
+    rows with those attributes, in that order).
+    """
+    if columns is None:
+        return [models.Transaction]
+    return [getattr(models.Transaction, name) for name in columns]
+
+def get_transactions_by_hashes(db: Session, tx_hashes: Iterable[str],
+                               columns: Optional[List[str]] = None) -> Dict[str, models.Transaction]:
+    """
+    Return the stored transactions among tx_hashes by hash, using a single IN query. With
+    columns (which must include tx_hash), the values are rows of those columns instead of objects.
+    """
+    tx_hashes = list(tx_hashes)
+    if not tx_hashes:
+        return {}
+    rows = db.query(*_transaction_entities(columns)).filter(models.Transaction.tx_hash.in_(tx_hashes)).all()
+    return {row.tx_hash: row for row in rows}
+
+def get_swap_prices_by_hashes(db: Session, tx_hashes: Iterable[str]) -> Dict[str, Tuple[Optional[Decimal], str]]:
+    """
+    Return (swap_price, pool_address) of the stored transactions among tx_hashes by hash, using a
+    single IN query over those columns only.
+    """
+    tx_hashes = list(tx_hashes)
+    if not tx_hashes:
+        return {}
+    rows = (
+        db.query(models.Transaction.tx_hash, models.Transaction.swap_price, models.Transaction.pool_address)
+        .filter(models.Transaction.tx_hash.in_(tx_hashes))
+        .all()
+    )
+    return {tx_hash: (swap_price, pool_address) for tx_hash, swap_price, pool_address in rows}
+
+def encode_cursor(transaction: models.Transaction) -> str:
+    """
+    Return the opaque keyset cursor that points just after transaction in list order.
+    """
+    key = f"{transaction.time_stamp.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor from encode_cursor into its (time_stamp, id) key. Raises ValueError if the
+    cursor is malformed.
+    """
+    try:
+        key = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        time_stamp, transaction_id = key.rsplit("|", 1)
+        return datetime.fromisoformat(time_stamp), int(transaction_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def get_transactions(db: Session, tx_hash: str = None, start_time: datetime = None, end_time: datetime = None,
+                     skip: int = 0, limit: int = 50, min_block: int = None, max_block: int = None,
+                     after: Optional[Tuple[datetime, int]] = None,
+                     pool: str = None, columns: Optional[List[str]] = None):
+    """
+    Return transactions newest first, ordered by (time_stamp, id) descending, optionally only
+    those of one pool. With columns, return rows of those columns instead of objects.
+
+    With after, a (time_stamp, id) key from decode_cursor, the page starts right after that key
+    (keyset pagination); its cost does not depend on how deep the page is, unlike skip.
+    """
+    query = db.query(*_transaction_entities(columns))
     if tx_hash:
         query = query.filter(models.Transaction.tx_hash == tx_hash)
+    if pool:
+        query = query.filter(models.Transaction.pool_address == pool.lower())
+    # Block bounds derived from the time range narrow the scan; the time filters below stay exact.
+    if min_block is not None:
+        query = query.filter(models.Transaction.block_number >= min_block)
+    if max_block is not None:
+        query = query.filter(models.Transaction.block_number <= max_block)
     if start_time:
         query = query.filter(models.Transaction.time_stamp >= start_time)
     if end_time:
         query = query.filter(models.Transaction.time_stamp <= end_time)
-    transactions = query.order_by(models.Transaction.time_stamp.desc()).offset(skip).limit(limit).all()
+    if after is not None:
+        after_time, after_id = after
+        query = query.filter(or_(
+            models.Transaction.time_stamp < after_time,
+            and_(models.Transaction.time_stamp == after_time, models.Transaction.id < after_id),
+        ))
+    query = query.order_by(models.Transaction.time_stamp.desc(), models.Transaction.id.desc())
+    if skip:
+        query = query.offset(skip)
+    transactions = query.limit(limit).all()
     return transactions
 
 def get_summary(db: Session):
-    from sqlalchemy import func
-    result = db.query(
-        func.coalesce(func.sum(models.Transaction.fee_eth), 0),
-        func.coalesce(func.sum(models.Transaction.fee_usdt), 0)
-    ).one()
-    total_fee_eth = result[0]
-    total_fee_usdt = result[1]
-    return total_fee_eth, total_fee_usdt
+    """
+    Return the total fees (ETH, USDT) of all transactions, read from the day rollups so the cost
+    does not grow with the transactions table.
+    """
+    return rollups.get_totals(db)
 
 def update_swap_price(db: Session, tx_hash: str, swap_price: Decimal):
     """
@@ -52,6 +145,141 @@ def update_swap_price(db: Session, tx_hash: str, swap_price: Decimal):
     transaction = get_transaction_by_hash(db, tx_hash)
     if transaction:
         transaction.swap_price = swap_price
+        bump_data_version(db)
         db.commit()
         db.refresh(transaction)
     return transaction
+
+def get_existing_hashes(db: Session, tx_hashes: Iterable[str]) -> Set[str]:
+    """
+    Return the subset of tx_hashes that is already stored, using a single IN query.
+    """
+    tx_hashes = list(tx_hashes)
+    if not tx_hashes:
+        return set()
+    rows = db.query(models.Transaction.tx_hash).filter(models.Transaction.tx_hash.in_(tx_hashes)).all()
+    return {row[0] for row in rows}
+
+def insert_ignore(db: Session, table):
+    """
+    Build an INSERT statement that silently skips rows whose unique key already exists.
+    MySQL uses INSERT IGNORE; SQLite (used by the tests) uses ON CONFLICT DO NOTHING.
+    db may also be a Connection.
+    """
+    dialect = (db.get_bind() if isinstance(db, Session) else db).dialect.name
+    if dialect == "mysql":
+        return insert(table).prefix_with("IGNORE")
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+def bulk_create_transactions(db: Session, rows: List[dict]) -> BulkInsertResult:
+    """
+    Insert many transaction rows with as few round trips as possible.
+
+    Existing hashes are prefetched with one IN query and dropped up front, and the remaining
+    rows are written with multi-row INSERT ... IGNORE statements of at most
+    settings.INSERT_CHUNK_SIZE rows each. Rows that lose a race against another writer are
+    ignored by the database. The rows this transaction stored are added to the fee rollups in the
+    same transaction; rows stored by the other writer are added by that writer. Each chunk runs in
+    a SAVEPOINT: if another writer stored some of its hashes since the prefetch, the chunk is
+    rolled back and its rows are inserted one by one, so that exactly the stored rows are added. With
+    SWAP_DECODE_QUEUE, new rows without a swap price are queued for decoding in the same
+    transaction as well, and so is the data version bump that invalidates cached responses. The
+    caller owns the transaction and must commit.
+
+    Returns the inserted/skipped counts together with the hashes that were new to the table.
+    """
+    if not rows:
+        return BulkInsertResult(0, 0, [])
+    existing = get_existing_hashes(db, (row["tx_hash"] for row in rows))
+    new_rows = [row for row in rows if row["tx_hash"] not in existing]
+    inserted = 0
+    table = models.Transaction.__table__
+    chunk_size = max(1, settings.INSERT_CHUNK_SIZE)
+    for start in range(0, len(new_rows), chunk_size):
+        chunk = new_rows[start:start + chunk_size]
+        savepoint = db.begin_nested()
+        if db.execute(insert_ignore(db, table).values(chunk)).rowcount == len(chunk):
+            savepoint.commit()
+        else:
+            savepoint.rollback()
+            chunk = [row for row in chunk if db.execute(insert_ignore(db, table).values(row)).rowcount == 1]
+        inserted += len(chunk)
+        rollups.add_transactions(db, chunk)
+    if settings.SWAP_DECODE_QUEUE:
+        enqueue_swap_decodes(db, (row["tx_hash"] for row in new_rows if row.get("swap_price") is None))
+    if new_rows:
+        bump_data_version(db)
+    return BulkInsertResult(inserted, len(rows) - inserted, [row["tx_hash"] for row in new_rows])
+
+def enqueue_swap_decodes(db: Session, tx_hashes: Iterable[str]) -> int:
+    """
+    Queue transactions for swap price decoding (see app.decodequeue); hashes that are already
+    queued are ignored. The caller owns the transaction and must commit.
+    """
+    values = [{"tx_hash": tx_hash, "status": "pending", "attempts": 0, "next_attempt_at": 0}
+              for tx_hash in dict.fromkeys(tx_hashes)]
+    if values:
+        db.execute(insert_ignore(db, models.SwapDecodeItem.__table__), values)
+    return len(values)
+
+def bulk_update_swap_prices(db: Session, swap_prices: Dict[str, Decimal]) -> int:
+    """
+    Set swap_price for many transactions with a single executemany UPDATE, and bump the data
+    version. The caller owns the transaction and must commit.
+    """
+    if not swap_prices:
+        return 0
+    table = models.Transaction.__table__
+    stmt = (
+        table.update()
+        .where(table.c.tx_hash == bindparam("b_tx_hash"))
+        .values(swap_price=bindparam("b_swap_price"))
+    )
+    db.execute(stmt, [{"b_tx_hash": tx_hash, "b_swap_price": price} for tx_hash, price in swap_prices.items()])
+    bump_data_version(db)
+    return len(swap_prices)
+
+def bump_data_version(db: Session, name: str = "transactions"):
+    """
+    Increment a data version (see app.responsecache). Called within the write it covers, so the
+    new version becomes visible to every worker exactly when that write commits. The caller owns
+    the transaction and must commit.
+    """
+    table = models.DataVersion.__table__
+    now = datetime.utcnow()
+    db.execute(insert_ignore(db, table).values(name=name, version=0, updated_at=now))
+    db.execute(table.update().where(table.c.name == name).values(version=table.c.version + 1, updated_at=now))
+
+def get_data_version(db: Session, name: str = "transactions") -> int:
+    """
+    Return the current value of a data version (0 before the first write).
+    """
+    return db.query(models.DataVersion.version).filter(models.DataVersion.name == name).scalar() or 0
+
+def get_checkpoint(db: Session, source: str) -> Optional[int]:
+    """
+    Return the last fully processed block of an ingest source, or None if it has none yet.
+    """
+    return db.query(models.IngestCheckpoint.last_block).filter(models.IngestCheckpoint.source == source).scalar()
+
+def advance_checkpoint(db: Session, source: str, last_block: int):
+    """
+    Move the checkpoint of an ingest source forward to last_block and commit.
+    A checkpoint never moves backwards, so concurrent or replayed writers are harmless.
+    """
+    table = models.IngestCheckpoint.__table__
+    now = datetime.utcnow()
+    db.execute(insert_ignore(db, table).values(source=source, last_block=last_block, updated_at=now))
+    db.execute(
+        table.update()
+        .where(table.c.source == source)
+        .where(table.c.last_block < last_block)
+        .values(last_block=last_block, updated_at=now)
+    )
+    db.commit()
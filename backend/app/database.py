@@ -1,16 +1,104 @@
+import functools
+import logging
+import threading
+from typing import Optional
+
+from anyio import to_thread
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-# Construct the MySQL connection URL for SQLAlchemy
-DATABASE_URL = f"mysql+pymysql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+logger = logging.getLogger("background_tasks")
+
+# Construct the MySQL connection URLs for SQLAlchemy: PyMySQL for background work, an asyncio
+# driver (aiomysql by default) for the API routes
+DATABASE_ADDRESS = (f"{settings.DB_USER}:{settings.DB_PASSWORD}"
+                    f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
+DATABASE_URL = f"mysql+pymysql://{DATABASE_ADDRESS}"
+ASYNC_DATABASE_URL = f"mysql+{settings.DB_ASYNC_DRIVER}://{DATABASE_ADDRESS}"
+
+# Connection pool of each engine; the sync and the async engine have one each
+POOL_OPTIONS = dict(
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+)
 
 # Create the SQLAlchemy engine with pool_pre_ping enabled
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for declarative models
 Base = declarative_base()
+
+
+class ThreadedSession:
+    """
+    A sync Session behind the run_sync/close interface of AsyncSession, for when no async driver
+    is installed: every call runs on the threadpool instead of the event loop.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await to_thread.run_sync(functools.partial(fn, self.sync_session, *args, **kwargs))
+
+    async def rollback(self):
+        await to_thread.run_sync(self.sync_session.rollback)
+
+    async def close(self):
+        await to_thread.run_sync(self.sync_session.close)
+
+
+def create_async_sessionmaker(url: str, **engine_options) -> Optional[sessionmaker]:
+    """
+    Return a factory of AsyncSessions on url, or None if the URL's driver is not installed.
+    Objects stay loaded after commit, since lazy loads cannot run outside run_sync.
+    """
+    try:
+        async_engine = create_async_engine(url, **engine_options)
+    except ImportError as e:
+        logger.warning(f"Async database driver unavailable ({e}); API routes use the sync engine on the threadpool.")
+        return None
+    return sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+_async_sessionmaker: Optional[sessionmaker] = None
+_async_ready = False
+_async_lock = threading.Lock()
+
+
+def get_async_sessionmaker() -> Optional[sessionmaker]:
+    """
+    Return the process-wide AsyncSession factory of the API routes, creating it on first use;
+    None when DB_ASYNC is off or the async driver is not installed.
+    """
+    global _async_sessionmaker, _async_ready
+    if not _async_ready:
+        with _async_lock:
+            if not _async_ready:
+                if settings.DB_ASYNC:
+                    _async_sessionmaker = create_async_sessionmaker(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+                _async_ready = True
+    return _async_sessionmaker
+
+
+async def get_async_db():
+    """
+    FastAPI dependency: a session of the API routes. Database work goes through
+    `await db.run_sync(fn, *args)`, which calls fn(sync_session, *args), so the routes share the
+    crud functions with the background tasks.
+    """
+    factory = get_async_sessionmaker()
+    db = factory() if factory is not None else ThreadedSession(SessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
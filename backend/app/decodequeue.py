@@ -0,0 +1,281 @@
+"""
+Durable swap price decode queue.
+
+Transactions are stored without waiting for Infura: the insert adds every new row whose swap
+price is unknown to the swap_decode_queue table in the same database transaction. Decoder
+threads claim due entries in batches, fetch their receipts with one batched RPC call and write
+the decoded prices with a single bulk UPDATE. An entry whose receipt could not be fetched or
+decoded is retried with exponential backoff; after SWAP_DECODE_MAX_ATTEMPTS failures it is kept
+with status "dead" for inspection. Dead entries can be put back with
+
+    python -m app.decodequeue requeue
+"""
+import argparse
+import logging
+import threading
+import time
+import uuid
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import coordination, crud, database, models, tasks
+from .config import settings
+from .rpc import get_rpc_client
+
+logger = logging.getLogger("background_tasks")
+
+
+def retry_delay(attempts: int, base: float, maximum: float) -> float:
+    """
+    Return the backoff in seconds before the next attempt after the given number of failures.
+    """
+    return min(maximum, base * 2 ** max(0, attempts - 1))
+
+
+def backlog(db: Session) -> Dict[str, int]:
+    """
+    Return the number of queued entries per status (pending, dead).
+    """
+    rows = (
+        db.query(models.SwapDecodeItem.status, func.count(models.SwapDecodeItem.tx_hash))
+        .group_by(models.SwapDecodeItem.status)
+        .all()
+    )
+    counts = {"pending": 0, "dead": 0}
+    counts.update({status: count for status, count in rows})
+    return counts
+
+
+def requeue_dead(db: Session) -> int:
+    """
+    Give every dead-lettered entry a fresh set of attempts. Returns the number of entries.
+    """
+    count = (
+        db.query(models.SwapDecodeItem)
+        .filter(models.SwapDecodeItem.status == "dead")
+        .update({"status": "pending", "attempts": 0, "next_attempt_at": 0, "claimed_by": None},
+                synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+
+class SwapDecodeQueue:
+    """
+    Drains the swap_decode_queue table in batches; safe to run on several threads and instances.
+    """
+
+    def __init__(self, fetch_receipts: Optional[Callable[[List[str]], Dict[str, dict]]] = None,
+                 batch_size: int = 50, max_attempts: int = 8, retry_base: float = 5,
+                 retry_max: float = 3600, claim_ttl: float = 300, clock: Callable[[], float] = time.time):
+        self.fetch_receipts = fetch_receipts or (lambda tx_hashes: get_rpc_client().get_transaction_receipts(tx_hashes))
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.claim_ttl = claim_ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._metrics = {"batches": 0, "decoded": 0, "no_swap": 0, "retries": 0, "dead_lettered": 0}
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return dict(self._metrics)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def claim(self, db: Session, limit: Optional[int] = None) -> Tuple[str, List[str]]:
+        """
+        Claim up to limit due entries for claim_ttl seconds. The conditional UPDATE makes sure
+        concurrent decoders never claim the same entry. Returns (claim token, claimed hashes).
+        """
+        now = self.clock()
+        item = models.SwapDecodeItem
+        candidates = [
+            tx_hash for (tx_hash,) in db.query(item.tx_hash)
+            .filter(item.status == "pending", item.next_attempt_at <= now)
+            .order_by(item.next_attempt_at)
+            .limit(limit or self.batch_size)
+        ]
+        if not candidates:
+            return "", []
+        token = f"{coordination.worker_identity()}:{uuid.uuid4().hex}"
+        table = item.__table__
+        db.execute(
+            table.update()
+            .where(table.c.tx_hash.in_(candidates))
+            .where(table.c.status == "pending")
+            .where(table.c.next_attempt_at <= now)
+            .values(claimed_by=token, next_attempt_at=now + self.claim_ttl)
+        )
+        db.commit()
+        return token, [tx_hash for (tx_hash,) in db.query(item.tx_hash).filter(item.claimed_by == token)]
+
+    def decode(self, tx_hashes: List[str], pools: Optional[Dict[str, str]] = None
+               ) -> Tuple[Dict[str, Decimal], Dict[str, str]]:
+        """
+        Decode the swap prices of tx_hashes, each from the Swap event of its pool in pools (of any
+        tracked pool if missing). Returns the prices (0 if the receipt has no such Swap event) and
+        the errors of the hashes that have to be retried.
+        """
+        try:
+            receipts = self.fetch_receipts(tx_hashes)
+        except Exception as e:
+            return {}, {tx_hash: f"Could not fetch receipts: {e}" for tx_hash in tx_hashes}
+        prices, errors = {}, {}
+        for tx_hash in tx_hashes:
+            receipt = receipts.get(tx_hash)
+            if receipt is None:
+                errors[tx_hash] = "Receipt not available"
+                continue
+            try:
+                prices[tx_hash] = tasks.swap_price_from_receipt(receipt, (pools or {}).get(tx_hash))
+            except Exception as e:
+                errors[tx_hash] = f"Could not decode receipt: {e}"
+        return prices, errors
+
+    def _record_failures(self, db: Session, token: str, errors: Dict[str, str]):
+        now = self.clock()
+        items = (
+            db.query(models.SwapDecodeItem)
+            .filter(models.SwapDecodeItem.tx_hash.in_(list(errors)))
+            .filter(models.SwapDecodeItem.claimed_by == token)
+            .all()
+        )
+        for item in items:
+            item.attempts += 1
+            item.last_error = errors[item.tx_hash][:1000]
+            item.claimed_by = None
+            if item.attempts >= self.max_attempts:
+                item.status = "dead"
+                self._count("dead_lettered")
+                logger.error(f"Giving up decoding the swap price of {item.tx_hash} after "
+                             f"{item.attempts} attempts: {item.last_error}")
+            else:
+                item.next_attempt_at = now + retry_delay(item.attempts, self.retry_base, self.retry_max)
+                self._count("retries")
+
+    def process_batch(self, db: Session) -> int:
+        """
+        Claim, decode and settle one batch. Returns the number of claimed entries.
+        """
+        token, tx_hashes = self.claim(db)
+        if not tx_hashes:
+            return 0
+        pools = dict(
+            db.query(models.Transaction.tx_hash, models.Transaction.pool_address)
+            .filter(models.Transaction.tx_hash.in_(tx_hashes))
+        )
+        prices, errors = self.decode(tx_hashes, pools)
+        swap_prices = {tx_hash: price for tx_hash, price in prices.items() if price > Decimal("0")}
+        try:
+            crud.bulk_update_swap_prices(db, swap_prices)
+            if prices:
+                db.query(models.SwapDecodeItem).filter(
+                    models.SwapDecodeItem.tx_hash.in_(list(prices))
+                ).delete(synchronize_session=False)
+            if errors:
+                self._record_failures(db, token, errors)
+            db.commit()
+        except Exception:
+            # The claim expires after claim_ttl, so the batch is picked up again.
+            db.rollback()
+            raise
+        self._count("batches")
+        self._count("decoded", len(swap_prices))
+        self._count("no_swap", len(prices) - len(swap_prices))
+        return len(tx_hashes)
+
+    def drain(self) -> int:
+        """
+        Process batches until no entry is due. Returns the number of processed entries.
+        """
+        total = 0
+        db = database.SessionLocal()
+        try:
+            while True:
+                processed = self.process_batch(db)
+                if not processed:
+                    return total
+                total += processed
+        finally:
+            db.close()
+
+    def run_forever(self, interval: float):
+        """
+        Drain the queue, then wait interval seconds for new entries (runs on a decoder thread).
+        """
+        while True:
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Error in swap price decoder: {e}")
+            time.sleep(interval)
+
+
+_queue: Optional[SwapDecodeQueue] = None
+_queue_lock = threading.Lock()
+_decoder_threads: List[threading.Thread] = []
+
+
+def get_swap_decode_queue() -> SwapDecodeQueue:
+    """
+    Return the process-wide swap decode queue, creating it on first use.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = SwapDecodeQueue(
+                    batch_size=settings.SWAP_DECODE_BATCH_SIZE,
+                    max_attempts=settings.SWAP_DECODE_MAX_ATTEMPTS,
+                    retry_base=settings.SWAP_DECODE_RETRY_BASE,
+                    retry_max=settings.SWAP_DECODE_RETRY_MAX,
+                    claim_ttl=settings.SWAP_DECODE_CLAIM_TTL,
+                )
+    return _queue
+
+
+def start_swap_decoders() -> List[threading.Thread]:
+    """
+    Start SWAP_DECODE_WORKERS decoder threads draining the process-wide queue (once).
+    """
+    queue = get_swap_decode_queue()
+    with _queue_lock:
+        if not _decoder_threads:
+            for number in range(max(1, settings.SWAP_DECODE_WORKERS)):
+                thread = threading.Thread(target=queue.run_forever, args=(settings.SWAP_DECODE_POLL_INTERVAL,),
+                                          daemon=True, name=f"swap-decoder-{number}")
+                thread.start()
+                _decoder_threads.append(thread)
+    return _decoder_threads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and maintain the swap price decode queue.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show the number of pending and dead entries.")
+    subparsers.add_parser("requeue", help="Retry every dead-lettered entry.")
+    subparsers.add_parser("drain", help="Decode every due entry now.")
+    args = parser.parse_args(argv)
+
+    if args.command == "drain":
+        print(f"Processed {get_swap_decode_queue().drain()} entries.")
+        return
+    db = database.SessionLocal()
+    try:
+        if args.command == "requeue":
+            print(f"Requeued {requeue_dead(db)} entries.")
+        else:
+            print(", ".join(f"{status}: {count}" for status, count in backlog(db).items()))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
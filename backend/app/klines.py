@@ -0,0 +1,306 @@
+"""
+Historical ETH/USDT price store built from Binance one-minute klines.
+
+Candles are stored in the price_candles table and, once used, held in memory as two parallel
+sorted arrays (open time in seconds, close price in 1e-8 units), so the price at any timestamp
+is a binary search away. Backfills fill the candles of their time range in bulk, either from
+the Binance klines endpoint (1000 candles per request) or, without network access, from a
+Binance kline CSV export. Binance has no candle for a minute without trades, so the ranges
+downloaded from it are recorded in price_candle_ranges; a range that was downloaded counts as
+covered despite its gaps and is not requested again.
+
+    python -m app.klines import ETHUSDT-1m-2024-01.csv
+    python -m app.klines fetch --start 2024-01-01 --end 2024-02-01
+"""
+import argparse
+import bisect
+import csv
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+
+from . import crud, database, models
+from .config import settings
+from .upstream import get_upstream_client
+
+logger = logging.getLogger("background_tasks")
+
+SYMBOL = "ETHUSDT"
+INTERVAL_SECONDS = 60
+# Binance returns at most this many klines per request.
+KLINES_PER_REQUEST = 1000
+# Prices are kept as integers of 1e-8 units, the precision Binance quotes them with.
+PRICE_SCALE = 10 ** 8
+
+# (open_time in seconds, close price in 1e-8 units)
+Candle = Tuple[int, int]
+
+
+def to_units(price) -> int:
+    return int(Decimal(str(price)) * PRICE_SCALE)
+
+
+def from_units(units: int) -> Decimal:
+    return Decimal(units) / PRICE_SCALE
+
+
+def parse_kline(kline) -> Candle:
+    """
+    Convert a Binance kline (API array or CSV row) into a candle. The open time is given in
+    milliseconds (microseconds in newer CSV exports).
+    """
+    open_time = int(kline[0])
+    while open_time > 10 ** 11:
+        open_time //= 1000
+    return open_time, to_units(kline[4])
+
+
+class KlineStore:
+    """
+    Sorted in-memory one-minute candles of one symbol, backed by the price_candles table.
+    """
+
+    def __init__(self, symbol: str = SYMBOL):
+        self.symbol = symbol
+        self.open_times = array("q")
+        self.closes = array("q")
+        # Sorted, disjoint (first, last) open times of the minutes downloaded from Binance
+        self.fetched_ranges: List[Tuple[int, int]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.open_times)
+
+    def merge(self, candles: Iterable[Candle]):
+        """
+        Merge candles into the in-memory arrays, keeping them sorted and unique by open time.
+        """
+        candles = sorted(dict(candles).items())
+        if not candles:
+            return
+        with self._lock:
+            times, closes = array("q"), array("q")
+            i = j = 0
+            while i < len(self.open_times) or j < len(candles):
+                if j >= len(candles) or (i < len(self.open_times) and self.open_times[i] < candles[j][0]):
+                    times.append(self.open_times[i])
+                    closes.append(self.closes[i])
+                    i += 1
+                else:
+                    if i < len(self.open_times) and self.open_times[i] == candles[j][0]:
+                        i += 1
+                    times.append(candles[j][0])
+                    closes.append(candles[j][1])
+                    j += 1
+            self.open_times, self.closes = times, closes
+
+    def price_at(self, timestamp: int) -> Optional[Decimal]:
+        """
+        Return the close price of the minute containing the UNIX timestamp, or None if that
+        candle is not loaded.
+        """
+        with self._lock:
+            position = bisect.bisect_right(self.open_times, timestamp) - 1
+            if position < 0 or timestamp - self.open_times[position] >= INTERVAL_SECONDS:
+                return None
+            return from_units(self.closes[position])
+
+    def count_between(self, start: int, end: int) -> int:
+        with self._lock:
+            return bisect.bisect_right(self.open_times, end) - bisect.bisect_left(self.open_times, start)
+
+    def merge_fetched(self, ranges: Iterable[Tuple[int, int]]):
+        """
+        Merge downloaded (first, last) ranges into fetched_ranges, joining adjacent ones.
+        """
+        with self._lock:
+            merged: List[Tuple[int, int]] = []
+            for first, last in sorted(self.fetched_ranges + list(ranges)):
+                if merged and first <= merged[-1][1] + INTERVAL_SECONDS:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+                else:
+                    merged.append((first, last))
+            self.fetched_ranges = merged
+
+    def unfetched(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """
+        Return the parts of [start, end] (start at a minute boundary) not downloaded from Binance.
+        """
+        gaps = []
+        cursor = start
+        with self._lock:
+            for first, last in self.fetched_ranges:
+                if last < cursor:
+                    continue
+                if first > end:
+                    break
+                if first > cursor:
+                    gaps.append((cursor, first - INTERVAL_SECONDS))
+                cursor = last + INTERVAL_SECONDS
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def covered(self, start: int, end: int) -> bool:
+        """
+        Whether every minute of [start, end] has a candle or was downloaded from Binance.
+        """
+        expected = (end - start) // INTERVAL_SECONDS + 1
+        return self.count_between(start, end) >= expected or not self.unfetched(start, end)
+
+    def record_fetched(self, start: int, end: int):
+        """
+        Persist that the minutes [start, end] were downloaded from Binance.
+        """
+        db = database.SessionLocal()
+        try:
+            db.add(models.PriceCandleRange(symbol=self.symbol, start_time=start, end_time=end))
+            db.commit()
+        finally:
+            db.close()
+        self.merge_fetched([(start, end)])
+
+    def store(self, candles: List[Candle]) -> int:
+        """
+        Persist candles (ignoring ones already stored) and merge them into memory.
+        """
+        if not candles:
+            return 0
+        db = database.SessionLocal()
+        try:
+            table = models.PriceCandle.__table__
+            values = [{"symbol": self.symbol, "open_time": t, "close": from_units(c)} for t, c in candles]
+            for start in range(0, len(values), settings.INSERT_CHUNK_SIZE):
+                db.execute(crud.insert_ignore(db, table), values[start:start + settings.INSERT_CHUNK_SIZE])
+            db.commit()
+        finally:
+            db.close()
+        self.merge(candles)
+        return len(candles)
+
+    def load(self, start: int, end: int) -> int:
+        """
+        Load the stored candles with open times in [start, end], and the downloaded ranges
+        overlapping it, into memory.
+        """
+        db = database.SessionLocal()
+        try:
+            rows = (
+                db.query(models.PriceCandle.open_time, models.PriceCandle.close)
+                .filter(models.PriceCandle.symbol == self.symbol)
+                .filter(models.PriceCandle.open_time >= start, models.PriceCandle.open_time <= end)
+                .order_by(models.PriceCandle.open_time)
+                .all()
+            )
+            ranges = (
+                db.query(models.PriceCandleRange.start_time, models.PriceCandleRange.end_time)
+                .filter(models.PriceCandleRange.symbol == self.symbol)
+                .filter(models.PriceCandleRange.start_time <= end, models.PriceCandleRange.end_time >= start)
+                .all()
+            )
+        finally:
+            db.close()
+        self.merge((open_time, to_units(close)) for open_time, close in rows)
+        self.merge_fetched((first, last) for first, last in ranges)
+        return len(rows)
+
+    def fetch_binance(self, start: int, end: int) -> int:
+        """
+        Download the candles with open times in [start, end] from Binance, store them and record
+        the range as downloaded: all of it if it ended before the current minute, otherwise up
+        to the last candle received (later minutes may not have closed yet).
+        """
+        fetched = 0
+        client = get_upstream_client()
+        start -= start % INTERVAL_SECONDS
+        cursor = start
+        last = None
+        while cursor <= end:
+            klines = client.get_json("binance", settings.BINANCE_KLINES_URL, {
+                "symbol": self.symbol, "interval": "1m", "startTime": cursor * 1000,
+                "endTime": end * 1000, "limit": KLINES_PER_REQUEST,
+            })
+            if not klines:
+                break
+            candles = [parse_kline(kline) for kline in klines]
+            fetched += self.store(candles)
+            last = candles[-1][0]
+            cursor = last + INTERVAL_SECONDS
+        if end < int(time.time()) - INTERVAL_SECONDS:
+            last = end - end % INTERVAL_SECONDS
+        if last is not None and last >= start:
+            self.record_fetched(start, last)
+        return fetched
+
+    def import_csv(self, path: str) -> int:
+        """
+        Import a Binance kline CSV export (open_time, open, high, low, close, ...); a header
+        row is skipped.
+        """
+        candles = []
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                if not row or not row[0].strip().isdigit():
+                    continue
+                candles.append(parse_kline(row))
+        return self.store(candles)
+
+    def ensure_range(self, start: int, end: int, fetch: bool = True) -> bool:
+        """
+        Make the candles covering [start, end] available in memory: from memory, then from the
+        database, then (if fetch) from Binance, downloading only the parts not downloaded before.
+        Returns True if the range is fully covered (see covered).
+        """
+        start -= start % INTERVAL_SECONDS
+        if self.covered(start, end):
+            return True
+        self.load(start, end)
+        if self.covered(start, end):
+            return True
+        if fetch:
+            for first, last in self.unfetched(start, end):
+                self.fetch_binance(first, last)
+        return self.covered(start, end)
+
+
+_store: Optional[KlineStore] = None
+_store_lock = threading.Lock()
+
+
+def get_kline_store() -> KlineStore:
+    """
+    Return the process-wide ETH/USDT kline store, creating it on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = KlineStore()
+    return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the ETH/USDT price candle store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import Binance kline CSV files.")
+    import_parser.add_argument("paths", nargs="+")
+    fetch_parser = subparsers.add_parser("fetch", help="Download klines from Binance.")
+    fetch_parser.add_argument("--start", type=datetime.fromisoformat, required=True, help="Start time (ISO format)")
+    fetch_parser.add_argument("--end", type=datetime.fromisoformat, required=True, help="End time (ISO format)")
+    args = parser.parse_args(argv)
+
+    store = get_kline_store()
+    if args.command == "import":
+        for path in args.paths:
+            print(f"Imported {store.import_csv(path)} candles from {path}.")
+    else:
+        count = store.fetch_binance(int(args.start.timestamp()), int(args.end.timestamp()))
+        print(f"Fetched {count} candles.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Log-native ingest source (INGEST_SOURCE=logs).
+
+Instead of Etherscan tokentx rows (one row per token transfer, and a receipt fetch per
+transaction for the swap price), the pool's Swap logs are read with eth_getLogs over block
+windows. Every log already carries the swap price, so a window needs one eth_getLogs call plus
+batched calls for the receipts (from, to, gas used, effective gas price), the transactions (gas
+limit) and the block headers (timestamps) of the swaps it contains.
+
+Nodes cap the size of an eth_getLogs response (Infura: 10,000 logs). When a window hits that
+limit it is halved and retried. While windows come back small they grow again, up to
+LOGS_MAX_WINDOW_BLOCKS: they double, but only move halfway towards a size that recently hit
+the limit. Busy and quiet periods therefore both take few calls.
+
+Pages are yielded as Etherscan-shaped rows (plus "swapPrice"), so the rest of the ingest path
+(sharding, fee computation, the pipeline, backfills) is the same for both sources. A worker that
+only stores its own shard drops the other shards' logs before the per-transaction calls.
+"""
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from . import coordination, swap_decoder
+from .blockindex import get_block_index
+from .config import settings
+from .rpc import RpcClient, RpcError, get_rpc_client
+
+logger = logging.getLogger("background_tasks")
+
+# JSON-RPC error codes and messages nodes use when an eth_getLogs response would be too large.
+RESULT_LIMIT_CODES = (-32005,)
+RESULT_LIMIT_MESSAGES = ("more than", "too many", "limit exceeded", "response size", "block range")
+# Successful windows after which a size that hit the result limit may be tried again.
+FAILED_WINDOW_MEMORY = 32
+
+
+def is_result_limit_error(error: RpcError) -> bool:
+    message = str(error).lower()
+    return error.code in RESULT_LIMIT_CODES or any(marker in message for marker in RESULT_LIMIT_MESSAGES)
+
+
+def _int(value) -> int:
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def _in_own_shard(tx_hash: str) -> bool:
+    try:
+        return coordination.hash_shard(tx_hash, settings.TOTAL_WORKERS) == settings.WORKER_ID
+    except (TypeError, ValueError, ZeroDivisionError):
+        return False
+
+
+class LogSource:
+    """
+    Reads a pool's Swap logs over adaptive block windows and turns them into ingest rows.
+    """
+
+    def __init__(self, client: Optional[RpcClient] = None, address: str = None, window: int = 2000,
+                 max_window: int = 10000, target_results: int = 5000):
+        self._client = client
+        self.address = (address or settings.POOL_ADDRESS).lower()
+        self.max_window = max(1, max_window)
+        self.window = min(max(1, window), self.max_window)
+        self.target_results = max(1, target_results)
+        # Smallest window size known to hit the result limit; growth stays below it until
+        # FAILED_WINDOW_MEMORY windows in a row have succeeded.
+        self._failed_window: Optional[int] = None
+        self._successes = 0
+        self._lock = threading.Lock()
+        self._metrics = {"windows": 0, "shrinks": 0, "logs": 0, "rpc_calls": 0}
+
+    @property
+    def client(self) -> RpcClient:
+        return self._client or get_rpc_client()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["window_blocks"] = self.window
+        return metrics
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def _batch(self, method: str, params_list: List[list]) -> list:
+        self._count("rpc_calls", (len(params_list) + self.client.batch_size - 1) // self.client.batch_size)
+        return self.client.batch_call(method, params_list)
+
+    def get_logs(self, from_block: int, to_block: int) -> List[dict]:
+        self._count("rpc_calls")
+        return self.client.call("eth_getLogs", [{
+            "address": self.address,
+            "topics": [swap_decoder.SWAP_EVENT_TOPIC],
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block),
+        }]) or []
+
+    def _grow(self, window: int, results: int, full: bool):
+        """
+        Enlarge the window after a full window returned fewer than half of target_results logs:
+        double it, or move halfway towards the smallest size that hit the result limit.
+        """
+        self._successes += 1
+        if self._failed_window is not None and self._successes >= FAILED_WINDOW_MEMORY:
+            self._failed_window = None
+        if not full or results >= self.target_results // 2:
+            return
+        grown = min(self.max_window, window * 2)
+        if self._failed_window is not None and grown >= self._failed_window:
+            grown = max(window, (window + self._failed_window) // 2)
+        self.window = grown
+
+    def iter_windows(self, start_block: int, end_block: int) -> Iterator[Tuple[int, int, List[dict]]]:
+        """
+        Yield (from_block, to_block, logs) for consecutive windows covering [start_block, end_block].
+        """
+        block = start_block
+        while block <= end_block:
+            window = self.window
+            to_block = min(end_block, block + window - 1)
+            try:
+                logs = self.get_logs(block, to_block)
+            except RpcError as e:
+                if not is_result_limit_error(e) or to_block == block:
+                    raise
+                self._failed_window = to_block - block + 1
+                self._successes = 0
+                self.window = max(1, self._failed_window // 2)
+                self._count("shrinks")
+                logger.info(f"eth_getLogs hit the result limit for {to_block - block + 1} blocks; "
+                            f"retrying with {self.window}.")
+                continue
+            self._count("windows")
+            self._count("logs", len(logs))
+            self._grow(window, len(logs), to_block - block + 1 == window)
+            yield block, to_block, logs
+            block = to_block + 1
+
+    def build_rows(self, logs: List[dict], sharded: bool = False) -> List[dict]:
+        """
+        Turn Swap logs into Etherscan-shaped rows, one per transaction (its first swap in the
+        pool), in block order. With sharded, only the transactions of this worker's shard are
+        kept (see tasks.select_transactions), so no receipts or headers are fetched for the rest.
+        Raises RpcError if a receipt, transaction or header is missing, so that the page is
+        retried rather than stored incomplete.
+        """
+        swaps: Dict[str, dict] = {}
+        for log in sorted(logs, key=lambda log: (_int(log["blockNumber"]), _int(log.get("logIndex", 0)))):
+            if log.get("removed") or not swap_decoder.is_swap_log(log, self.address):
+                continue
+            if sharded and not _in_own_shard(log["transactionHash"]):
+                continue
+            swaps.setdefault(log["transactionHash"], log)
+        if not swaps:
+            return []
+        tx_hashes = list(swaps)
+        blocks = sorted({_int(log["blockNumber"]) for log in swaps.values()})
+        receipts = self._batch("eth_getTransactionReceipt", [[tx_hash] for tx_hash in tx_hashes])
+        transactions = self._batch("eth_getTransactionByHash", [[tx_hash] for tx_hash in tx_hashes])
+        headers = self._batch("eth_getBlockByNumber", [[hex(block), False] for block in blocks])
+        missing = [tx_hash for tx_hash, receipt, txn in zip(tx_hashes, receipts, transactions)
+                   if receipt is None or txn is None]
+        if missing or any(header is None for header in headers):
+            raise RpcError(f"Incomplete receipts, transactions or headers for {len(missing)} of "
+                           f"{len(tx_hashes)} swaps in blocks {blocks[0]}-{blocks[-1]}")
+        timestamps = {block: _int(header["timestamp"]) for block, header in zip(blocks, headers)}
+        get_block_index().add_samples(timestamps.items(), settings.BLOCK_INDEX_SPACING)
+
+        rows = []
+        for tx_hash, receipt, txn in zip(tx_hashes, receipts, transactions):
+            log = swaps[tx_hash]
+            block_number = _int(log["blockNumber"])
+            gas_price = receipt.get("effectiveGasPrice") or txn.get("gasPrice")
+            rows.append({
+                "hash": tx_hash,
+                "blockNumber": str(block_number),
+                "timeStamp": str(timestamps[block_number]),
+                "from": receipt.get("from") or txn.get("from"),
+                "to": receipt.get("to") or txn.get("to"),
+                "gas": str(_int(txn["gas"])),
+                "gasPrice": str(_int(gas_price)),
+                "gasUsed": str(_int(receipt["gasUsed"])),
+                "swapPrice": str(swap_decoder.swap_price(swap_decoder.decode_swap_log(log).sqrt_price_x96)),
+            })
+        return rows
+
+    def latest_block(self) -> int:
+        self._count("rpc_calls")
+        return int(self.client.call("eth_blockNumber", []), 16)
+
+    def iter_pages(self, start_block: int, end_block: int = None, offset: int = 100,
+                   sharded: bool = False) -> Iterator[List[dict]]:
+        """
+        Yield pages of at most offset rows in ascending block order from start_block to end_block
+        (the chain head if None), like tasks.iter_block_pages does for Etherscan. With sharded,
+        only this worker's shard is read (see build_rows).
+        """
+        if end_block is None:
+            end_block = self.latest_block()
+        for _, _, logs in self.iter_windows(start_block, end_block):
+            rows = self.build_rows(logs, sharded)
+            for start in range(0, len(rows), offset):
+                yield rows[start:start + offset]
+
+
+# One log source per pool, so every pool's window adapts to that pool's activity.
+_sources: Dict[str, LogSource] = {}
+_source_lock = threading.Lock()
+
+
+def get_log_source(pool: str = None) -> LogSource:
+    """
+    Return the process-wide log source of a pool (POOL_ADDRESS if None), creating it on first use.
+    """
+    pool = (pool or settings.POOL_ADDRESS).lower()
+    source = _sources.get(pool)
+    if source is None:
+        with _source_lock:
+            source = _sources.get(pool)
+            if source is None:
+                source = _sources[pool] = LogSource(
+                    address=pool,
+                    window=settings.LOGS_WINDOW_BLOCKS,
+                    max_window=settings.LOGS_MAX_WINDOW_BLOCKS,
+                    target_results=settings.LOGS_TARGET_RESULTS,
+                )
+    return source
+
+
+def metrics() -> Dict[str, dict]:
+    """
+    Return the metrics of every pool's log source that has been used.
+    """
+    with _source_lock:
+        sources = dict(_sources)
+    return {pool: source.metrics() for pool, source in sources.items()}
@@ -1,14 +1,29 @@
-from fastapi import FastAPI, Depends
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import FastAPI, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.middleware.cors import CORSMiddleware
 
 from .routers import transactions
-from .database import engine, Base, SessionLocal
-from .tasks import start_background_tasks, fetch_eth_price  # and start_background_tasks covers polling
-from . import crud, schemas
+from .database import engine, Base, get_async_db
+from .tasks import start_background_tasks  # and start_background_tasks covers polling
+from .pricefeed import get_price_feed, start_price_feed
+from .upstream import get_upstream_client
+from .pipeline import get_pipeline, start_pipeline
+from .swapcache import get_swap_price_cache
+from .scheduler import get_poll_scheduler
+from .decodequeue import get_swap_decode_queue, start_swap_decoders
+from .responsecache import cached_value, get_response_cache, make_etag, not_modified_response
+from .config import settings
+from .migrations import run_migrations
+from .compact import check_schema
+from . import backfill, coordination, crud, decodequeue, logsource, rollups, schemas
 
-# Create all database tables if they do not exist.
+# Create all database tables if they do not exist, then apply pending schema migrations (indexes).
 Base.metadata.create_all(bind=engine)
+check_schema(engine)
+run_migrations(engine)
 
 app = FastAPI(
     title="Uniswap Transaction Fee API",
@@ -23,28 +38,86 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 app.include_router(transactions.router)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @app.get("/summary", response_model=schemas.Summary)
-def get_summary(db: Session = Depends(get_db)):
-    total_fee_eth, total_fee_usdt = crud.get_summary(db)
-    current_eth_price = fetch_eth_price()
+async def get_summary(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """
+    Total fees and the current ETH price. The totals are cached until the data version changes.
+    """
+    total_fee_eth, total_fee_usdt = await cached_value(db, ("summary",), lambda: db.run_sync(crud.get_summary))
+    # The price comes from the background-refreshed feed, so no upstream call is made here.
+    quote = get_price_feed().quote()
+    if settings.RESPONSE_CACHE:
+        # price_age_seconds differs on every request, so the ETag is weak: it covers the totals and the price.
+        etag = make_etag(f"{total_fee_eth}|{total_fee_usdt}|{quote.price if quote else None}".encode(), weak=True)
+        if get_response_cache().not_modified("summary", request.headers.get("if-none-match"), etag):
+            return not_modified_response(etag)
+        response.headers["ETag"] = etag
     return schemas.Summary(
         total_fee_eth=total_fee_eth,
         total_fee_usdt=total_fee_usdt,
-        current_eth_price=current_eth_price
+        current_eth_price=quote.price if quote is not None else 0,
+        price_age_seconds=quote.age() if quote is not None else None
     )
 
+@app.get("/summary/series", response_model=List[schemas.FeeBucket])
+async def get_summary_series(
+    bucket: str = Query("hour", regex="^(minute|hour|day)$", description="Bucket size: minute, hour or day"),
+    start: Optional[datetime] = Query(None, description="Start time in ISO format"),
+    end: Optional[datetime] = Query(None, description="End time in ISO format"),
+    limit: int = Query(1000, ge=1, le=10000, description="Maximum number of buckets"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Fee totals, transaction counts and average fees per time bucket, read from the rollup tables.
+    """
+    rows = await db.run_sync(rollups.get_series, bucket, start, end, limit)
+    return [
+        schemas.FeeBucket(
+            bucket_start=row.bucket_start,
+            tx_count=row.tx_count,
+            total_fee_eth=row.fee_eth,
+            total_fee_usdt=row.fee_usdt,
+            avg_fee_eth=row.fee_eth / row.tx_count if row.tx_count else 0,
+            avg_fee_usdt=row.fee_usdt / row.tx_count if row.tx_count else 0,
+        )
+        for row in rows
+    ]
+
+@app.get("/metrics")
+async def get_metrics(db: AsyncSession = Depends(get_async_db)):
+    """
+    Expose in-process counters of this backend instance and shared ingest queue depths.
+    """
+    queue_depth = await db.run_sync(coordination.queue_depth)
+    backlog = await db.run_sync(decodequeue.backlog)
+    return {
+        "upstream": get_upstream_client().metrics(),
+        "ingest_queue_depth": queue_depth,
+        "pipeline": get_pipeline().metrics(),
+        "price_feed": get_price_feed().metrics(),
+        "swap_price_cache": get_swap_price_cache().metrics(),
+        "log_source": logsource.metrics(),
+        "scheduler": get_poll_scheduler().metrics(),
+        "swap_decode_queue": dict(get_swap_decode_queue().metrics(), backlog=backlog),
+        "response_cache": get_response_cache().metrics(),
+    }
+
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
+    # Keep the ETH price fresh in the background for /summary and ingestion.
+    start_price_feed()
     # Start background tasks for live polling.
-    start_background_tasks()
+    if settings.INGEST_PIPELINE:
+        start_pipeline()
+    else:
+        start_background_tasks()
+    # Decode the swap prices of stored transactions in the background.
+    if settings.SWAP_DECODE_QUEUE:
+        start_swap_decoders()
+    # Pick up historical backfills that were interrupted by a restart.
+    backfill.resume_jobs()
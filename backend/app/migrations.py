@@ -0,0 +1,134 @@
+"""
+Schema migrations for changes that Base.metadata.create_all cannot apply to an existing
+database (it only creates missing tables, never indexes on existing ones).
+
+Each migration is a (version, function) pair; the function receives an open connection and
+must be idempotent. Applied versions are recorded in the schema_migrations table and skipped on
+later startups. Backend instances that start at the same time apply the migrations one at a time
+under a MySQL named lock, so slow data migrations (the rollup backfill) run once.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import crud, models, rollups, tasks
+from .config import settings
+
+logger = logging.getLogger("background_tasks")
+
+# MySQL named lock held while migrations are applied, and how long (seconds) to wait for it.
+MIGRATION_LOCK = "uniswap_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 3600
+
+
+def create_index(connection: Connection, table: str, name: str, columns: List[str]):
+    """
+    Create an index unless an index with that name already exists.
+    """
+    existing = {index["name"] for index in inspect(connection).get_indexes(table)}
+    if name not in existing:
+        connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+def add_column(connection: Connection, table: str, name: str, definition: str):
+    """
+    Add a column unless the table already has it (e.g. because create_all created the table).
+    """
+    existing = {column["name"] for column in inspect(connection).get_columns(table)}
+    if name not in existing:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+
+
+def add_transaction_list_indexes(connection: Connection):
+    # Backs the keyset pagination of GET /transactions: ORDER BY time_stamp DESC, id DESC.
+    create_index(connection, "transactions", "ix_transactions_time_stamp_id", ["time_stamp", "id"])
+    # Backs the block bounds derived from time filters and block-range scans.
+    create_index(connection, "transactions", "ix_transactions_block_number", ["block_number"])
+
+
+def add_pool_index(connection: Connection):
+    # Backs GET /transactions?pool=...: WHERE pool_address = ? ORDER BY time_stamp DESC, id DESC.
+    create_index(connection, "transactions", "ix_transactions_pool_time_stamp_id",
+                 ["pool_address", "time_stamp", "id"])
+
+
+def backfill_fee_rollups(connection: Connection):
+    # Rollups of transactions stored before the fee_rollups table existed.
+    rollups.rebuild(Session(bind=connection))
+
+
+def add_pools(connection: Connection):
+    # Transactions stored so far were all ingested from the default pool.
+    add_column(connection, "transactions", "pool_address",
+               f"VARCHAR(42) NOT NULL DEFAULT '{settings.POOL_ADDRESS}'")
+    add_pool_index(connection)
+    add_column(connection, "backfill_jobs", "pool_address", "VARCHAR(42) NULL")
+    # The single live checkpoint becomes the default pool's cursor.
+    table = models.IngestCheckpoint.__table__
+    row = connection.execute(table.select().where(table.c.source == tasks.LIVE_INGEST_CHECKPOINT)).first()
+    if row is not None:
+        connection.execute(
+            crud.insert_ignore(connection, table)
+            .values(source=tasks.live_checkpoint(settings.POOL_ADDRESS), last_block=row.last_block)
+        )
+
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_transaction_list_indexes", add_transaction_list_indexes),
+    ("0002_fee_rollups", backfill_fee_rollups),
+    ("0003_pools", add_pools),
+]
+
+
+def applied_versions(connection: Connection) -> set:
+    table = models.SchemaMigration.__table__
+    return {row[0] for row in connection.execute(table.select().with_only_columns([table.c.version]))}
+
+
+@contextmanager
+def migration_lock(engine: Engine):
+    """
+    Hold the MySQL named lock MIGRATION_LOCK for the duration of the block. The lock belongs to
+    the connection, so it is released if the instance dies. Other databases (SQLite in the tests)
+    serve a single instance and take no lock.
+    """
+    if engine.dialect.name != "mysql":
+        yield
+        return
+    with engine.connect() as connection:
+        acquired = connection.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK, "timeout": MIGRATION_LOCK_TIMEOUT}
+        ).scalar()
+        if acquired != 1:
+            raise RuntimeError("Timed out waiting for another instance to apply the schema migrations.")
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK})
+
+
+def run_migrations(engine: Engine) -> List[str]:
+    """
+    Apply all pending migrations in order and return the versions that were applied. Instances
+    waiting for the migration lock find the versions applied by the holder and skip them.
+    """
+    models.SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    applied = []
+    with migration_lock(engine):
+        for version, migrate in MIGRATIONS:
+            with engine.begin() as connection:
+                if version in applied_versions(connection):
+                    continue
+                logger.info(f"Applying schema migration {version}.")
+                migrate(connection)
+                connection.execute(
+                    crud.insert_ignore(connection, models.SchemaMigration.__table__)
+                    .values(version=version, applied_at=datetime.utcnow())
+                )
+            applied.append(version)
+    return applied
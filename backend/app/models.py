@@ -1,20 +1,225 @@
-from sqlalchemy import Column, Integer, BigInteger, String, DateTime, DECIMAL, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, DECIMAL, TIMESTAMP, Float, Text, ForeignKey
+from datetime import datetime
+from .config import settings
 from .database import Base
+from .sqltypes import transaction_types
+
+# Hex strings and DECIMAL fees, or raw bytes and integer fees with COMPACT_SCHEMA (see app.sqltypes).
+transaction_type = transaction_types(settings.COMPACT_SCHEMA)
 
 class Transaction(Base):
     __tablename__ = 'transactions'
 
     id = Column(Integer, primary_key=True, index=True)
-    tx_hash = Column(String(66), unique=True, nullable=False, index=True)
+    tx_hash = Column(transaction_type.tx_hash, unique=True, nullable=False, index=True)
     block_number = Column(BigInteger, nullable=False)
     time_stamp = Column(DateTime, nullable=False)
-    from_address = Column(String(42), nullable=False)
-    to_address = Column(String(42), nullable=False)
+    from_address = Column(transaction_type.address, nullable=False)
+    to_address = Column(transaction_type.address, nullable=False)
     gas = Column(BigInteger, nullable=False)
     gas_price = Column(BigInteger, nullable=False)
     gas_used = Column(BigInteger, nullable=False)
-    fee_eth = Column(DECIMAL(30, 18), nullable=False)
-    fee_usdt = Column(DECIMAL(30, 18), nullable=False)
+    fee_eth = Column(transaction_type.fee_eth, nullable=False)
+    fee_usdt = Column(transaction_type.fee_usdt, nullable=False)
     created_at = Column(TIMESTAMP, server_default="CURRENT_TIMESTAMP", nullable=False)
     # New column to store the executed swap price decoded from the Uniswap Swap event
     swap_price = Column(DECIMAL(30, 18), nullable=True)
+    # Pool the swap was ingested from (a transaction routed through several tracked pools is
+    # stored once, under the first pool it was seen in)
+    pool_address = Column(transaction_type.address, nullable=False, default=lambda: settings.POOL_ADDRESS)
+
+
+class RateLimitBucket(Base):
+    """
+    Token bucket shared by all backend instances that use the same upstream API key.
+    """
+    __tablename__ = 'rate_limit_buckets'
+
+    name = Column(String(64), primary_key=True)
+    tokens = Column(Float(precision=53), nullable=False)
+    # UNIX time (seconds, fractional) of the last refill
+    updated_at = Column(Float(precision=53), nullable=False)
+
+
+class IngestLease(Base):
+    """
+    Time-limited leadership lease; the holder of a lease is the only instance that runs the
+    leased job until the lease expires.
+    """
+    __tablename__ = 'ingest_leases'
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    # UNIX time (seconds, fractional) after which other instances may take the lease over
+    expires_at = Column(Float(precision=53), nullable=False)
+
+
+class IngestQueueItem(Base):
+    """
+    Raw upstream transaction row fetched by the leader and waiting to be processed by the
+    worker that owns its hash shard.
+    """
+    __tablename__ = 'ingest_queue'
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    shard = Column(Integer, nullable=False, index=True)
+    tx_hash = Column(String(66), nullable=False)
+    # JSON-encoded Etherscan row
+    payload = Column(Text, nullable=False)
+    # ETH/USDT price fetched by the leader for the poll cycle that enqueued the row
+    eth_price = Column(DECIMAL(30, 18), nullable=False)
+
+
+class IngestCheckpoint(Base):
+    """
+    Last fully processed block of an ingest source; polling resumes after it.
+    """
+    __tablename__ = 'ingest_checkpoints'
+
+    source = Column(String(64), primary_key=True)
+    last_block = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BackfillJob(Base):
+    """
+    Historical backfill of a time range; the range is split into BackfillRange rows that are
+    processed in parallel and resumed after a restart.
+    """
+    __tablename__ = 'backfill_jobs'
+
+    id = Column(Integer, primary_key=True, index=True)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    # Block range covering [start_time, end_time]; resolved when the job first runs
+    start_block = Column(BigInteger, nullable=True)
+    end_block = Column(BigInteger, nullable=True)
+    # Pool to backfill; NULL for jobs created before pools were tracked (the default pool)
+    pool_address = Column(String(42), nullable=True)
+    # pending, running, completed, failed or cancelled
+    status = Column(String(16), nullable=False, default="pending")
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class BackfillRange(Base):
+    """
+    Block sub-range of a backfill job with its own resume cursor.
+    """
+    __tablename__ = 'backfill_ranges'
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey('backfill_jobs.id'), nullable=False, index=True)
+    start_block = Column(BigInteger, nullable=False)
+    end_block = Column(BigInteger, nullable=False)
+    # First block that still has to be fetched; the range is done once it passes end_block
+    next_block = Column(BigInteger, nullable=False)
+    # pending, running, completed, failed or cancelled
+    status = Column(String(16), nullable=False, default="pending")
+    rows_fetched = Column(BigInteger, nullable=False, default=0)
+    rows_inserted = Column(BigInteger, nullable=False, default=0)
+
+
+class BlockTimestamp(Base):
+    """
+    Known (block_number, timestamp) sample of the timestamp-to-block index.
+    """
+    __tablename__ = 'block_timestamps'
+
+    block_number = Column(BigInteger, primary_key=True, autoincrement=False)
+    # UNIX timestamp of the block
+    time_stamp = Column(BigInteger, nullable=False, index=True)
+
+
+class SchemaMigration(Base):
+    """
+    Schema migrations that have been applied to this database (see app/migrations.py).
+    """
+    __tablename__ = 'schema_migrations'
+
+    version = Column(String(64), primary_key=True)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FeeRollup(Base):
+    """
+    Transaction count and fee totals per minute, hour or day, maintained by the insert paths.
+    """
+    __tablename__ = 'fee_rollups'
+
+    # minute, hour or day
+    bucket = Column(String(8), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    tx_count = Column(BigInteger, nullable=False, default=0)
+    fee_eth = Column(DECIMAL(40, 18), nullable=False, default=0)
+    fee_usdt = Column(DECIMAL(40, 18), nullable=False, default=0)
+
+
+class PriceQuote(Base):
+    """
+    Latest price of a symbol, shared between backend workers by the price feed.
+    """
+    __tablename__ = 'price_quotes'
+
+    symbol = Column(String(16), primary_key=True)
+    price = Column(DECIMAL(30, 18), nullable=False)
+    # UNIX time at which the price was fetched
+    fetched_at = Column(Float(53), nullable=False)
+
+
+class PriceCandle(Base):
+    """
+    One-minute price candle (close price) of a symbol, used to price historical transactions.
+    """
+    __tablename__ = 'price_candles'
+
+    symbol = Column(String(16), primary_key=True)
+    # UNIX time (seconds) at which the minute starts
+    open_time = Column(BigInteger, primary_key=True, autoincrement=False)
+    close = Column(DECIMAL(30, 8), nullable=False)
+
+
+class PriceCandleRange(Base):
+    """
+    Time range of a symbol whose candles were downloaded from Binance. Minutes in it without a
+    candle had no trades, so they are not requested again.
+    """
+    __tablename__ = 'price_candle_ranges'
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(16), nullable=False)
+    # Open times (UNIX seconds) of the first and last minute of the range
+    start_time = Column(BigInteger, nullable=False)
+    end_time = Column(BigInteger, nullable=False)
+
+
+class SwapDecodeItem(Base):
+    """
+    Stored transaction whose swap price still has to be decoded from its receipt.
+    """
+    __tablename__ = 'swap_decode_queue'
+
+    tx_hash = Column(String(66), primary_key=True)
+    # pending, or dead once SWAP_DECODE_MAX_ATTEMPTS attempts have failed
+    status = Column(String(16), nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # UNIX time before which the entry is not (re)tried; claiming an entry pushes it forward
+    next_attempt_at = Column(Float(53), nullable=False, default=0, index=True)
+    # Claim token of the decoder that is working on the entry
+    claimed_by = Column(String(160), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class DataVersion(Base):
+    """
+    Counter bumped by every write that changes what the read endpoints return, in the write's own
+    transaction; the response caches of all workers compare it with the version of their entries.
+    """
+    __tablename__ = 'data_versions'
+
+    name = Column(String(32), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,457 @@
+"""
+Staged asyncio pipeline for live ingestion.
+
+    fetch -> parse/fee compute -> swap-price decode -> batched DB write
+
+Each stage runs a configurable number of worker coroutines and hands items to the next stage
+through a bounded asyncio.Queue, so a slow stage (usually the RPC decode) applies backpressure
+to the fetcher instead of buffering pages without limit. Blocking work (HTTP, database) runs on
+a dedicated thread pool, which lets pages overlap: while one page is being decoded, the next
+one is already being fetched and parsed.
+
+Every item carries an on_done callback (advance the block checkpoint, acknowledge queued rows)
+that runs strictly in fetch order once the item and all items before it have been written. A
+failed item stops later callbacks, so the next cycle resumes from the last fully written page.
+"""
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional
+
+from . import coordination, crud, database, tasks
+from .blockindex import get_block_index
+from .config import settings
+from .scheduler import get_poll_scheduler
+
+logger = logging.getLogger("background_tasks")
+
+# Sentinel that tells a stage worker to shut down.
+_STOP = object()
+
+
+class PipelineItem:
+    """
+    One unit of work flowing through the pipeline: a page of raw upstream rows.
+    """
+
+    def __init__(self, transactions: List[dict], eth_price: Decimal, on_done: Optional[Callable[[], None]] = None):
+        self.seq = 0
+        self.transactions = transactions
+        self.eth_price = eth_price
+        self.on_done = on_done
+        self.rows: List[dict] = []
+        self.failed = False
+
+
+def parse_item(item: PipelineItem):
+    """
+    Parse stage: build insertable rows and drop hashes that are already stored.
+    """
+    rows = tasks.build_transaction_rows(item.transactions, item.eth_price)
+    if rows:
+        db = database.SessionLocal()
+        try:
+            existing = crud.get_existing_hashes(db, (row["tx_hash"] for row in rows))
+        finally:
+            db.close()
+        rows = [row for row in rows if row["tx_hash"] not in existing]
+    item.rows = rows
+
+
+def decode_item(item: PipelineItem):
+    """
+    Decode stage: attach swap prices so rows are inserted complete, without a later UPDATE.
+    With SWAP_DECODE_QUEUE the stage passes rows through; the write queues them for decoding.
+    """
+    if not item.rows or settings.SWAP_DECODE_QUEUE:
+        return
+    unpriced = [row for row in item.rows if row.get("swap_price") is None]
+    if not unpriced:
+        return
+    swap_prices = tasks.decode_swap_prices([row["tx_hash"] for row in unpriced],
+                                           {row["tx_hash"]: row["pool_address"] for row in unpriced})
+    for row in unpriced:
+        swap_price = swap_prices.get(row["tx_hash"], Decimal("0"))
+        if swap_price > Decimal("0"):
+            row["swap_price"] = swap_price
+
+
+def write_items(items: List[PipelineItem]) -> crud.BulkInsertResult:
+    """
+    Write stage: insert the rows of several items in one transaction, then add the pages'
+    blocks to the timestamp-to-block index.
+    """
+    rows = [row for item in items for row in item.rows]
+    db = database.SessionLocal()
+    try:
+        result = crud.bulk_create_transactions(db, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    index = get_block_index()
+    for item in items:
+        index.record_transactions(item.transactions)
+    return result
+
+
+def _advance_checkpoint(source: str, last_block: int):
+    db = database.SessionLocal()
+    try:
+        crud.advance_checkpoint(db, source, last_block)
+    finally:
+        db.close()
+
+
+def _ack_queue_items(ids: List[int]):
+    db = database.SessionLocal()
+    try:
+        coordination.ack_items(db, ids)
+    finally:
+        db.close()
+
+
+def _enqueue_other_shards(transactions: List[dict], eth_price: Decimal):
+    db = database.SessionLocal()
+    try:
+        coordination.enqueue_transactions(db, transactions, eth_price, settings.TOTAL_WORKERS,
+                                          exclude_shard=settings.WORKER_ID)
+    finally:
+        db.close()
+
+
+def live_source(pool: str = None, leader: bool = False) -> Iterator[PipelineItem]:
+    """
+    Yield the pages of a pool (POOL_ADDRESS if None) after this worker's live checkpoint ("shard" mode),
+    or with leader after the shared one, queueing the rows of the other shards as each page is fetched.
+    Completing a page advances the checkpoint to the block before its last one; a final empty item
+    advances it to the last block.
+    """
+    pool = (pool or settings.POOL_ADDRESS).lower()
+    worker_id = None if leader else settings.WORKER_ID
+    checkpoint = tasks.live_checkpoint(pool, worker_id)
+    db = database.SessionLocal()
+    try:
+        eth_price = tasks.fetch_eth_price()
+        start_block = tasks.live_start_block(db, pool, worker_id)
+    finally:
+        db.close()
+    last_block = None
+    for transactions in tasks.iter_block_pages(start_block, pool=pool, sharded=not leader):
+        if leader:
+            _enqueue_other_shards(transactions, eth_price)
+        last_block = int(transactions[-1].get("blockNumber", 0))
+        yield PipelineItem(transactions, eth_price, functools.partial(
+            _advance_checkpoint, checkpoint, last_block - 1))
+    if last_block is not None:
+        yield PipelineItem([], eth_price, functools.partial(
+            _advance_checkpoint, checkpoint, last_block))
+
+
+def _counting(source: Iterator[PipelineItem], fetched: Dict[str, int], pool: str) -> Iterator[PipelineItem]:
+    """
+    Pass the items of source through, adding their row counts to fetched[pool].
+    """
+    for item in source:
+        fetched[pool] += len(item.transactions)
+        yield item
+
+
+def queue_source() -> Iterator[PipelineItem]:
+    """
+    Yield this worker's queued rows ("leader" mode), one item per claimed batch and ETH price.
+    Completing an item acknowledges (deletes) its queue entries.
+    """
+    after_id = 0
+    while True:
+        db = database.SessionLocal()
+        try:
+            queued = coordination.claim_shard_batch(db, settings.WORKER_ID, settings.QUEUE_BATCH_SIZE, after_id)
+            groups: Dict[Decimal, tuple] = {}
+            for entry in queued:
+                ids, transactions = groups.setdefault(entry.eth_price, ([], []))
+                ids.append(entry.id)
+                transactions.append(json.loads(entry.payload))
+        finally:
+            db.close()
+        if not queued:
+            return
+        after_id = queued[-1].id
+        for eth_price, (ids, transactions) in groups.items():
+            yield PipelineItem(transactions, eth_price, functools.partial(_ack_queue_items, ids))
+
+
+def leader_source(pools: List[str]) -> Iterator[PipelineItem]:
+    """
+    "leader" mode: if this instance holds (or takes) the ingest lease, yield the new pages of the
+    pools (live_source with leader), reporting every pool's row count to the poll scheduler. Then
+    yield this worker's queued rows. The lease is taken in the fetch stage, so the pages overlap
+    with the later stages like in "shard" mode.
+    """
+    db = database.SessionLocal()
+    try:
+        leading = coordination.acquire_lease(db, tasks.LIVE_INGEST_LEASE, coordination.worker_identity(),
+                                             settings.LEASE_TTL)
+    finally:
+        db.close()
+    if leading:
+        scheduler = get_poll_scheduler()
+        for pool in pools:
+            fetched = 0
+            try:
+                for item in live_source(pool, leader=True):
+                    fetched += len(item.transactions)
+                    yield item
+            except Exception as e:
+                logger.error(f"Error fetching pool {pool} as ingest leader: {e}")
+                scheduler.record(pool, None)
+                continue
+            scheduler.record(pool, fetched)
+    yield from queue_source()
+
+
+class IngestPipeline:
+    """
+    Runs pipeline cycles over a source of PipelineItems.
+    """
+
+    def __init__(self, parse_workers: int = 1, decode_workers: int = 4, write_workers: int = 1,
+                 queue_size: int = 8, write_batch_rows: int = 1000, pool_concurrency: int = 1):
+        self.parse_workers = max(1, parse_workers)
+        self.decode_workers = max(1, decode_workers)
+        self.write_workers = max(1, write_workers)
+        self.queue_size = max(1, queue_size)
+        self.write_batch_rows = max(1, write_batch_rows)
+        # Pools whose cycles run at the same time, each with its own stages.
+        self.pool_concurrency = max(1, pool_concurrency)
+        self.executor = ThreadPoolExecutor(
+            max_workers=(1 + self.parse_workers + self.decode_workers + self.write_workers) * self.pool_concurrency,
+            thread_name_prefix="ingest-pipeline",
+        )
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"cycles": 0, "pages": 0, "rows_fetched": 0, "inserted": 0, "skipped": 0,
+                         "failed_pages": 0, "lag_seconds": None}
+
+    def metrics(self) -> dict:
+        """
+        Return a snapshot of the pipeline counters. lag_seconds is the age of the newest written
+        transaction at the time it was committed.
+        """
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+    async def _blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def _fetch(self, source: Iterator[PipelineItem], outbox: asyncio.Queue):
+        seq = 0
+        try:
+            while True:
+                item = await self._blocking(next, source, _STOP)
+                if item is _STOP:
+                    break
+                item.seq = seq
+                seq += 1
+                self._count("pages")
+                self._count("rows_fetched", len(item.transactions))
+                await outbox.put(item)
+        except Exception as e:
+            logger.error(f"Pipeline fetch stage failed: {e}")
+        finally:
+            for _ in range(self.parse_workers):
+                await outbox.put(_STOP)
+
+    async def _stage(self, name: str, func, workers: int, inbox: asyncio.Queue, outbox: asyncio.Queue,
+                     downstream_workers: int):
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is _STOP:
+                    return
+                if not item.failed:
+                    try:
+                        await self._blocking(func, item)
+                    except Exception as e:
+                        item.failed = True
+                        logger.error(f"Pipeline {name} stage failed for page {item.seq}: {e}")
+                await outbox.put(item)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for _ in range(downstream_workers):
+            await outbox.put(_STOP)
+
+    async def _write(self, inbox: asyncio.Queue, completion: "_CompletionTracker"):
+        stopped = False
+        while not stopped:
+            item = await inbox.get()
+            if item is _STOP:
+                return
+            # Coalesce whatever is already waiting into one write, up to write_batch_rows rows.
+            batch = [item]
+            rows = len(item.rows)
+            while rows < self.write_batch_rows and not inbox.empty():
+                extra = inbox.get_nowait()
+                if extra is _STOP:
+                    stopped = True
+                    break
+                batch.append(extra)
+                rows += len(extra.rows)
+            writable = [entry for entry in batch if not entry.failed]
+            try:
+                result = await self._blocking(write_items, writable)
+                self._count("inserted", result.inserted)
+                self._count("skipped", result.skipped)
+                self._record_lag(writable)
+            except Exception as e:
+                logger.error(f"Pipeline write stage failed for {len(writable)} pages: {e}")
+                for entry in writable:
+                    entry.failed = True
+            await completion.complete(batch)
+
+    def _record_lag(self, items: List[PipelineItem]):
+        newest = max((row["time_stamp"] for item in items for row in item.rows), default=None)
+        if newest is not None:
+            with self._metrics_lock:
+                self._metrics["lag_seconds"] = max(0.0, (datetime.now() - newest).total_seconds())
+
+    async def run(self, source: Iterator[PipelineItem]) -> dict:
+        """
+        Push every item of source through the pipeline and wait until all of them are written.
+        Returns the pipeline metrics after the run.
+        """
+        parse_queue = asyncio.Queue(self.queue_size)
+        decode_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        completion = _CompletionTracker(self)
+        await asyncio.gather(
+            self._fetch(source, parse_queue),
+            self._stage("parse", parse_item, self.parse_workers, parse_queue, decode_queue, self.decode_workers),
+            self._stage("decode", decode_item, self.decode_workers, decode_queue, write_queue, self.write_workers),
+            *(self._write(write_queue, completion) for _ in range(self.write_workers)),
+        )
+        self._count("cycles")
+        return self.metrics()
+
+    async def run_cycle(self, pools: Optional[List[str]] = None) -> dict:
+        """
+        Run one live ingestion cycle over the pools (all configured pools if None) in the
+        configured coordination mode. In "shard" mode up to pool_concurrency pools run at the
+        same time, and every pool's row count is reported to the poll scheduler.
+        """
+        pools = settings.POOL_ADDRESSES if pools is None else pools
+        if settings.INGEST_COORDINATION == "leader":
+            return await self.run(leader_source(pools))
+
+        scheduler = get_poll_scheduler()
+        semaphore = asyncio.Semaphore(self.pool_concurrency)
+        fetched = {pool: 0 for pool in pools}
+
+        async def run_pool(pool: str):
+            async with semaphore:
+                try:
+                    await self.run(_counting(live_source(pool), fetched, pool))
+                except Exception as e:
+                    logger.error(f"Error in ingest pipeline for pool {pool}: {e}")
+                    scheduler.record(pool, None)
+                    return
+            scheduler.record(pool, fetched[pool])
+
+        await asyncio.gather(*(run_pool(pool) for pool in pools))
+        return self.metrics()
+
+    async def run_forever(self, interval: float):
+        """
+        Run ingestion cycles over the pools the scheduler finds due until cancelled, sleeping
+        until the next pool is due (interval seconds between cycles with a single pool).
+        """
+        scheduler = get_poll_scheduler()
+        while True:
+            started = time.monotonic()
+            due = scheduler.due()
+            try:
+                await self.run_cycle(due)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in ingest pipeline: {e}")
+            await asyncio.sleep(scheduler.next_cycle_in(due, interval, time.monotonic() - started))
+
+
+class _CompletionTracker:
+    """
+    Runs item callbacks in fetch order once every earlier item has been written.
+    """
+
+    def __init__(self, pipeline: IngestPipeline):
+        self.pipeline = pipeline
+        self.next_seq = 0
+        self.finished: Dict[int, PipelineItem] = {}
+        self.halted = False
+        self.lock = asyncio.Lock()
+
+    async def complete(self, items: List[PipelineItem]):
+        async with self.lock:
+            for item in items:
+                if item.failed:
+                    self.pipeline._count("failed_pages")
+                self.finished[item.seq] = item
+            while not self.halted and self.next_seq in self.finished:
+                item = self.finished.pop(self.next_seq)
+                if item.failed:
+                    self.halted = True
+                    break
+                if item.on_done is not None:
+                    try:
+                        await self.pipeline._blocking(item.on_done)
+                    except Exception as e:
+                        logger.error(f"Pipeline completion failed for page {item.seq}: {e}")
+                        self.halted = True
+                        break
+                self.next_seq += 1
+            if self.halted:
+                self.finished.clear()
+
+
+_pipeline: Optional[IngestPipeline] = None
+_pipeline_task: Optional[asyncio.Task] = None
+
+
+def get_pipeline() -> IngestPipeline:
+    """
+    Return the process-wide ingest pipeline, creating it on first use.
+    """
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = IngestPipeline(
+            parse_workers=settings.PIPELINE_PARSE_WORKERS,
+            decode_workers=settings.PIPELINE_DECODE_WORKERS,
+            write_workers=settings.PIPELINE_WRITE_WORKERS,
+            queue_size=settings.PIPELINE_QUEUE_SIZE,
+            write_batch_rows=settings.PIPELINE_WRITE_BATCH_ROWS,
+            pool_concurrency=settings.POOL_POLL_CONCURRENCY,
+        )
+    return _pipeline
+
+
+def start_pipeline() -> asyncio.Task:
+    """
+    Schedule the ingest pipeline on the running event loop (called from the startup hook).
+    """
+    global _pipeline_task
+    if _pipeline_task is None:
+        _pipeline_task = asyncio.get_running_loop().create_task(
+            get_pipeline().run_forever(settings.PIPELINE_POLL_INTERVAL))
+    return _pipeline_task
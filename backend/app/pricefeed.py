@@ -0,0 +1,205 @@
+"""
+ETH/USDT price feed.
+
+A background thread refreshes the price every PRICE_REFRESH_INTERVAL seconds and keeps the
+latest quote in memory together with the time it was fetched, so request handlers read it
+without any upstream round trip. Quotes are also stored in the price_quotes table: before
+calling Binance, a refresh adopts a quote that another worker stored recently, so all workers
+together call Binance about once per interval.
+"""
+import logging
+import threading
+import time
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from . import crud, database, models
+from .config import settings
+from .upstream import get_upstream_client
+
+logger = logging.getLogger("background_tasks")
+
+SYMBOL = "ETHUSDT"
+
+
+class PriceQuote(NamedTuple):
+    price: Decimal
+    # UNIX time at which the price was fetched from Binance
+    fetched_at: float
+
+    def age(self, now: Optional[float] = None) -> float:
+        return max(0.0, (now if now is not None else time.time()) - self.fetched_at)
+
+
+def fetch_binance_price() -> Decimal:
+    """
+    Fetch the current ETH/USDT price from Binance. Raises if no valid price is returned.
+    """
+    data = get_upstream_client().get_json("binance", settings.BINANCE_API_URL)
+    price = Decimal(data.get("price", "0"))
+    if price <= 0:
+        raise ValueError(f"Invalid ETH price from Binance: {data}")
+    return price
+
+
+class PriceFeed:
+    """
+    Latest ETH/USDT quote, refreshed in the background and shared through the database.
+    """
+
+    def __init__(self, fetch=fetch_binance_price, refresh_interval: float = 10, max_age: float = 60,
+                 shared: bool = True):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.shared = shared
+        self._quote: Optional[PriceQuote] = None
+        self._lock = threading.Lock()
+        # Serializes refreshes so concurrent callers of price() trigger a single upstream call.
+        self._refresh_lock = threading.Lock()
+        self._metrics = {"refreshes": 0, "shared_hits": 0, "failures": 0}
+
+    def metrics(self) -> dict:
+        """
+        Return the refresh counters and the age of the current quote in seconds.
+        """
+        quote = self.quote()
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["age_seconds"] = quote.age() if quote is not None else None
+        return metrics
+
+    def _count(self, name: str):
+        with self._lock:
+            self._metrics[name] += 1
+
+    def quote(self) -> Optional[PriceQuote]:
+        """
+        Return the latest known quote without blocking on upstream calls (None before the first
+        successful refresh).
+        """
+        with self._lock:
+            return self._quote
+
+    def set_quote(self, quote: PriceQuote):
+        with self._lock:
+            if self._quote is None or quote.fetched_at >= self._quote.fetched_at:
+                self._quote = quote
+
+    def _load_shared(self) -> Optional[PriceQuote]:
+        db = database.SessionLocal()
+        try:
+            row = db.query(models.PriceQuote).filter(models.PriceQuote.symbol == SYMBOL).first()
+            return PriceQuote(Decimal(row.price), row.fetched_at) if row is not None else None
+        finally:
+            db.close()
+
+    def _store_shared(self, quote: PriceQuote):
+        db = database.SessionLocal()
+        try:
+            table = models.PriceQuote.__table__
+            db.execute(
+                crud.insert_ignore(db, table).values(symbol=SYMBOL, price=quote.price, fetched_at=quote.fetched_at)
+            )
+            db.execute(
+                table.update()
+                .where(table.c.symbol == SYMBOL)
+                .where(table.c.fetched_at < quote.fetched_at)
+                .values(price=quote.price, fetched_at=quote.fetched_at)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def refresh(self) -> Optional[PriceQuote]:
+        """
+        Bring the quote up to date: adopt a quote younger than refresh_interval from the shared
+        table, otherwise fetch a new one from Binance. Returns the current quote afterwards.
+        """
+        with self._refresh_lock:
+            current = self.quote()
+            if current is not None and current.age() < self.refresh_interval:
+                return current
+            if self.shared:
+                try:
+                    shared = self._load_shared()
+                    if shared is not None and shared.age() < self.refresh_interval:
+                        self.set_quote(shared)
+                        self._count("shared_hits")
+                        return self.quote()
+                except Exception as e:
+                    logger.error(f"Could not read the shared ETH price: {e}")
+            try:
+                quote = PriceQuote(self.fetch(), time.time())
+            except Exception as e:
+                self._count("failures")
+                logger.error(f"Exception fetching ETH price: {e}")
+                return self.quote()
+            self.set_quote(quote)
+            self._count("refreshes")
+            if self.shared:
+                try:
+                    self._store_shared(quote)
+                except Exception as e:
+                    logger.error(f"Could not store the shared ETH price: {e}")
+            return quote
+
+    def price(self, max_age: Optional[float] = None) -> Decimal:
+        """
+        Return a price no older than max_age seconds (default self.max_age), refreshing
+        synchronously if the cached quote is older. If no fresh price can be fetched, the last
+        known price is returned, or 0 if there is none.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        quote = self.quote()
+        if quote is None or quote.age() > max_age:
+            quote = self.refresh()
+            if quote is not None and quote.age() > max_age:
+                logger.warning(f"Using an ETH price that is {quote.age():.0f}s old.")
+        return quote.price if quote is not None else Decimal("0")
+
+    def run_forever(self):
+        """
+        Refresh the quote every refresh_interval seconds (runs on the feed thread).
+        """
+        while True:
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error in price feed: {e}")
+            time.sleep(max(0.0, self.refresh_interval - (time.monotonic() - started)))
+
+
+_feed: Optional[PriceFeed] = None
+_feed_lock = threading.Lock()
+_feed_thread: Optional[threading.Thread] = None
+
+
+def get_price_feed() -> PriceFeed:
+    """
+    Return the process-wide price feed, creating it on first use.
+    """
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = PriceFeed(
+                    refresh_interval=settings.PRICE_REFRESH_INTERVAL,
+                    max_age=settings.PRICE_MAX_AGE,
+                    shared=settings.PRICE_SHARED,
+                )
+    return _feed
+
+
+def start_price_feed() -> threading.Thread:
+    """
+    Start the background refresh thread of the process-wide price feed (once).
+    """
+    global _feed_thread
+    feed = get_price_feed()
+    with _feed_lock:
+        if _feed_thread is None:
+            _feed_thread = threading.Thread(target=feed.run_forever, daemon=True, name="price-feed")
+            _feed_thread.start()
+    return _feed_thread
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from . import crud, database, models
+
+logger = logging.getLogger("background_tasks")
+
+
+def refill(tokens: float, updated_at: float, now: float, rate: float, capacity: float) -> float:
+    """
+    Return the number of tokens in a bucket after refilling it from updated_at to now.
+    """
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class DatabaseTokenBucket:
+    """
+    Token bucket rate limiter whose state lives in the rate_limit_buckets table.
+
+    Every backend instance that shares an upstream API key uses the same bucket row, so the
+    combined request rate stays at `rate` requests per second (with bursts of up to `capacity`)
+    no matter how many workers are running. The row is locked with SELECT ... FOR UPDATE while
+    tokens are taken, which serializes concurrent workers on MySQL.
+
+    If the database is unavailable the bucket falls back to an in-process bucket, so a database
+    hiccup slows ingestion down instead of stopping it.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: Optional[float] = None):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._local_tokens = self.capacity
+        self._local_updated_at = time.time()
+        self._lock = threading.Lock()
+        self._metrics = {"acquired": 0, "waits": 0, "wait_seconds": 0.0, "fallbacks": 0}
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Return a snapshot of the acquisition and wait-time counters.
+        """
+        with self._lock:
+            return dict(self._metrics)
+
+    def _take(self, tokens: float, updated_at: float, now: float):
+        """
+        Refill and try to take one token. Returns (new_tokens, seconds_to_wait).
+        """
+        tokens = refill(tokens, updated_at, now, self.rate, self.capacity)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+    def _try_acquire_db(self) -> float:
+        db = database.SessionLocal()
+        try:
+            now = time.time()
+            bucket = (
+                db.query(models.RateLimitBucket)
+                .filter(models.RateLimitBucket.name == self.name)
+                .with_for_update()
+                .first()
+            )
+            if bucket is None:
+                db.execute(crud.insert_ignore(db, models.RateLimitBucket.__table__).values(
+                    name=self.name, tokens=self.capacity, updated_at=now))
+                db.commit()
+                bucket = (
+                    db.query(models.RateLimitBucket)
+                    .filter(models.RateLimitBucket.name == self.name)
+                    .with_for_update()
+                    .one()
+                )
+            tokens, wait = self._take(bucket.tokens, bucket.updated_at, now)
+            bucket.tokens = tokens
+            bucket.updated_at = now
+            db.commit()
+            return wait
+        finally:
+            db.close()
+
+    def _try_acquire_local(self) -> float:
+        now = time.time()
+        tokens, wait = self._take(self._local_tokens, self._local_updated_at, now)
+        self._local_tokens = tokens
+        self._local_updated_at = now
+        return wait
+
+    def try_acquire(self) -> float:
+        """
+        Try to take one token. Returns 0 on success, otherwise the seconds until one is available.
+        """
+        try:
+            return self._try_acquire_db()
+        except Exception as e:
+            logger.error(f"Rate limiter {self.name} falling back to the local bucket: {e}")
+            with self._lock:
+                self._metrics["fallbacks"] += 1
+                return self._try_acquire_local()
+
+    def acquire(self) -> float:
+        """
+        Block until a token is available and return the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        with self._lock:
+            self._metrics["acquired"] += 1
+            if waited > 0:
+                self._metrics["waits"] += 1
+                self._metrics["wait_seconds"] += waited
+        return waited
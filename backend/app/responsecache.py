@@ -0,0 +1,232 @@
+"""
+Read-through cache of API responses (GET /summary, GET /transactions/ and GET /transactions/{tx_hash}).
+
+Every write that changes what these endpoints return (inserts, swap price updates, rollup
+rebuilds) bumps the data version in the data_versions table within its own transaction, so the
+version changes exactly when the write commits and every worker sees it through the database.
+Entries live in an LRU of RESPONSE_CACHE_SIZE entries, keyed by the endpoint and its normalized
+parameters, and are only served while the version they were built at is current. A worker reads
+the version at most once per RESPONSE_CACHE_VERSION_TTL seconds, so a cached response can lag a
+commit by that long.
+
+Responses carry an ETag derived from their content, so all workers behind the load balancer send
+the same ETag for the same data, and a request whose If-None-Match matches it gets 304 Not
+Modified without a body.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from . import crud
+from .config import settings
+
+# Headers of a rendered response that are not stored with it; the cache sets them itself.
+_RENDERED_HEADERS = {"content-length", "content-type", "etag"}
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    media_type: Optional[str]
+    etag: str
+    # Other headers of the response (such as X-Next-Cursor)
+    headers: List[Tuple[str, str]]
+
+
+def make_etag(content: bytes, weak: bool = False) -> str:
+    """
+    Return the ETag of content: a hash, so that every worker computes the same one.
+    """
+    tag = '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+    return "W/" + tag if weak else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header with an ETag, as for GET requests.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    LRU cache of key -> value, where every entry is valid for the data version it was stored at.
+    The first element of a key names the endpoint; counters are kept per endpoint.
+    """
+
+    def __init__(self, maxsize: int = 1000, version_ttl: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.version_ttl = version_ttl
+        self.clock = clock
+        # key -> (version, value), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._version_read_at = 0.0
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "not_modified": 0})
+        self._metrics = {"evictions": 0, "stale": 0, "version_reads": 0}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def metrics(self) -> dict:
+        """
+        Return the hit, miss and 304 counters (in total and per endpoint), the hit rate, the
+        evictions and the number of cached entries.
+        """
+        with self._lock:
+            endpoints = {name: dict(counters) for name, counters in self._counters.items()}
+            metrics = dict(self._metrics, size=len(self._entries), version=self._version)
+        for counters in endpoints.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        for name in ("hits", "misses", "not_modified"):
+            metrics[name] = sum(counters[name] for counters in endpoints.values())
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+        metrics["endpoints"] = endpoints
+        return metrics
+
+    def known_version(self) -> Optional[int]:
+        """
+        Return the data version read within the last version_ttl seconds, or None.
+        """
+        with self._lock:
+            if self._version is not None and self.clock() - self._version_read_at < self.version_ttl:
+                return self._version
+        return None
+
+    def set_version(self, version: int):
+        with self._lock:
+            self._version = version
+            self._version_read_at = self.clock()
+            self._metrics["version_reads"] += 1
+
+    async def data_version(self, db) -> int:
+        """
+        Return the current data version, reading it through db (a session of get_async_db) when
+        the known one is older than version_ttl.
+        """
+        version = self.known_version()
+        if version is None:
+            version = await db.run_sync(crud.get_data_version)
+            self.set_version(version)
+        return version
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        """
+        Return the value cached for key at version, or None. Entries of an older version are dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                del self._entries[key]
+                self._metrics["stale"] += 1
+                entry = None
+            if entry is None:
+                self._counters[key[0]]["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters[key[0]]["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: int, value: Any):
+        """
+        Cache value for key at version, evicting the least recently used entries when full.
+        """
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+    def not_modified(self, endpoint: str, if_none_match: Optional[str], etag: str) -> bool:
+        """
+        Return whether a request with the If-None-Match header if_none_match can be answered with
+        304 for a response with etag, counting the 304s per endpoint.
+        """
+        if not etag_matches(if_none_match, etag):
+            return False
+        with self._lock:
+            self._counters[endpoint]["not_modified"] += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Return the process-wide response cache, creating it on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(maxsize=settings.RESPONSE_CACHE_SIZE,
+                                       version_ttl=settings.RESPONSE_CACHE_VERSION_TTL)
+    return _cache
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def cached_value(db, key: Tuple, load: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return the value of key from the cache, or await load() and cache its result.
+    Without RESPONSE_CACHE, always return load().
+    """
+    if not settings.RESPONSE_CACHE:
+        return await load()
+    cache = get_response_cache()
+    version = await cache.data_version(db)
+    value = cache.get(key, version)
+    if value is None:
+        value = await load()
+        cache.put(key, version, value)
+    return value
+
+
+async def cached_response(request: Request, db, key: Tuple, render: Callable[[], Awaitable[Response]]) -> Response:
+    """
+    Return the response of key from the cache, or the one built by render() (which is cached);
+    304 Not Modified if the request's If-None-Match matches its ETag. Errors raised by render
+    (HTTPException) are passed on and not cached. Without RESPONSE_CACHE, return render() as is.
+    """
+    if not settings.RESPONSE_CACHE:
+        return await render()
+
+    async def load() -> CachedResponse:
+        response = await render()
+        headers = [(name, value) for name, value in response.headers.items() if name not in _RENDERED_HEADERS]
+        return CachedResponse(response.body, response.media_type, make_etag(response.body), headers)
+
+    cached = await cached_value(db, key, load)
+    if get_response_cache().not_modified(key[0], request.headers.get("if-none-match"), cached.etag):
+        return not_modified_response(cached.etag)
+    response = Response(cached.body, media_type=cached.media_type, headers={"ETag": cached.etag})
+    for name, value in cached.headers:
+        response.headers.append(name, value)
+    return response
@@ -0,0 +1,194 @@
+"""
+Fee rollups: per-minute, per-hour and per-day totals of the transactions table.
+
+Every insert path adds its rows to the fee_rollups table in the same database transaction as
+the insert, so /summary and /summary/series read a handful of pre-aggregated rows instead of
+scanning the transactions table. If the rollups ever drift (e.g. rows were written or deleted
+outside the application), rebuild them from the transactions table with
+
+    python -m app.rollups rebuild [--start 2024-01-01] [--end 2024-02-01]
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import database, models
+
+logger = logging.getLogger("background_tasks")
+
+BUCKETS = ("minute", "hour", "day")
+
+
+def bucket_start(time_stamp: datetime, bucket: str) -> datetime:
+    """
+    Return the start of the bucket of the given size that contains time_stamp.
+    """
+    if bucket == "minute":
+        return time_stamp.replace(second=0, microsecond=0)
+    if bucket == "hour":
+        return time_stamp.replace(minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return time_stamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown bucket: {bucket}")
+
+
+def aggregate(rows: Iterable[dict]) -> Dict[Tuple[str, datetime], list]:
+    """
+    Sum transaction rows into [tx_count, fee_eth, fee_usdt] per (bucket, bucket_start).
+    """
+    totals = defaultdict(lambda: [0, Decimal("0"), Decimal("0")])
+    for row in rows:
+        for bucket in BUCKETS:
+            total = totals[(bucket, bucket_start(row["time_stamp"], bucket))]
+            total[0] += 1
+            total[1] += Decimal(row["fee_eth"])
+            total[2] += Decimal(row["fee_usdt"])
+    return totals
+
+
+def upsert_increments(db: Session, totals: Dict[Tuple[str, datetime], list]):
+    """
+    Add totals to the rollup rows, creating missing ones, with one atomic upsert statement.
+    """
+    if not totals:
+        return
+    table = models.FeeRollup.__table__
+    values = [
+        {"bucket": bucket, "bucket_start": start, "tx_count": count, "fee_eth": fee_eth, "fee_usdt": fee_usdt}
+        for (bucket, start), (count, fee_eth, fee_usdt) in totals.items()
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table).values(values)
+        db.execute(stmt.on_duplicate_key_update(
+            tx_count=table.c.tx_count + stmt.inserted.tx_count,
+            fee_eth=table.c.fee_eth + stmt.inserted.fee_eth,
+            fee_usdt=table.c.fee_usdt + stmt.inserted.fee_usdt,
+        ))
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(values)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.bucket, table.c.bucket_start],
+            set_={
+                "tx_count": table.c.tx_count + stmt.excluded.tx_count,
+                "fee_eth": table.c.fee_eth + stmt.excluded.fee_eth,
+                "fee_usdt": table.c.fee_usdt + stmt.excluded.fee_usdt,
+            },
+        ))
+    else:
+        raise NotImplementedError(f"Fee rollups are not supported on {dialect}")
+
+
+def add_transactions(db: Session, rows: List[dict]):
+    """
+    Add freshly inserted transaction rows to the rollups. The caller owns the transaction, so
+    the rollups commit (or roll back) together with the rows.
+    """
+    upsert_increments(db, aggregate(rows))
+
+
+def _day_range(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    # Whole days, so that every minute, hour and day bucket in the range is rebuilt completely.
+    return bucket_start(start, "day"), bucket_start(end, "day") + timedelta(days=1)
+
+
+def rebuild_range(db: Session, start: datetime, end: datetime):
+    """
+    Recompute the rollups of the whole days touched by [start, end] from the transactions table.
+    The caller owns the transaction and must commit.
+    """
+    start, end = _day_range(start, end)
+    db.query(models.FeeRollup).filter(
+        models.FeeRollup.bucket_start >= start, models.FeeRollup.bucket_start < end
+    ).delete(synchronize_session=False)
+    rows = (
+        db.query(models.Transaction.time_stamp, models.Transaction.fee_eth, models.Transaction.fee_usdt)
+        .filter(models.Transaction.time_stamp >= start, models.Transaction.time_stamp < end)
+        .yield_per(10000)
+    )
+    upsert_increments(db, aggregate(
+        {"time_stamp": time_stamp, "fee_eth": fee_eth, "fee_usdt": fee_usdt} for time_stamp, fee_eth, fee_usdt in rows
+    ))
+
+
+def rebuild(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """
+    Rebuild the rollups day by day (all of them unless a range is given) and commit after every
+    day, bumping the data version so that cached summaries are dropped. Returns the number of
+    days rebuilt.
+    """
+    from .crud import bump_data_version
+    first, last = db.query(func.min(models.Transaction.time_stamp), func.max(models.Transaction.time_stamp)).one()
+    if start is None and end is None:
+        # A full rebuild also drops rollups that no longer have any transactions.
+        db.query(models.FeeRollup).delete(synchronize_session=False)
+        bump_data_version(db)
+        db.commit()
+    if first is None:
+        return 0
+    start = max(start or first, first)
+    end = min(end or last, last)
+    days = 0
+    day = bucket_start(start, "day")
+    while day <= end:
+        rebuild_range(db, day, day)
+        bump_data_version(db)
+        db.commit()
+        days += 1
+        day += timedelta(days=1)
+    return days
+
+
+def get_totals(db: Session) -> Tuple[Decimal, Decimal]:
+    """
+    Return the total fees (ETH, USDT) over all transactions from the day rollups.
+    """
+    result = db.query(
+        func.coalesce(func.sum(models.FeeRollup.fee_eth), 0),
+        func.coalesce(func.sum(models.FeeRollup.fee_usdt), 0)
+    ).filter(models.FeeRollup.bucket == "day").one()
+    return result[0], result[1]
+
+
+def get_series(db: Session, bucket: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               limit: int = 1000) -> List[models.FeeRollup]:
+    """
+    Return the rollup rows of one bucket size between start and end, oldest first.
+    """
+    query = db.query(models.FeeRollup).filter(models.FeeRollup.bucket == bucket)
+    if start:
+        query = query.filter(models.FeeRollup.bucket_start >= bucket_start(start, bucket))
+    if end:
+        query = query.filter(models.FeeRollup.bucket_start <= end)
+    return query.order_by(models.FeeRollup.bucket_start).limit(limit).all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the fee rollup tables.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Recompute rollups from the transactions table.")
+    rebuild_parser.add_argument("--start", type=datetime.fromisoformat, help="First day to rebuild (ISO format)")
+    rebuild_parser.add_argument("--end", type=datetime.fromisoformat, help="Last day to rebuild (ISO format)")
+    args = parser.parse_args(argv)
+
+    db = database.SessionLocal()
+    try:
+        days = rebuild(db, args.start, args.end)
+        print(f"Rebuilt fee rollups for {days} days.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,253 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import parse_obj_as
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from typing import List, Optional
-from .. import crud, schemas, tasks
-from ..database import SessionLocal
+from decimal import Decimal
+from typing import Dict, List, Optional
+from .. import backfill, crud, database, export, fastjson, responsecache, schemas
+from ..blockindex import get_block_index
+from ..config import settings
+from ..database import get_async_db
+from ..swapcache import get_swap_price_cache
+from ..upstream import run_upstream
 
 router = APIRouter(
     prefix="/transactions",
     tags=["transactions"]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _model_response(model, content) -> JSONResponse:
+    """
+    Encode content the way FastAPI does for a route with response_model=model.
+    """
+    return JSONResponse(jsonable_encoder(parse_obj_as(model, content)))
 
 @router.get("/", response_model=List[schemas.Transaction])
-def read_transactions(
+async def read_transactions(
+    request: Request,
     tx_hash: Optional[str] = Query(None, description="Transaction hash to filter"),
     start_time: Optional[datetime] = Query(None, description="Start time in ISO format"),
     end_time: Optional[datetime] = Query(None, description="End time in ISO format"),
-    page: int = Query(1, ge=1, description="Page number"),
+    page: int = Query(1, ge=1, description="Page number (ignored when cursor is given)"),
     page_size: int = Query(50, ge=1, le=100, description="Number of transactions per page"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    pool: Optional[str] = Query(None, description="Pool address to filter"),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    List transactions, newest first. The X-Next-Cursor response header holds the cursor of the
+    next page (absent on the last page); passing it back as cursor pages by key instead of by
+    offset, so every page costs the same no matter how deep it is.
+    With FAST_JSON, only the response columns are selected and encoded straight to JSON.
+    Responses are cached per parameters and carry an ETag (see app.responsecache).
+    """
+    after = None
     skip = (page - 1) * page_size
-    transactions = crud.get_transactions(db, tx_hash, start_time, end_time, skip, page_size)
-    return transactions
+    if cursor:
+        try:
+            after = crud.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        skip = 0
+    pool = pool.lower() if pool else None
+
+    async def render() -> Response:
+        index = get_block_index()
+        if index.stale:
+            await db.run_sync(index.load)
+        min_block, max_block = index.block_bounds(start_time, end_time)
+        columns = fastjson.FIELDS if settings.FAST_JSON else None
+        transactions = await db.run_sync(crud.get_transactions, tx_hash, start_time, end_time, skip, page_size,
+                                         min_block, max_block, after, pool, columns)
+        if settings.FAST_JSON:
+            response = fastjson.FastJSONResponse(fastjson.transaction_dicts(transactions))
+        else:
+            response = _model_response(List[schemas.Transaction], transactions)
+        if len(transactions) == page_size:
+            response.headers["X-Next-Cursor"] = crud.encode_cursor(transactions[-1])
+        return response
+
+    key = ("transactions", tx_hash or None, start_time, end_time, skip, page_size, after, pool)
+    return await responsecache.cached_response(request, db, key, render)
 
 @router.post("/historical")
-def historical_processing(start_time: datetime, end_time: datetime):
+async def historical_processing(start_time: datetime, end_time: datetime, pool: Optional[str] = None,
+                                db: AsyncSession = Depends(get_async_db)):
+    """
+    Trigger historical processing for transactions within the given time range, for one of the
+    configured pools (POOL_ADDRESS if not given).
+    This endpoint records a backfill job and runs it on a background thread; its progress is
+    available from GET /transactions/historical/{job_id}.
+    """
+    if end_time < start_time:
+        raise HTTPException(status_code=400, detail="end_time must not be before start_time")
+    if pool is not None and pool.lower() not in settings.POOL_ADDRESSES:
+        raise HTTPException(status_code=400, detail=f"Pool {pool} is not configured")
+    job = await db.run_sync(backfill.create_job, start_time, end_time, pool)
+    backfill.start_job(job.id)
+    return {"message": "Historical processing initiated.", "job_id": job.id}
+
+@router.post("/batch", response_model=List[schemas.TransactionLookup])
+async def read_transactions_batch(batch: schemas.TxHashBatch, db: AsyncSession = Depends(get_async_db)):
+    """
+    Look up many transactions by hash with one query. Returns one entry per distinct hash, in
+    request order, with status "found" or "not_found".
+    """
+    tx_hashes = list(dict.fromkeys(batch.tx_hashes))
+    if len(tx_hashes) > settings.BATCH_LOOKUP_MAX_HASHES:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {settings.BATCH_LOOKUP_MAX_HASHES} hashes per request")
+    if settings.FAST_JSON:
+        rows = await db.run_sync(crud.get_transactions_by_hashes, tx_hashes, fastjson.FIELDS)
+        transactions = dict(zip(rows, fastjson.transaction_dicts(rows.values())))
+    else:
+        transactions = await db.run_sync(crud.get_transactions_by_hashes, tx_hashes)
+    results = [
+        {"tx_hash": tx_hash, "status": "found", "transaction": transactions[tx_hash]} if tx_hash in transactions
+        else {"tx_hash": tx_hash, "status": "not_found", "transaction": None}
+        for tx_hash in tx_hashes
+    ]
+    return fastjson.FastJSONResponse(results) if settings.FAST_JSON else results
+
+def _job_status(db, load, job_id: int):
+    """
+    Load a backfill job with load(db, job_id) and return its status, or None if there is no such job.
+    """
+    job = load(db, job_id)
+    return backfill.job_status(db, job) if job is not None else None
+
+@router.get("/historical/{job_id}", response_model=schemas.BackfillJobStatus)
+async def historical_status(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    status = await db.run_sync(_job_status, backfill.get_job, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return status
+
+@router.post("/historical/{job_id}/cancel", response_model=schemas.BackfillJobStatus)
+async def cancel_historical(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    status = await db.run_sync(_job_status, backfill.cancel_job, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return status
+
+@router.get("/export")
+async def export_transactions(
+    start_time: Optional[datetime] = Query(None, description="Start time in ISO format"),
+    end_time: Optional[datetime] = Query(None, description="End time in ISO format"),
+    format: str = Query("ndjson", regex="^(ndjson|csv|parquet)$", description="ndjson, csv or parquet"),
+    pool: Optional[str] = Query(None, description="Pool address to filter"),
+):
     """
-    Trigger historical processing for transactions within the given time range.
-    This endpoint starts a background thread to process historical transactions.
+    Stream all transactions in the time range, oldest first, as NDJSON, CSV or Parquet. Rows go
+    from a server-side cursor to the response chunk by chunk, so memory use does not depend on the
+    size of the range.
     """
-    tasks.start_historical_processing(start_time, end_time)
-    return {"message": "Historical processing started."}
+    if start_time is not None and end_time is not None and end_time < start_time:
+        raise HTTPException(status_code=400, detail="end_time must not be before start_time")
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires the pyarrow package")
+    index = get_block_index()
+    if index.stale:
+        await run_in_threadpool(index.load)
+    return StreamingResponse(
+        export.stream(format, start_time, end_time, pool),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'},
+    )
 
 @router.get("/{tx_hash}", response_model=schemas.Transaction)
-def read_transaction(tx_hash: str, db: Session = Depends(get_db)):
-    transaction = crud.get_transaction_by_hash(db, tx_hash)
-    if transaction is None:
+async def read_transaction(tx_hash: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get one transaction by hash. Responses are cached and carry an ETag (see app.responsecache).
+    """
+    async def render() -> Response:
+        if settings.FAST_JSON:
+            rows = await db.run_sync(crud.get_transactions_by_hashes, [tx_hash], fastjson.FIELDS)
+            if rows:
+                return fastjson.FastJSONResponse(fastjson.transaction_dicts(rows.values())[0])
+        else:
+            transaction = await db.run_sync(crud.get_transaction_by_hash, tx_hash)
+            if transaction is not None:
+                return _model_response(schemas.Transaction, transaction)
         raise HTTPException(status_code=404, detail="Transaction not found")
-    return transaction
 
-@router.post("/historical", response_model=dict)
-def process_historical_transactions(
-    start_time: datetime,
-    end_time: datetime,
-    db: Session = Depends(get_db)
-):
-    # Stub implementation for historical processing.
-    return {"message": "Historical processing initiated. (Not implemented)"}
+    return await responsecache.cached_response(request, db, ("transaction", tx_hash), render)
+
+def _decode_and_store(tx_hash: str) -> Decimal:
+    """
+    Decode the swap price of a transaction (through the cache) and store it, on an upstream thread.
+    """
+    swap_price = get_swap_price_cache().get(tx_hash)
+    if swap_price > 0:
+        db = database.SessionLocal()
+        try:
+            crud.update_swap_price(db, tx_hash, swap_price)
+        finally:
+            db.close()
+    return swap_price
 
 @router.get("/swapprice/{tx_hash}", response_model=schemas.SwapPriceResponse)
-def get_swap_price(tx_hash: str, db: Session = Depends(get_db)):
+async def get_swap_price(tx_hash: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get the decoded swap price for a transaction.
-    If the transaction exists but does not have a swap price, decode it on the fly.
+    If the transaction exists but does not have a swap price, decode it on the fly; decoded
+    prices and failures are cached and concurrent requests share one decode. The decode and the
+    update run on the upstream threads, so waiting for Infura does not hold up other requests.
     """
-    transaction = crud.get_transaction_by_hash(db, tx_hash)
+    transaction = await db.run_sync(crud.get_transaction_by_hash, tx_hash)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     if transaction.swap_price is None:
-        swap_price = tasks.decode_swap_price(tx_hash)
+        # End the read transaction, so no pooled connection is held while Infura answers.
+        await db.rollback()
+        swap_price = await run_upstream(_decode_and_store, tx_hash)
         if swap_price == 0:
             raise HTTPException(status_code=400, detail="Swap price could not be decoded")
-        transaction = crud.update_swap_price(db, tx_hash, swap_price)
+        return schemas.SwapPriceResponse(tx_hash=tx_hash, swap_price=swap_price)
     return schemas.SwapPriceResponse(tx_hash=transaction.tx_hash, swap_price=transaction.swap_price)
+
+def _decode_and_store_many(missing: Dict[str, str]) -> Dict[str, Decimal]:
+    """
+    Decode the swap prices of many transactions together (missing maps hash to pool) and store
+    the decoded ones with one UPDATE, on an upstream thread.
+    """
+    decoded = get_swap_price_cache().get_many(list(missing), missing)
+    db = database.SessionLocal()
+    try:
+        if crud.bulk_update_swap_prices(db, {tx_hash: price for tx_hash, price in decoded.items() if price > 0}):
+            db.commit()
+    finally:
+        db.close()
+    return decoded
+
+@router.post("/swapprice/batch", response_model=List[schemas.SwapPriceLookup])
+async def get_swap_prices_batch(batch: schemas.TxHashBatch, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the swap prices of many transactions. Stored rows are read with one query, and the
+    prices that are not stored yet are decoded together (batched receipt calls, through the swap
+    price cache) and saved with one UPDATE, on an upstream thread. Returns one entry per distinct
+    hash, in request order, with status "stored", "decoded", "undecodable" or "not_found".
+    """
+    tx_hashes = list(dict.fromkeys(batch.tx_hashes))
+    if len(tx_hashes) > settings.BATCH_LOOKUP_MAX_HASHES:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {settings.BATCH_LOOKUP_MAX_HASHES} hashes per request")
+    rows = await db.run_sync(crud.get_swap_prices_by_hashes, tx_hashes)
+    stored = {tx_hash: price for tx_hash, (price, _) in rows.items() if price is not None}
+    missing = {tx_hash: pool for tx_hash, (price, pool) in rows.items() if price is None}
+    await db.rollback()
+    decoded = await run_upstream(_decode_and_store_many, missing) if missing else {}
+    results = []
+    for tx_hash in tx_hashes:
+        if tx_hash in stored:
+            results.append(schemas.SwapPriceLookup(tx_hash=tx_hash, status="stored", swap_price=stored[tx_hash]))
+        elif tx_hash not in missing:
+            results.append(schemas.SwapPriceLookup(tx_hash=tx_hash, status="not_found"))
+        elif decoded[tx_hash] > 0:
+            results.append(schemas.SwapPriceLookup(tx_hash=tx_hash, status="decoded", swap_price=decoded[tx_hash]))
+        else:
+            results.append(schemas.SwapPriceLookup(tx_hash=tx_hash, status="undecodable"))
+    return results
@@ -0,0 +1,153 @@
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import settings
+
+logger = logging.getLogger("background_tasks")
+
+
+class RpcError(Exception):
+    """
+    Raised when the Ethereum node returns an error for a JSON-RPC call. code is the JSON-RPC
+    error code, if the node sent one.
+    """
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class RpcClient:
+    """
+    Long-lived JSON-RPC client for an Ethereum node (Infura).
+
+    A single keep-alive requests.Session with a pooled HTTPAdapter is reused for every call, so
+    the TLS handshake is paid once per connection instead of once per transaction. Calls that
+    are issued for many inputs at once are sent as JSON-RPC batch requests of at most
+    batch_size entries each, up to `concurrency` of them in parallel.
+    """
+
+    def __init__(self, url: str, batch_size: int = 50, timeout: float = 10, pool_size: int = 10,
+                 concurrency: int = 1):
+        self.url = url
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, min(concurrency, pool_size))
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._ids = itertools.count(1)
+        self._ids_lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._ids_lock:
+            return next(self._ids)
+
+    def _post(self, payload):
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def call(self, method: str, params: list):
+        """
+        Execute a single JSON-RPC call and return its result.
+        """
+        data = self._post({"jsonrpc": "2.0", "id": self._next_id(), "method": method, "params": params})
+        error = data.get("error")
+        if error:
+            raise RpcError(f"{method} failed: {error}", error.get("code") if isinstance(error, dict) else None)
+        return data.get("result")
+
+    def batch_call(self, method: str, params_list: List[list]) -> List[Optional[object]]:
+        """
+        Execute the same JSON-RPC method for every entry of params_list using batch requests.
+
+        Results are returned in the order of params_list. Entries that failed, either because the
+        node returned an error for them or because their whole batch could not be sent, are None.
+        """
+        results: List[Optional[object]] = [None] * len(params_list)
+        starts = range(0, len(params_list), self.batch_size)
+        if self.concurrency > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(starts))) as executor:
+                list(executor.map(lambda start: self._send_batch(method, params_list, start, results), starts))
+        else:
+            for start in starts:
+                self._send_batch(method, params_list, start, results)
+        return results
+
+    def _send_batch(self, method: str, params_list: List[list], start: int, results: List[Optional[object]]):
+        """
+        Send the batch of params_list that begins at start and store its results in place.
+        """
+        chunk = params_list[start:start + self.batch_size]
+        ids = {}
+        payload = []
+        for offset, params in enumerate(chunk):
+            request_id = self._next_id()
+            ids[request_id] = start + offset
+            payload.append({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        try:
+            data = self._post(payload)
+        except Exception as e:
+            logger.error(f"JSON-RPC batch {method} of {len(chunk)} calls failed: {e}")
+            return
+        # A node may answer a batch with a single error object (e.g. batch too large).
+        if isinstance(data, dict):
+            logger.error(f"JSON-RPC batch {method} rejected: {data.get('error')}")
+            return
+        for item in data:
+            index = ids.get(item.get("id"))
+            if index is None:
+                continue
+            if item.get("error"):
+                logger.error(f"JSON-RPC {method} failed for {params_list[index]}: {item['error']}")
+                continue
+            results[index] = item.get("result")
+
+    def get_transaction_receipts(self, tx_hashes: Iterable[str]) -> Dict[str, dict]:
+        """
+        Fetch the receipts for many transactions with batched eth_getTransactionReceipt calls.
+        Hashes whose receipt could not be fetched are missing from the returned dict.
+        """
+        tx_hashes = list(tx_hashes)
+        receipts = self.batch_call("eth_getTransactionReceipt", [[tx_hash] for tx_hash in tx_hashes])
+        return {tx_hash: receipt for tx_hash, receipt in zip(tx_hashes, receipts) if receipt is not None}
+
+    def get_block_header(self, block="latest") -> Tuple[int, int]:
+        """
+        Return (block_number, timestamp) of a block, given by number or by tag such as "latest".
+        """
+        tag = hex(block) if isinstance(block, int) else block
+        header = self.call("eth_getBlockByNumber", [tag, False])
+        if header is None:
+            raise RpcError(f"Block {block} not found")
+        return int(header["number"], 16), int(header["timestamp"], 16)
+
+
+_client: Optional[RpcClient] = None
+_client_lock = threading.Lock()
+
+
+def get_rpc_client() -> RpcClient:
+    """
+    Return the process-wide RPC client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RpcClient(
+                    settings.INFURA_URL,
+                    batch_size=settings.RPC_BATCH_SIZE,
+                    timeout=settings.RPC_TIMEOUT,
+                    pool_size=settings.RPC_POOL_SIZE,
+                    concurrency=settings.RPC_BATCH_CONCURRENCY,
+                )
+    return _client
@@ -0,0 +1,183 @@
+"""
+Live poll scheduler for many pools.
+
+Every pool has its own poll interval between POOL_POLL_MIN_INTERVAL and POOL_POLL_MAX_INTERVAL.
+A poll that returns at least POOL_BUSY_ROWS rows halves the pool's interval, a poll that returns
+nothing doubles it, so busy pools are polled often and quiet ones rarely. Due pools are polled
+POOL_POLL_CONCURRENCY at a time, busiest first. All polls draw on the same upstream budget (the
+shared Etherscan rate limiter), so adding quiet pools costs little of it and does not delay the
+busy ones.
+
+The live polling loops sleep until the next pool is due. A deployment with a single pool keeps
+the fixed cadence of its loop (POLL_INTERVAL, or PIPELINE_POLL_INTERVAL for the pipeline).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger("background_tasks")
+
+
+class PoolState:
+    def __init__(self, address: str, interval: float):
+        self.address = address
+        self.interval = interval
+        self.next_poll_at = 0.0
+        self.polls = 0
+        self.failures = 0
+        self.last_rows: Optional[int] = None
+
+
+class PollScheduler:
+    """
+    Decides which pools are due and adapts each pool's interval to its activity.
+    """
+
+    def __init__(self, pools: List[str], min_interval: float = 12, max_interval: float = 600,
+                 busy_rows: int = 100, concurrency: int = 4, clock: Callable[[], float] = time.monotonic):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.busy_rows = max(1, busy_rows)
+        self.concurrency = max(1, concurrency)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pools: Dict[str, PoolState] = {}
+        for address in pools:
+            self.add_pool(address)
+
+    def add_pool(self, address: str):
+        """
+        Start scheduling a pool; it is due immediately.
+        """
+        with self._lock:
+            self._pools.setdefault(address.lower(), PoolState(address.lower(), self.min_interval))
+
+    def pools(self) -> List[str]:
+        with self._lock:
+            return list(self._pools)
+
+    def due(self) -> List[str]:
+        """
+        Return the pools whose next poll is due, busiest (shortest interval) first.
+        """
+        now = self.clock()
+        with self._lock:
+            states = [state for state in self._pools.values() if state.next_poll_at <= now]
+        states.sort(key=lambda state: (state.interval, -(state.last_rows or 0)))
+        return [state.address for state in states]
+
+    def record(self, address: str, rows: Optional[int]):
+        """
+        Record the outcome of a poll: the number of fetched rows, or None if the poll failed.
+        """
+        now = self.clock()
+        with self._lock:
+            state = self._pools[address.lower()]
+            state.polls += 1
+            if rows is None:
+                state.failures += 1
+            else:
+                state.last_rows = rows
+                if rows >= self.busy_rows:
+                    state.interval = max(self.min_interval, state.interval / 2)
+                elif rows == 0:
+                    state.interval = min(self.max_interval, state.interval * 2)
+            state.next_poll_at = now + state.interval
+
+    def postpone(self, pools: List[str]):
+        """
+        Push the pools that are still due back by their interval, without counting a poll: this
+        instance did not poll them (another instance leads, or the cycle failed early).
+        """
+        now = self.clock()
+        with self._lock:
+            for address in pools:
+                state = self._pools.get(address.lower())
+                if state is not None and state.next_poll_at <= now:
+                    state.next_poll_at = now + state.interval
+
+    def wait_time(self) -> float:
+        """
+        Return the number of seconds until the next pool is due.
+        """
+        now = self.clock()
+        with self._lock:
+            next_poll_at = min((state.next_poll_at for state in self._pools.values()), default=now + self.min_interval)
+        return max(0.0, next_poll_at - now)
+
+    def next_cycle_in(self, polled: List[str], fallback: float, elapsed: float) -> float:
+        """
+        Return the seconds a polling loop waits after a cycle over the pools polled that took
+        elapsed seconds: until the next pool is due, or with a single pool the rest of fallback.
+        """
+        self.postpone(polled)
+        with self._lock:
+            single = len(self._pools) == 1
+        if single:
+            return max(0.0, fallback - elapsed)
+        return self.wait_time()
+
+    def run(self, poll: Callable[[str], int], pools: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Poll the given pools, concurrency at a time, and record the outcomes. poll(address)
+        returns the number of fetched rows. Returns the outcome per pool (None if it failed).
+        """
+        def run_one(address: str) -> Optional[int]:
+            try:
+                rows = poll(address)
+            except Exception as e:
+                logger.error(f"Error polling pool {address}: {e}")
+                rows = None
+            self.record(address, rows)
+            return rows
+
+        if not pools:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(pools)), thread_name_prefix="pool-poll") as pool:
+            return dict(zip(pools, pool.map(run_one, pools)))
+
+    def run_due(self, poll: Callable[[str], int]) -> Dict[str, Optional[int]]:
+        return self.run(poll, self.due())
+
+    def metrics(self) -> dict:
+        """
+        Return the interval, poll count, failures and last row count of every pool.
+        """
+        now = self.clock()
+        with self._lock:
+            return {
+                state.address: {
+                    "interval_seconds": state.interval,
+                    "next_poll_in_seconds": max(0.0, state.next_poll_at - now),
+                    "polls": state.polls,
+                    "failures": state.failures,
+                    "last_rows": state.last_rows,
+                }
+                for state in self._pools.values()
+            }
+
+
+_scheduler: Optional[PollScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_poll_scheduler() -> PollScheduler:
+    """
+    Return the process-wide poll scheduler for the configured pools, creating it on first use.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = PollScheduler(
+                    settings.POOL_ADDRESSES,
+                    min_interval=settings.POOL_POLL_MIN_INTERVAL,
+                    max_interval=settings.POOL_POLL_MAX_INTERVAL,
+                    busy_rows=settings.POOL_BUSY_ROWS,
+                    concurrency=settings.POOL_POLL_CONCURRENCY,
+                )
+    return _scheduler
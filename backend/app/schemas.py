@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 class TransactionBase(BaseModel):
     tx_hash: str
@@ -17,6 +17,8 @@ class TransactionBase(BaseModel):
     # Provide a default value using a default factory so that this field is not required on input.
     created_at: datetime = Field(default_factory=datetime.utcnow)
     swap_price: Optional[Decimal] = None
+    # Pool the swap was ingested from; POOL_ADDRESS if not given
+    pool_address: Optional[str] = None
 
 class TransactionCreate(TransactionBase):
     pass
@@ -31,8 +33,56 @@ class Summary(BaseModel):
     total_fee_eth: Decimal
     total_fee_usdt: Decimal
     current_eth_price: Decimal
+    # Seconds since current_eth_price was fetched; None if no price is known yet
+    price_age_seconds: Optional[float] = None
+
+class FeeBucket(BaseModel):
+    bucket_start: datetime
+    tx_count: int
+    total_fee_eth: Decimal
+    total_fee_usdt: Decimal
+    avg_fee_eth: Decimal
+    avg_fee_usdt: Decimal
 
 # New schema for returning the swap price response
 class SwapPriceResponse(BaseModel):
     tx_hash: str
     swap_price: Decimal
+
+class TxHashBatch(BaseModel):
+    tx_hashes: List[str]
+
+class TransactionLookup(BaseModel):
+    tx_hash: str
+    # "found" or "not_found"
+    status: str
+    transaction: Optional[Transaction] = None
+
+class SwapPriceLookup(BaseModel):
+    tx_hash: str
+    # "stored" (already in the database), "decoded" (decoded by this request), "undecodable"
+    # (no Swap event, or the receipt could not be fetched) or "not_found" (no such transaction)
+    status: str
+    swap_price: Optional[Decimal] = None
+
+class BackfillJobStatus(BaseModel):
+    job_id: int
+    status: str
+    start_time: datetime
+    end_time: datetime
+    start_block: Optional[int] = None
+    end_block: Optional[int] = None
+    pool_address: str
+    ranges_total: int
+    ranges_completed: int
+    blocks_total: int
+    blocks_done: int
+    progress: float
+    rows_fetched: int
+    rows_inserted: int
+    elapsed_seconds: Optional[float] = None
+    rows_per_second: Optional[float] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
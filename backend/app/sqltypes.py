@@ -0,0 +1,99 @@
+"""
+Column types of the compact transactions schema (COMPACT_SCHEMA=1).
+
+Hashes and addresses are stored as raw bytes (BINARY(32), BINARY(20)) instead of 0x-prefixed hex
+strings, and fees as integer counts of 10^-18 units (wei for fee_eth) in DECIMAL(38, 0) instead
+of DECIMAL(30, 18), so they keep the precision of the string schema. The type decorators convert
+on the way in and out, so the ORM, the API and the ingest path keep working with hex strings and
+Decimals.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+from sqlalchemy import DECIMAL, Numeric, String
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import BINARY, TypeDecorator, TypeEngine
+
+
+class HexBinary(TypeDecorator):
+    """
+    A 0x-prefixed hex string stored as `length` raw bytes.
+
+    Strings that are not `length` bytes of hex (e.g. a malformed hash in a lookup) are bound as
+    their UTF-8 bytes; they never equal a stored value, so lookups simply find nothing.
+    """
+    impl = BINARY
+    cache_ok = True
+
+    def __init__(self, length: int):
+        super().__init__(length)
+        self.length = length
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        digits = value[2:] if value[:2] in ("0x", "0X") else value
+        try:
+            raw = bytes.fromhex(digits)
+        except ValueError:
+            return value.encode()
+        return raw if len(raw) == self.length else value.encode()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return "0x" + bytes(value).hex()
+
+
+class ScaledInteger(TypeDecorator):
+    """
+    A Decimal stored as an integer count of 10 ** -exponent units (exponent 18: ETH as wei) with
+    up to `digits` digits. Values are rounded half-even to the unit. Raises ValueError for values
+    outside the column.
+    """
+    impl = Numeric
+    cache_ok = True
+
+    def __init__(self, exponent: int, digits: int = 38):
+        super().__init__(digits, 0)
+        self.exponent = exponent
+        self.digits = digits
+
+    def load_dialect_impl(self, dialect):
+        # Fees are never negative.
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(mysql.DECIMAL(self.digits, 0, unsigned=True))
+        # SQLite has no exact integers beyond 64 bits; no SQL arithmetic is done on these columns,
+        # so the digits are stored as text there.
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String(self.digits))
+        return dialect.type_descriptor(Numeric(self.digits, 0))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        units = int(Decimal(value).scaleb(self.exponent).to_integral_value())
+        if not 0 <= units < 10 ** self.digits:
+            raise ValueError(f"{value} does not fit a compact amount column (10^-{self.exponent} units)")
+        return str(units) if dialect.name == "sqlite" else units
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return Decimal(int(value)).scaleb(-self.exponent)
+
+
+class TransactionTypes(NamedTuple):
+    tx_hash: TypeEngine
+    address: TypeEngine
+    fee_eth: TypeEngine
+    fee_usdt: TypeEngine
+
+
+# Column types of the transactions table in the default and in the compact schema.
+STRING_TYPES = TransactionTypes(String(66), String(42), DECIMAL(30, 18), DECIMAL(30, 18))
+COMPACT_TYPES = TransactionTypes(HexBinary(32), HexBinary(20), ScaledInteger(18), ScaledInteger(18))
+
+
+def transaction_types(compact: bool) -> TransactionTypes:
+    return COMPACT_TYPES if compact else STRING_TYPES
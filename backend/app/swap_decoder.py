@@ -0,0 +1,109 @@
+"""
+Purpose-built decoder for the Uniswap V3 pool Swap event.
+
+event Swap(
+    address indexed sender,
+    address indexed recipient,
+    int256 amount0,
+    int256 amount1,
+    uint160 sqrtPriceX96,
+    uint128 liquidity,
+    int24 tick
+)
+
+Only the five non-indexed arguments are ABI-encoded in the log data, each as one 32-byte
+big-endian word, so they can be sliced straight out of the buffer without the web3 ABI
+machinery.
+"""
+from decimal import Decimal
+from typing import Iterable, List, NamedTuple, Union
+
+# keccak("Swap(address,address,int256,int256,uint160,uint128,int24)")
+SWAP_EVENT_TOPIC = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67"
+
+WORD_SIZE = 32
+SWAP_DATA_SIZE = 5 * WORD_SIZE
+
+Q192 = Decimal(2 ** 192)
+
+
+class SwapEvent(NamedTuple):
+    amount0: int
+    amount1: int
+    sqrt_price_x96: int
+    liquidity: int
+    tick: int
+
+
+def _to_bytes(data: Union[str, bytes]) -> bytes:
+    if isinstance(data, str):
+        return bytes.fromhex(data[2:] if data[:2] in ("0x", "0X") else data)
+    return bytes(data)
+
+
+def _decode_words(view: memoryview) -> SwapEvent:
+    return SwapEvent(
+        int.from_bytes(view[0:32], "big", signed=True),
+        int.from_bytes(view[32:64], "big", signed=True),
+        int.from_bytes(view[64:96], "big"),
+        int.from_bytes(view[96:128], "big"),
+        # int24 is sign-extended to a full word, so the whole word decodes as signed.
+        int.from_bytes(view[128:160], "big", signed=True),
+    )
+
+
+def decode_swap_data(data: Union[str, bytes]) -> SwapEvent:
+    """
+    Decode the data field (hex string or bytes) of a single Swap log.
+    """
+    buffer = _to_bytes(data)
+    if len(buffer) != SWAP_DATA_SIZE:
+        raise ValueError(f"Swap log data must be {SWAP_DATA_SIZE} bytes, got {len(buffer)}")
+    return _decode_words(memoryview(buffer))
+
+
+def decode_swap_log(log: dict) -> SwapEvent:
+    """
+    Decode a single raw JSON-RPC log dict that is known to be a Swap event.
+    """
+    return decode_swap_data(log["data"])
+
+
+def decode_swap_logs(logs: Iterable[dict]) -> List[SwapEvent]:
+    """
+    Decode many Swap logs at once.
+
+    All data fields are converted with a single bytes.fromhex call into one contiguous buffer
+    that is then walked in fixed 160-byte strides.
+    """
+    hex_parts = []
+    for log in logs:
+        data = log["data"]
+        if not isinstance(data, str):
+            data = _to_bytes(data).hex()
+        elif data[:2] in ("0x", "0X"):
+            data = data[2:]
+        if len(data) != 2 * SWAP_DATA_SIZE:
+            raise ValueError(f"Swap log data must be {SWAP_DATA_SIZE} bytes, got {len(data) // 2}")
+        hex_parts.append(data)
+    view = memoryview(bytes.fromhex("".join(hex_parts)))
+    return [_decode_words(view[offset:offset + SWAP_DATA_SIZE]) for offset in range(0, len(view), SWAP_DATA_SIZE)]
+
+
+def is_swap_log(log: dict, pool_address: str) -> bool:
+    """
+    Return True if the raw log is a Swap event emitted by the given pool.
+    """
+    topics = log.get("topics") or []
+    return (
+        bool(topics)
+        and topics[0].lower() == SWAP_EVENT_TOPIC
+        and log["address"].lower() == pool_address.lower()
+    )
+
+
+def swap_price(sqrt_price_x96: int) -> Decimal:
+    """
+    Convert a Q64.96 square-root price into the pool price: (sqrtPriceX96 ** 2) / (2 ** 192).
+    """
+    return Decimal(sqrt_price_x96) ** 2 / Q192
@@ -0,0 +1,214 @@
+"""
+In-process cache of decoded swap prices.
+
+GET /transactions/swapprice/{tx_hash} decodes the price from the transaction receipt when it is
+not stored yet. Decoded prices and failures (price 0: no Swap event, or the receipt could not be
+fetched) are kept in an LRU cache with a TTL, failures with a shorter one so that transient RPC
+errors are retried soon while bad hashes stop reaching Infura. Concurrent lookups of the same
+hash share one in-flight decode (single flight) instead of each calling Infura.
+"""
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import settings
+
+
+def _decode_swap_price(tx_hash: str) -> Decimal:
+    from . import tasks
+    return tasks.decode_swap_prices([tx_hash])[tx_hash]
+
+
+def _decode_swap_prices(tx_hashes: List[str], pools: Optional[Dict[str, str]] = None) -> Dict[str, Decimal]:
+    from . import tasks
+    return tasks.decode_swap_prices(tx_hashes, pools)
+
+
+class _Flight:
+    """
+    A decode in progress; followers wait on the event and read its outcome.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.price: Optional[Decimal] = None
+        self.error: Optional[BaseException] = None
+
+
+class SwapPriceCache:
+    """
+    LRU cache with TTL of tx_hash -> swap price (0 for failed decodes), with single-flight decoding.
+    """
+
+    def __init__(self, decode: Callable[[str], Decimal] = _decode_swap_price, maxsize: int = 10000,
+                 ttl: float = 3600, negative_ttl: float = 60, clock: Callable[[], float] = time.monotonic,
+                 decode_many: Callable[..., Dict[str, Decimal]] = _decode_swap_prices):
+        self.decode = decode
+        self.decode_many = decode_many
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        # tx_hash -> (price, expires_at), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Decimal, float]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "negative_hits": 0, "misses": 0, "shared": 0, "decodes": 0,
+                         "decode_errors": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def metrics(self) -> dict:
+        """
+        Return the hit/miss counters and the number of cached entries.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["size"] = len(self._entries)
+        return metrics
+
+    def _lookup(self, tx_hash: str) -> Optional[Decimal]:
+        """
+        Return the cached price of tx_hash if it has not expired. Must be called with the lock held.
+        """
+        entry = self._entries.get(tx_hash)
+        if entry is None:
+            return None
+        price, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[tx_hash]
+            return None
+        self._entries.move_to_end(tx_hash)
+        return price
+
+    def put(self, tx_hash: str, price: Decimal):
+        """
+        Cache a price (0 for a failed decode), evicting the least recently used entries when full.
+        """
+        ttl = self.ttl if price > 0 else self.negative_ttl
+        with self._lock:
+            self._entries[tx_hash] = (price, self.clock() + ttl)
+            self._entries.move_to_end(tx_hash)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+    def invalidate(self, tx_hash: str):
+        with self._lock:
+            self._entries.pop(tx_hash, None)
+
+    def get(self, tx_hash: str) -> Decimal:
+        """
+        Return the swap price of tx_hash (0 if it cannot be decoded), decoding it at most once per
+        TTL no matter how many callers ask concurrently. Errors raised by the decoder are passed on
+        to every waiting caller and are not cached.
+        """
+        with self._lock:
+            price = self._lookup(tx_hash)
+            if price is not None:
+                self._metrics["hits" if price > 0 else "negative_hits"] += 1
+                return price
+            flight = self._flights.get(tx_hash)
+            leader = flight is None
+            if leader:
+                flight = self._flights[tx_hash] = _Flight()
+                self._metrics["misses"] += 1
+            else:
+                self._metrics["shared"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.price
+
+        try:
+            flight.price = self.decode(tx_hash)
+            self.put(tx_hash, flight.price)
+            with self._lock:
+                self._metrics["decodes"] += 1
+            return flight.price
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._metrics["decode_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[tx_hash]
+            flight.done.set()
+
+    def get_many(self, tx_hashes: Iterable[str], pools: Optional[Dict[str, str]] = None) -> Dict[str, Decimal]:
+        """
+        Return the swap prices of many hashes (0 for those that cannot be decoded). Cached prices
+        are returned as they are, hashes decoded by another caller are waited for, and all the
+        others are decoded with one decode_many call (batched receipts). pools maps a hash to the
+        pool whose Swap event is decoded.
+        """
+        prices: Dict[str, Decimal] = {}
+        led: Dict[str, _Flight] = {}
+        followed: Dict[str, _Flight] = {}
+        with self._lock:
+            for tx_hash in dict.fromkeys(tx_hashes):
+                price = self._lookup(tx_hash)
+                if price is not None:
+                    self._metrics["hits" if price > 0 else "negative_hits"] += 1
+                    prices[tx_hash] = price
+                elif tx_hash in self._flights:
+                    followed[tx_hash] = self._flights[tx_hash]
+                    self._metrics["shared"] += 1
+                else:
+                    led[tx_hash] = self._flights[tx_hash] = _Flight()
+                    self._metrics["misses"] += 1
+
+        if led:
+            try:
+                decoded = self.decode_many(list(led), pools)
+                for tx_hash, flight in led.items():
+                    flight.price = prices[tx_hash] = decoded.get(tx_hash, Decimal("0"))
+                    self.put(tx_hash, flight.price)
+                with self._lock:
+                    self._metrics["decodes"] += len(led)
+            except BaseException as e:
+                for flight in led.values():
+                    flight.error = e
+                with self._lock:
+                    self._metrics["decode_errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    for tx_hash in led:
+                        del self._flights[tx_hash]
+                for flight in led.values():
+                    flight.done.set()
+
+        for tx_hash, flight in followed.items():
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            prices[tx_hash] = flight.price
+        return prices
+
+
+_cache: Optional[SwapPriceCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_swap_price_cache() -> SwapPriceCache:
+    """
+    Return the process-wide swap price cache, creating it on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SwapPriceCache(
+                    maxsize=settings.SWAP_PRICE_CACHE_SIZE,
+                    ttl=settings.SWAP_PRICE_CACHE_TTL,
+                    negative_ttl=settings.SWAP_PRICE_NEGATIVE_TTL,
+                )
+    return _cache
@@ -1,14 +1,19 @@
 import time
 import threading
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 from sqlalchemy.orm import Session
-from . import crud, schemas
+from . import coordination, crud, schemas, swap_decoder, transform
 from .database import SessionLocal
 from .config import settings
 import logging
-from web3 import Web3
+from typing import Callable, Dict, List, Optional
+from .blockindex import get_block_index
+from .logsource import get_log_source
+from .pricefeed import get_price_feed
+from .scheduler import get_poll_scheduler
+from .rpc import get_rpc_client
+from .upstream import get_upstream_client
 
 # Configure logger for background tasks
 logger = logging.getLogger("background_tasks")
@@ -18,138 +23,201 @@ formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
+# Name of the lease that elects the instance fetching live transactions in "leader" mode.
+LIVE_INGEST_LEASE = "live_ingest"
+# Checkpoint source name of the live poller (last fully processed block), suffixed per pool and,
+# in "shard" mode, per worker.
+LIVE_INGEST_CHECKPOINT = "etherscan_tokentx"
+
+
+def live_checkpoint(pool: str, worker_id: Optional[int] = None) -> str:
+    """
+    Return the checkpoint source name of a pool's live ingest cursor. In "shard" mode every worker
+    stores only its own shard of the pages it fetches, so each worker has its own cursor
+    (worker_id); the shared cursor (worker_id None) belongs to the "leader" mode fetcher, which
+    queues the rows of every shard.
+    """
+    source = f"{LIVE_INGEST_CHECKPOINT}:{pool.lower()}"
+    return source if worker_id is None else f"{source}:{worker_id}"
+
 
 def fetch_eth_price():
     """
-    Fetch the current ETH/USDT price from Binance.
+    Return the current ETH/USDT price from the shared price feed. The cached price is used while
+    it is younger than PRICE_MAX_AGE seconds; otherwise it is refreshed from Binance first.
     """
-    try:
-        response = requests.get(settings.BINANCE_API_URL, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            price = Decimal(data.get("price", "0"))
-            return price
-        else:
-            logger.error(f"Failed to fetch ETH price: {response.status_code}")
-            return Decimal("0")
-    except Exception as e:
-        logger.error(f"Exception fetching ETH price: {e}")
-        return Decimal("0")
+    return get_price_feed().price()
+
 
+def iter_transaction_pages(sort: str = "desc", offset: int = 100, start_block: int = None, end_block: int = None,
+                           pool: str = None):
+    """
+    Yield pages of Uniswap pool token transfers from the Etherscan API, optionally restricted
+    to the block range [start_block, end_block]. pool defaults to POOL_ADDRESS.
 
-def fetch_live_transactions():
+    Each page is fetched through the shared upstream client, so transient failures are retried
+    with backoff instead of ending the pagination. Raises UpstreamError if a page still fails.
+    """
+    params = {
+        "module": "account",
+        "action": "tokentx",
+        "address": pool or settings.POOL_ADDRESS,
+        "sort": sort,
+    }
+    if start_block is not None:
+        params["startblock"] = start_block
+    if end_block is not None:
+        params["endblock"] = end_block
+    yield from get_upstream_client().paginate_etherscan(params, offset=offset)
+
+
+def iter_block_pages(start_block: int, end_block: int = None, offset: int = 100, pool: str = None,
+                     sharded: bool = False):
     """
-    Fetch live Uniswap transactions from the Etherscan API using pagination.
+    Yield pages of token transfers of a pool (POOL_ADDRESS if None) in ascending block order from
+    start_block to end_block. Every row is tagged with the pool ("pool") it was fetched for.
+
+    Etherscan only serves the first ETHERSCAN_RESULT_WINDOW results of a query (page * offset),
+    so once a query reaches that window it is re-issued with startblock set to the last block
+    seen. The boundary block is fetched twice; its duplicates are dropped on insert.
 
-    This function loops through pages until no more transactions are returned.
-    Returns:
-        A list of transaction dictionaries.
+    With INGEST_SOURCE=logs the pages come from the pool's Swap logs instead (see app.logsource);
+    with sharded, the log source leaves out the rows of other workers' shards, which the caller
+    would drop anyway (Etherscan pages always hold every row).
     """
-    all_transactions = []
-    page = 1
-    offset = 100  # Retrieve more transactions per page for live data
+    pool = (pool or settings.POOL_ADDRESS).lower()
+    for transactions in _iter_source_pages(start_block, end_block, offset, pool, sharded):
+        for txn in transactions:
+            txn["pool"] = pool
+        yield transactions
+
+
+def _iter_source_pages(start_block: int, end_block: Optional[int], offset: int, pool: str, sharded: bool):
+    if settings.INGEST_SOURCE == "logs":
+        yield from get_log_source(pool).iter_pages(start_block, end_block, offset, sharded)
+        return
+    max_pages = max(1, settings.ETHERSCAN_RESULT_WINDOW // offset)
     while True:
-        try:
-            params = {
-                "module": "account",
-                "action": "tokentx",
-                "address": "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640",
-                "page": page,
-                "offset": offset,
-                "sort": "desc",  # Most recent transactions first
-                "apikey": settings.ETHERSCAN_API_KEY
-            }
-            response = requests.get(settings.ETHERSCAN_API_URL, params=params, timeout=10)
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch transactions on page {page}: {response.status_code}")
-                break
-            data = response.json()
-            if data.get("status") != "1":
-                logger.error(f"Etherscan API error on page {page}: {data.get('message')}")
-                break
-            transactions = data.get("result", [])
-            if not transactions:
-                logger.info("No more live transactions found.")
-                break
-            all_transactions.extend(transactions)
-            # If fewer transactions than requested are returned, no more pages are available.
+        pages = 0
+        last_block = None
+        for transactions in iter_transaction_pages("asc", offset, start_block, end_block, pool):
+            pages += 1
+            last_block = int(transactions[-1].get("blockNumber", 0))
+            yield transactions
+            # A short page is the last one of the query.
             if len(transactions) < offset:
+                return
+            if pages >= max_pages:
                 break
-            page += 1
+        if pages < max_pages or last_block is None:
+            return
+        # A single block with more transfers than the window would never advance; skip past it.
+        start_block = last_block if last_block > start_block else start_block + 1
+
+
+def swap_price_from_receipt(receipt: dict, pool: str = None) -> Decimal:
+    """
+    Extract the executed swap price from a raw JSON-RPC transaction receipt.
+    Returns 0 when the receipt contains no Swap event from the given pool (any tracked pool if None).
+
+    Calculation: swap_price = (sqrtPriceX96 ** 2) / (2 ** 192)
+    """
+    pools = [pool] if pool else settings.POOL_ADDRESSES
+    for log in receipt.get("logs", []):
+        if any(swap_decoder.is_swap_log(log, address) for address in pools):
+            return swap_decoder.swap_price(swap_decoder.decode_swap_log(log).sqrt_price_x96)
+    return Decimal("0")
+
+
+def decode_swap_prices(tx_hashes, pools: Optional[Dict[str, str]] = None) -> Dict[str, Decimal]:
+    """
+    Decode the executed swap price for many transactions at once. pools maps a hash to the pool
+    whose Swap event is decoded; hashes missing from it take the first Swap of any tracked pool.
+
+    Receipts are fetched through the shared RPC client with batched eth_getTransactionReceipt
+    calls. Every requested hash is present in the result; hashes whose receipt could not be
+    fetched or that contain no Swap event map to 0.
+    """
+    tx_hashes = list(dict.fromkeys(tx_hashes))
+    swap_prices = {tx_hash: Decimal("0") for tx_hash in tx_hashes}
+    if not tx_hashes:
+        return swap_prices
+    try:
+        receipts = get_rpc_client().get_transaction_receipts(tx_hashes)
+    except Exception as e:
+        logger.error(f"Error fetching receipts for {len(tx_hashes)} transactions: {e}")
+        return swap_prices
+    for tx_hash, receipt in receipts.items():
+        try:
+            swap_prices[tx_hash] = swap_price_from_receipt(receipt, (pools or {}).get(tx_hash))
         except Exception as e:
-            logger.error(f"Exception while paginating transactions on page {page}: {e}")
-            break
-    return all_transactions
+            logger.error(f"Error decoding swap price for transaction {tx_hash}: {e}")
+    return swap_prices
 
 
 def decode_swap_price(tx_hash: str) -> Decimal:
     """
     Decode the executed swap price for a given transaction hash.
-    Connects to an Ethereum node via Infura, fetches the transaction receipt,
-    decodes the Uniswap Swap event, and computes the swap price.
+    Returns 0 when the price could not be decoded.
+    """
+    return decode_swap_prices([tx_hash])[tx_hash]
 
-    Calculation: swap_price = (sqrtPriceX96 ** 2) / (2 ** 192)
+
+def build_transaction_row(txn: dict, eth_price, price_at=None) -> Optional[dict]:
+    """
+    Convert a single raw Etherscan row into a validated transaction row, or return None (and
+    log the error) if the row is malformed. This is the row-by-row path build_transaction_rows
+    falls back to for pages the columnar transform rejects.
     """
+    txn_hash = txn.get("hash")
     try:
-        # Connect to Ethereum node via Infura using Web3
-        w3 = Web3(Web3.HTTPProvider(settings.INFURA_URL))
-        if not w3.isConnected():
-            logger.error("Web3 is not connected to Infura.")
-            return Decimal("0")
-
-        # Get the transaction receipt
-        receipt = w3.eth.get_transaction_receipt(tx_hash)
-
-        # Define a simplified Swap event ABI (modify as necessary for your contract)
-        swap_event_abi = {
-            "anonymous": False,
-            "inputs": [
-                {"indexed": True, "internalType": "address", "name": "sender", "type": "address"},
-                {"indexed": False, "internalType": "int256", "name": "amount0", "type": "int256"},
-                {"indexed": False, "internalType": "int256", "name": "amount1", "type": "int256"},
-                {"indexed": True, "internalType": "address", "name": "recipient", "type": "address"},
-                {"indexed": False, "internalType": "uint160", "name": "sqrtPriceX96", "type": "uint160"},
-                {"indexed": False, "internalType": "uint128", "name": "liquidity", "type": "uint128"},
-                {"indexed": False, "internalType": "int24", "name": "tick", "type": "int24"}
-            ],
-            "name": "Swap",
-            "type": "event"
-        }
-
-        # Compute the event signature hash
-        event_signature_text = "Swap(address,int256,int256,address,uint160,uint128,int24)"
-        event_signature_hash = w3.keccak(text=event_signature_text).hex()
-
-        swap_price = Decimal("0")
-        # Loop through logs to find the Swap event from the expected contract
-        for log in receipt["logs"]:
-            if log["address"].lower() == "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640".lower():
-                if log["topics"][0].hex() == event_signature_hash:
-                    # Create a contract instance with the Swap event ABI
-                    contract = w3.eth.contract(
-                        address="0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640",
-                        abi=[swap_event_abi]
-                    )
-                    decoded_event = contract.events.Swap().processLog(log)
-                    sqrtPriceX96 = decoded_event["args"]["sqrtPriceX96"]
-                    # Compute swap price as (sqrtPriceX96^2) / (2**192)
-                    swap_price = Decimal(sqrtPriceX96) ** 2 / Decimal(2 ** 192)
-                    break
-        return swap_price
+        # Calculate fee in ETH: fee = gasUsed * gasPrice / 1e18.
+        gas_used = int(txn.get("gasUsed", 0))
+        gas_price = int(txn.get("gasPrice", 0))
+        fee_wei = gas_used * gas_price
+        fee_eth = Decimal(fee_wei) / Decimal(10 ** 18)
+        unix_time = int(txn.get("timeStamp", 0))
+        price = price_at(unix_time) if price_at is not None else None
+        fee_usdt = fee_eth * (price if price is not None else eth_price)
+
+        # Convert timestamp string to a datetime object.
+        time_stamp = datetime.fromtimestamp(unix_time)
+
+        transaction_data = schemas.TransactionCreate(
+            tx_hash=txn_hash,
+            block_number=int(txn.get("blockNumber", 0)),
+            time_stamp=time_stamp,
+            from_address=txn.get("from"),
+            to_address=txn.get("to"),
+            gas=int(txn.get("gas", 0)),
+            gas_price=gas_price,
+            gas_used=gas_used,
+            fee_eth=fee_eth,
+            fee_usdt=fee_usdt,
+            # Only rows of the log source carry the swap price.
+            swap_price=txn.get("swapPrice"),
+            pool_address=txn.get("pool") or settings.POOL_ADDRESS
+        )
+        return transaction_data.dict(exclude={"created_at"})
     except Exception as e:
-        logger.error(f"Error decoding swap price for transaction {tx_hash}: {e}")
-        return Decimal("0")
+        logger.error(f"Error processing transaction {txn_hash}: {e}")
+        return None
 
 
-def process_transactions(transactions, eth_price, db: Session):
+def select_transactions(transactions, sharded: bool = True) -> List[dict]:
     """
-    Process fetched transactions and store new ones into the database with sharding support.
+    Return the raw rows this worker should store, in order.
 
-    Sharding Logic:
+    Sharding Logic (skipped when sharded is False, e.g. for backfills that own their range):
     - Convert the transaction hash (a hex string) into an integer.
-    - Only process the transaction if (txn_integer % TOTAL_WORKERS) equals WORKER_ID.
-    Additionally, after storing the transaction, decode and update the swap price.
+    - Only keep the transaction if (txn_integer % TOTAL_WORKERS) equals WORKER_ID.
+
+    Rows without a valid hash are dropped and only the first row of every hash is kept.
     """
+    if settings.TOTAL_WORKERS <= 0:
+        logger.error("TOTAL_WORKERS must be greater than 0.")
+    selected = []
+    seen = set()
     for txn in transactions:
         txn_hash = txn.get("hash")
         if not txn_hash:
@@ -164,228 +232,259 @@ def process_transactions(transactions, eth_price, db: Session):
             continue
 
         # Apply sharding: process only if (txn_numeric % TOTAL_WORKERS) == WORKER_ID.
-        if settings.TOTAL_WORKERS <= 0:
-            logger.error("TOTAL_WORKERS must be greater than 0.")
-        if txn_numeric % settings.TOTAL_WORKERS != settings.WORKER_ID:
-            logger.info(
-                f"Skipping transaction {txn_hash} due to sharding: {txn_numeric} % {settings.TOTAL_WORKERS} != {settings.WORKER_ID}.")
+        if sharded and txn_numeric % settings.TOTAL_WORKERS != settings.WORKER_ID:
+            logger.debug(
+                f"Skipping transaction {txn_hash} due to sharding: "
+                f"{txn_numeric} % {settings.TOTAL_WORKERS} != {settings.WORKER_ID}.")
             continue
 
-        # Skip if the transaction already exists.
-        existing = crud.get_transaction_by_hash(db, txn_hash)
-        if existing:
-            logger.info(f"Transaction {txn_hash} already exists; skipping.")
+        # A swap shows up once per token transfer; keep only the first row for each hash.
+        if txn_hash in seen:
             continue
+        seen.add(txn_hash)
+        selected.append(txn)
+    return selected
 
-        try:
-            # Calculate fee in ETH: fee = gasUsed * gasPrice / 1e18.
-            gas_used = int(txn.get("gasUsed", 0))
-            gas_price = int(txn.get("gasPrice", 0))
-            fee_wei = gas_used * gas_price
-            fee_eth = Decimal(fee_wei) / Decimal(10 ** 18)
-            fee_usdt = fee_eth * eth_price
-
-            # Convert timestamp string to a datetime object.
-            time_stamp = datetime.fromtimestamp(int(txn.get("timeStamp", 0)))
-
-            transaction_data = schemas.TransactionCreate(
-                tx_hash=txn_hash,
-                block_number=int(txn.get("blockNumber", 0)),
-                time_stamp=time_stamp,
-                from_address=txn.get("from"),
-                to_address=txn.get("to"),
-                gas=int(txn.get("gas", 0)),
-                gas_price=gas_price,
-                gas_used=gas_used,
-                fee_eth=fee_eth,
-                fee_usdt=fee_usdt
-            )
-            # Create transaction record in the database.
-            crud.create_transaction(db, transaction_data)
-            logger.info(f"Stored transaction {txn_hash} processed by shard {settings.WORKER_ID}.")
-
-            # Decode the swap price for this transaction and update the record.
-            swap_price = decode_swap_price(txn_hash)
-            if swap_price > Decimal("0"):
-                crud.update_swap_price(db, txn_hash, swap_price)
-                logger.info(f"Updated transaction {txn_hash} with swap price {swap_price}.")
-            else:
-                logger.info(f"Swap price for transaction {txn_hash} is 0; not updated.")
-        except Exception as e:
-            logger.error(f"Error processing transaction {txn_hash}: {e}")
 
+def build_transaction_rows(transactions, eth_price, sharded: bool = True,
+                           price_at: Optional[Callable[[int], Optional[Decimal]]] = None) -> List[dict]:
+    """
+    Turn raw Etherscan rows into transaction rows ready for insertion, with sharding support
+    (see select_transactions).
 
-def live_transaction_polling():
+    fee_usdt uses eth_price, unless price_at (UNIX timestamp -> price or None) knows the price at
+    the transaction's time, as the kline store does for historical backfills.
+
+    The page is converted by the columnar transform (see app.transform). If any row of the page
+    is malformed, the page is converted row by row instead, so that only the bad rows are dropped.
     """
-    Background thread function for live transaction polling with sharding support.
-    It continuously fetches the current ETH price, retrieves live transactions (using pagination),
-    compares with the latest processed timestamp from the database to avoid duplicates,
-    and processes new transactions.
+    selected = select_transactions(transactions, sharded)
+    if not selected:
+        return []
+    try:
+        return transform.to_rows(transform.to_columns(selected), eth_price, price_at)
+    except (KeyError, TypeError, ValueError, OverflowError) as e:
+        logger.warning(f"Columnar transform rejected a page of {len(selected)} transactions ({e}); "
+                       f"converting it row by row.")
+    rows = [build_transaction_row(txn, eth_price, price_at) for txn in selected]
+    return [row for row in rows if row is not None]
+
+
+def process_transactions(transactions, eth_price, db: Session, sharded: bool = True, price_at=None):
     """
-    from sqlalchemy import func
-    from app.models import Transaction
+    Process fetched transactions and store new ones into the database with sharding support
+    (see build_transaction_rows).
+
+    The whole batch is written set-based: existing hashes are prefetched with one IN query,
+    new rows go out as multi-row INSERT ... IGNORE statements and the batch is committed once.
+    With SWAP_DECODE_QUEUE the new transactions are queued for swap price decoding together with
+    the insert (see app.decodequeue); otherwise their swap prices are decoded right away and
+    written with a single bulk UPDATE.
+
+    Returns a tuple of (inserted, skipped) counts for the rows belonging to this shard. A failed
+    insert is rolled back and re-raised, so that callers do not move their checkpoint, queue
+    acknowledgement or resume cursor past rows that were never stored.
+    """
+    get_block_index().record_transactions(transactions)
+    rows = build_transaction_rows(transactions, eth_price, sharded, price_at)
+    if not rows:
+        return 0, 0
 
-    while True:
-        db = SessionLocal()
+    try:
+        result = crud.bulk_create_transactions(db, rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error storing batch of {len(rows)} transactions: {e}")
+        raise
+    logger.info(
+        f"Stored {result.inserted} transactions ({result.skipped} skipped) processed by shard {settings.WORKER_ID}.")
+    if settings.SWAP_DECODE_QUEUE:
+        # The new rows were queued with the insert; the decoder threads fill in their swap prices.
+        return result.inserted, result.skipped
+
+    # Decode the swap prices for the newly stored transactions in batched RPC calls and
+    # update them in one statement.
+    priced = {row["tx_hash"] for row in rows if row.get("swap_price") is not None}
+    pools = {row["tx_hash"]: row.get("pool_address") for row in rows}
+    swap_prices = {}
+    unpriced = [h for h in result.new_hashes if h not in priced]
+    for txn_hash, swap_price in decode_swap_prices(unpriced, pools).items():
+        if swap_price > Decimal("0"):
+            swap_prices[txn_hash] = swap_price
+        else:
+            logger.info(f"Swap price for transaction {txn_hash} is 0; not updated.")
+    if swap_prices:
         try:
-            eth_price = fetch_eth_price()
-            # Use pagination to fetch all available transactions.
-            all_transactions = []
-            page = 1
-            offset = 100  # Retrieve more transactions per page for live data.
-            while True:
-                try:
-                    params = {
-                        "module": "account",
-                        "action": "tokentx",
-                        "address": "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640",
-                        "page": page,
-                        "offset": offset,
-                        "sort": "desc",  # Most recent transactions first.
-                        "apikey": settings.ETHERSCAN_API_KEY
-                    }
-                    response = requests.get(settings.ETHERSCAN_API_URL, params=params, timeout=10)
-                    if response.status_code != 200:
-                        logger.error(f"Failed to fetch transactions on page {page}: {response.status_code}")
-                        break
-                    data = response.json()
-                    if data.get("status") != "1":
-                        logger.error(f"Etherscan API error on page {page}: {data.get('message')}")
-                        break
-                    transactions = data.get("result", [])
-                    if not transactions:
-                        logger.info("No more live transactions found.")
-                        break
-                    all_transactions.extend(transactions)
-                    # If fewer transactions than requested are returned, no more pages available.
-                    if len(transactions) < offset:
-                        break
-                    page += 1
-                except Exception as e:
-                    logger.error(f"Exception while paginating transactions on page {page}: {e}")
-                    break
-
-            # Query the latest processed transaction timestamp from the database.
-            latest_tx = db.query(func.max(Transaction.time_stamp)).scalar()
-            ten_minutes_ago = datetime.utcnow() - timedelta(minutes=10)
-            if latest_tx is not None:
-                # Use the later of the latest transaction timestamp or 10 minutes ago.
-                if latest_tx < ten_minutes_ago:
-                    latest_ts = int(ten_minutes_ago.timestamp())
-                else:
-                    latest_ts = int(latest_tx.timestamp())
-            else:
-                latest_ts = 0
-
-            # Filter transactions: only process those with timeStamp > latest_ts.
-            filtered_transactions = []
-            for txn in all_transactions:
-                txn_ts = int(txn.get("timeStamp", 0))
-                if txn_ts > latest_ts:
-                    filtered_transactions.append(txn)
-                else:
-                    logger.info(
-                        f"Skipping transaction {txn.get('hash')} because timestamp {txn_ts} <= latest processed {latest_ts}.")
-
-            process_transactions(filtered_transactions, eth_price, db)
+            crud.bulk_update_swap_prices(db, swap_prices)
+            db.commit()
+            logger.info(f"Updated {len(swap_prices)} transactions with swap prices.")
         except Exception as e:
-            logger.error(f"Error in live polling: {e}")
-        finally:
-            db.close()
-        time.sleep(settings.POLL_INTERVAL)
+            db.rollback()
+            logger.error(f"Error updating swap prices: {e}")
+    return result.inserted, result.skipped
 
 
-def process_historical_transactions(start_time: datetime, end_time: datetime, db: Session):
+def latest_block_number() -> int:
+    """
+    Return the number of the latest block known to the Ethereum node.
     """
-    Process historical transactions between start_time and end_time.
-    This function fetches transactions in batch pages using the Etherscan API.
+    return int(get_rpc_client().call("eth_blockNumber", []), 16)
 
-    It repeatedly requests pages until:
-      - No transactions are returned, or
-      - The oldest transaction in a page is older than start_time.
 
-    For each transaction in the returned page, if its timestamp is between start_time and end_time
-    and not already in the database, the transaction is processed and stored.
+def live_start_block(db: Session, pool: str = None, worker_id: Optional[int] = None) -> int:
+    """
+    Return the first block the next live poll of a pool (POOL_ADDRESS if None) should fetch, from
+    the cursor of worker_id (the shared one if None, see live_checkpoint).
+
+    Polling resumes after the persisted checkpoint, re-reading CHECKPOINT_OVERLAP_BLOCKS
+    blocks for safety. A worker without a cursor of its own resumes from the shared one (as left
+    before the cursors were kept per worker). Without a checkpoint the shared cursor resumes after
+    the pool's newest stored transaction; a worker's cursor does not, since that transaction may
+    belong to another worker's shard. Otherwise polling starts INITIAL_LOOKBACK_BLOCKS blocks
+    behind the chain head.
+    """
+    from sqlalchemy import func
+    from app.models import Transaction
 
-    Returns the total number of processed transactions.
+    pool = (pool or settings.POOL_ADDRESS).lower()
+    last_block = crud.get_checkpoint(db, live_checkpoint(pool, worker_id))
+    if last_block is None and worker_id is not None:
+        last_block = crud.get_checkpoint(db, live_checkpoint(pool))
+    if last_block is None and worker_id is None:
+        last_block = db.query(func.max(Transaction.block_number)).filter(Transaction.pool_address == pool).scalar()
+    if last_block is None:
+        last_block = latest_block_number() - settings.INITIAL_LOOKBACK_BLOCKS
+    return max(0, last_block + 1 - settings.CHECKPOINT_OVERLAP_BLOCKS)
+
+
+def ingest_new_blocks(db: Session, handle_page, pool: str = None, worker_id: Optional[int] = None) -> int:
+    """
+    Fetch every transfer of a pool (POOL_ADDRESS if None) since the live checkpoint of worker_id
+    (the shared one if None) and pass each page to handle_page.
+
+    After a page has been handled, the checkpoint is advanced to the block before the last one
+    in the page (that block may continue on the next page); once the final page is handled it
+    is advanced to the last block seen. If handle_page raises, the error is passed on and the
+    checkpoint stays before the page, so the next poll fetches it again. Returns the number of
+    fetched rows.
     """
-    processed_count = 0
-    page = 1
-    offset = 100  # Retrieve more transactions per page for historical data.
+    pool = (pool or settings.POOL_ADDRESS).lower()
+    checkpoint = live_checkpoint(pool, worker_id)
+    start_block = live_start_block(db, pool, worker_id)
+    fetched = 0
+    last_block = None
+    # A worker with its own checkpoint stores only its shard.
+    for transactions in iter_block_pages(start_block, pool=pool, sharded=worker_id is not None):
+        handle_page(transactions)
+        fetched += len(transactions)
+        last_block = int(transactions[-1].get("blockNumber", 0))
+        crud.advance_checkpoint(db, checkpoint, last_block - 1)
+    if last_block is not None:
+        crud.advance_checkpoint(db, checkpoint, last_block)
+    logger.info(f"Fetched {fetched} transfers of pool {pool} from block {start_block} onwards.")
+    return fetched
+
+
+def drain_work_queue(db: Session) -> int:
+    """
+    Process every queued upstream row that belongs to this worker's shard.
+    Only the entries that were stored are acknowledged; entries whose insert failed stay in the
+    queue and are claimed again by the next cycle. Returns the number of stored transactions.
+    """
+    inserted_total = 0
+    after_id = 0
     while True:
-        try:
-            params = {
-                "module": "account",
-                "action": "tokentx",
-                "address": "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640",
-                "page": page,
-                "offset": offset,
-                "sort": "asc",  # Ascending order: older transactions first.
-                "apikey": settings.ETHERSCAN_API_KEY
-            }
-            response = requests.get(settings.ETHERSCAN_API_URL, params=params, timeout=10)
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch historical transactions on page {page}: {response.status_code}")
-                break
-            data = response.json()
-            if data.get("status") != "1":
-                logger.error(f"Etherscan API error (historical) on page {page}: {data.get('message')}")
-                break
-            transactions = data.get("result", [])
-            if not transactions:
-                logger.info("No more historical transactions found.")
-                break
+        items = coordination.claim_shard_batch(db, settings.WORKER_ID, settings.QUEUE_BATCH_SIZE, after_id)
+        if not items:
+            return inserted_total
+        after_id = items[-1].id
+        for eth_price, (ids, transactions) in coordination.group_by_price(items).items():
+            try:
+                inserted, _ = process_transactions(transactions, eth_price, db)
+            except Exception as e:
+                logger.error(f"Leaving {len(ids)} queued transactions for the next cycle: {e}")
+                continue
+            inserted_total += inserted
+            coordination.ack_items(db, ids)
+
+
+def poll_pool(pool: str, enqueue: bool = False) -> int:
+    """
+    Fetch the new blocks of one pool on a session of its own, and store this worker's shard of
+    them (or, with enqueue, queue the rows of every shard). Returns the number of fetched rows.
+    """
+    db = SessionLocal()
+    try:
+        eth_price = fetch_eth_price()
+        if enqueue:
+            return ingest_new_blocks(db, lambda transactions: coordination.enqueue_transactions(
+                db, transactions, eth_price, settings.TOTAL_WORKERS), pool)
+        return ingest_new_blocks(db, lambda transactions: process_transactions(transactions, eth_price, db), pool,
+                                 settings.WORKER_ID)
+    finally:
+        db.close()
 
-            # Convert start_time and end_time to UNIX timestamps.
-            start_ts = int(start_time.timestamp())
-            end_ts = int(end_time.timestamp())
-
-            transactions_in_range = []
-            for txn in transactions:
-                txn_ts = int(txn.get("timeStamp", 0))
-                # Process transaction only if it falls within the specified time range.
-                if start_ts <= txn_ts <= end_ts:
-                    # Check database for duplicates.
-                    if crud.get_transaction_by_hash(db, txn.get("hash")) is None:
-                        transactions_in_range.append(txn)
-            if not transactions_in_range:
-                # If the oldest transaction in this page is older than start_time, exit loop.
-                oldest_txn_ts = int(transactions[0].get("timeStamp", 0))
-                if oldest_txn_ts < start_ts:
-                    break
-
-            eth_price_current = fetch_eth_price()
-            process_transactions(transactions_in_range, eth_price_current, db)
-            processed_count += len(transactions_in_range)
-            logger.info(f"Processed {len(transactions_in_range)} historical transactions from page {page}.")
-            # If fewer transactions than requested are returned, no more pages available.
-            if len(transactions) < offset:
-                break
-            page += 1
-        except Exception as e:
-            logger.error(f"Error processing historical transactions on page {page}: {e}")
-            break
-    return processed_count
 
+def lead_live_ingest(db: Session, pools: Optional[List[str]] = None) -> bool:
+    """
+    In "leader" mode, take or renew the ingest lease and, if this instance holds it, fetch the
+    new blocks of the pools (all configured pools if None) once and queue their rows per shard.
+    Returns True if this instance is the leader.
+    """
+    if not coordination.acquire_lease(db, LIVE_INGEST_LEASE, coordination.worker_identity(), settings.LEASE_TTL):
+        return False
+    pools = settings.POOL_ADDRESSES if pools is None else pools
+    get_poll_scheduler().run(lambda pool: poll_pool(pool, enqueue=True), pools)
+    return True
 
-def start_historical_processing(start_time: datetime, end_time: datetime):
+
+def poll_live_transactions(db: Session, pools: Optional[List[str]] = None):
     """
-    Start a batch job to process historical transactions within a given time range.
-    This function runs in a separate thread.
+    Run one live polling cycle over the pools (all configured pools if None), polled
+    POOL_POLL_CONCURRENCY at a time by the poll scheduler.
+
+    In "shard" coordination mode every worker fetches all pages and keeps its own shard. In
+    "leader" mode only the holder of the ingest lease fetches, and it partitions the rows into
+    the work queue; every worker then drains its own shard from the queue.
     """
+    pools = settings.POOL_ADDRESSES if pools is None else pools
+    if settings.INGEST_COORDINATION == "leader":
+        lead_live_ingest(db, pools)
+        drain_work_queue(db)
+    else:
+        get_poll_scheduler().run(poll_pool, pools)
 
-    def run():
+
+def live_transaction_polling():
+    """
+    Background thread function for live transaction polling with sharding support.
+    Every cycle polls the pools the scheduler finds due (see app.scheduler), then sleeps until
+    the next pool is due (POLL_INTERVAL between cycles with a single pool).
+    """
+    scheduler = get_poll_scheduler()
+    while True:
+        started = time.monotonic()
+        due = scheduler.due()
         db = SessionLocal()
         try:
-            count = process_historical_transactions(start_time, end_time, db)
-            logger.info(f"Historical processing completed. Total processed transactions: {count}")
+            poll_live_transactions(db, due)
         except Exception as e:
-            logger.error(f"Error in historical processing: {e}")
+            logger.error(f"Error in live polling: {e}")
         finally:
             db.close()
+        time.sleep(scheduler.next_cycle_in(due, settings.POLL_INTERVAL, time.monotonic() - started))
 
-    thread = threading.Thread(target=run, daemon=True)
-    thread.start()
+
+def resolve_block_range(start_time: datetime, end_time: datetime):
+    """
+    Map a wall-clock time range to the block range [start_block, end_block] that covers it,
+    using the timestamp-to-block index.
+    """
+    index = get_block_index()
+    start_block = index.block_after(int(start_time.timestamp()))
+    end_block = index.block_before(int(end_time.timestamp()))
+    return start_block, end_block
 
 
 def start_background_tasks():
@@ -0,0 +1,117 @@
+"""
+Columnar transform of raw Etherscan rows into transaction rows.
+
+A page is converted column by column instead of row by row: every field is parsed with one
+list comprehension, the fee is computed exactly in integer wei (gasUsed * gasPrice, which may
+exceed 64 bits) and scaled to ETH without a division, and timestamps and historical prices are
+resolved once per distinct timestamp rather than once per row. Rows come out as plain tuples or
+dicts ready for the bulk insert, without building pydantic models on the way.
+"""
+from array import array
+from datetime import datetime
+from decimal import Decimal
+from operator import mul
+from typing import Callable, List, NamedTuple, Optional
+
+from .config import settings
+
+# Column order of the tuples returned by to_row_tuples (the keys of the rows from to_rows).
+FIELDS = (
+    "tx_hash", "block_number", "time_stamp", "from_address", "to_address",
+    "gas", "gas_price", "gas_used", "fee_eth", "fee_usdt", "swap_price",
+    "pool_address",
+)
+# 1 ETH = 10 ** 18 wei
+WEI_EXPONENT = -18
+
+
+class TransactionColumns(NamedTuple):
+    tx_hashes: List[str]
+    block_numbers: array
+    # UNIX timestamps
+    timestamps: array
+    from_addresses: List[str]
+    to_addresses: List[str]
+    gas: array
+    # Kept as Python ints: gas prices and fees are not bounded by 64 bits.
+    gas_prices: List[int]
+    gas_used: array
+    fee_wei: List[int]
+    # Known only for rows of the log source; None otherwise.
+    swap_prices: List[Optional[Decimal]]
+    # Pool the row was fetched for (POOL_ADDRESS for untagged rows)
+    pool_addresses: List[str]
+
+    def __len__(self) -> int:
+        return len(self.tx_hashes)
+
+
+def to_columns(transactions: List[dict]) -> TransactionColumns:
+    """
+    Parse raw Etherscan rows into columns. Raises (KeyError, TypeError, ValueError,
+    OverflowError) if any row is malformed; the caller then falls back to row-by-row conversion.
+    """
+    tx_hashes = [txn["hash"] for txn in transactions]
+    from_addresses = [txn.get("from") for txn in transactions]
+    to_addresses = [txn.get("to") for txn in transactions]
+    if None in from_addresses or None in to_addresses:
+        raise ValueError("transaction without from or to address")
+    gas_used = array("q", [int(txn.get("gasUsed", 0)) for txn in transactions])
+    gas_prices = [int(txn.get("gasPrice", 0)) for txn in transactions]
+    return TransactionColumns(
+        tx_hashes=tx_hashes,
+        block_numbers=array("q", [int(txn.get("blockNumber", 0)) for txn in transactions]),
+        timestamps=array("q", [int(txn.get("timeStamp", 0)) for txn in transactions]),
+        from_addresses=from_addresses,
+        to_addresses=to_addresses,
+        gas=array("q", [int(txn.get("gas", 0)) for txn in transactions]),
+        gas_prices=gas_prices,
+        gas_used=gas_used,
+        fee_wei=list(map(mul, gas_used, gas_prices)),
+        swap_prices=[None if txn.get("swapPrice") is None else Decimal(txn["swapPrice"]) for txn in transactions],
+        pool_addresses=[txn.get("pool") or settings.POOL_ADDRESS for txn in transactions],
+    )
+
+
+def to_row_tuples(columns: TransactionColumns, eth_price: Decimal,
+                  price_at: Optional[Callable[[int], Optional[Decimal]]] = None) -> List[tuple]:
+    """
+    Compute the fees of the columns and return one tuple per row in FIELDS order.
+
+    fee_eth is exact (the integer fee in wei with its exponent shifted by 18). fee_usdt uses
+    eth_price, unless price_at (UNIX timestamp -> price or None) knows the price at the row's
+    time; price_at is called once per distinct timestamp.
+    """
+    timestamps = columns.timestamps
+    fee_eth = [Decimal(fee).scaleb(WEI_EXPONENT) for fee in columns.fee_wei]
+    if price_at is None:
+        fee_usdt = [fee * eth_price for fee in fee_eth]
+    else:
+        prices = {}
+        for timestamp in set(timestamps):
+            price = price_at(timestamp)
+            prices[timestamp] = price if price is not None else eth_price
+        fee_usdt = [fee * prices[timestamp] for fee, timestamp in zip(fee_eth, timestamps)]
+    times = {timestamp: datetime.fromtimestamp(timestamp) for timestamp in set(timestamps)}
+    return list(zip(
+        columns.tx_hashes,
+        columns.block_numbers,
+        [times[timestamp] for timestamp in timestamps],
+        columns.from_addresses,
+        columns.to_addresses,
+        columns.gas,
+        columns.gas_prices,
+        columns.gas_used,
+        fee_eth,
+        fee_usdt,
+        columns.swap_prices,
+        columns.pool_addresses,
+    ))
+
+
+def to_rows(columns: TransactionColumns, eth_price: Decimal,
+            price_at: Optional[Callable[[int], Optional[Decimal]]] = None) -> List[dict]:
+    """
+    Same as to_row_tuples, as dicts keyed by FIELDS (the form crud.bulk_create_transactions takes).
+    """
+    return [dict(zip(FIELDS, row)) for row in to_row_tuples(columns, eth_price, price_at)]
@@ -0,0 +1,221 @@
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import settings
+from .ratelimit import DatabaseTokenBucket
+
+logger = logging.getLogger("background_tasks")
+
+# HTTP status codes that are worth retrying: rate limiting and transient server errors.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """
+    Raised when an upstream API call still fails after all retries.
+    """
+
+
+class RetryableUpstreamError(UpstreamError):
+    """
+    Raised for failures that may succeed when retried (rate limits, 5xx, connection errors).
+    """
+
+
+class UpstreamClient:
+    """
+    Shared HTTP client for the Etherscan and Binance APIs.
+
+    All calls go through one pooled keep-alive requests.Session. Transient failures (connection
+    errors, 429/5xx responses and Etherscan rate-limit messages) are retried up to max_retries
+    times with exponential backoff and full jitter. Every call is counted per endpoint so that
+    the counters can be exposed through the metrics endpoint.
+
+    Endpoints with an entry in rate_limiters take a token from that limiter before every
+    attempt, including retries.
+    """
+
+    def __init__(self, max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 10,
+                 pool_size: int = 10, timeouts: Optional[Dict[str, float]] = None,
+                 rate_limiters: Optional[dict] = None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = timeouts or {}
+        self.rate_limiters = rate_limiters or {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._counters = Counter()
+        self._counters_lock = threading.Lock()
+
+    def _count(self, endpoint: str, name: str, amount: int = 1):
+        with self._counters_lock:
+            self._counters[f"{endpoint}.{name}"] += amount
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Return a snapshot of the per-endpoint counters, including rate limiter wait times.
+        """
+        with self._counters_lock:
+            metrics = dict(self._counters)
+        for endpoint, limiter in self.rate_limiters.items():
+            for name, value in limiter.metrics().items():
+                metrics[f"{endpoint}.rate_limit_{name}"] = value
+        return metrics
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Return the delay before retry number attempt (0-based): full jitter over an exponential cap.
+        A Retry-After hint from the server is used as a lower bound.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _get_once(self, endpoint: str, url: str, params: Optional[dict]):
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeouts.get(endpoint, 10))
+        except requests.RequestException as e:
+            raise RetryableUpstreamError(f"{endpoint} request failed: {e}") from e
+        if response.status_code in RETRY_STATUS_CODES:
+            error = RetryableUpstreamError(f"{endpoint} returned HTTP {response.status_code}")
+            retry_after = response.headers.get("Retry-After")
+            error.retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            raise error
+        if response.status_code != 200:
+            raise UpstreamError(f"{endpoint} returned HTTP {response.status_code}")
+        return response.json()
+
+    def call(self, endpoint: str, func, *args):
+        """
+        Run func(*args) with bounded retries on RetryableUpstreamError.
+        """
+        limiter = self.rate_limiters.get(endpoint)
+        for attempt in range(self.max_retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            self._count(endpoint, "requests")
+            try:
+                return func(*args)
+            except RetryableUpstreamError as e:
+                if attempt >= self.max_retries:
+                    self._count(endpoint, "failures")
+                    raise
+                delay = self.backoff(attempt, getattr(e, "retry_after", None))
+                self._count(endpoint, "retries")
+                logger.warning(f"{e}; retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries}).")
+                time.sleep(delay)
+            except UpstreamError:
+                self._count(endpoint, "failures")
+                raise
+
+    def get_json(self, endpoint: str, url: str, params: Optional[dict] = None):
+        """
+        GET url and return the decoded JSON body, retrying transient failures.
+        """
+        return self.call(endpoint, self._get_once, endpoint, url, params)
+
+    def _etherscan_once(self, params: dict) -> List[dict]:
+        data = self._get_once("etherscan", settings.ETHERSCAN_API_URL, params)
+        if data.get("status") == "1":
+            return data.get("result") or []
+        message = data.get("message", "")
+        result = data.get("result")
+        # An empty result set is reported as status "0" with this message.
+        if message.startswith("No transactions found") or result == []:
+            return []
+        if "rate limit" in str(result).lower():
+            raise RetryableUpstreamError(f"Etherscan rate limit: {result}")
+        raise UpstreamError(f"Etherscan API error: {message} {result}")
+
+    def etherscan(self, params: dict) -> List[dict]:
+        """
+        Call the Etherscan API and return its result list.
+        """
+        params = dict(params, apikey=settings.ETHERSCAN_API_KEY)
+        return self.call("etherscan", self._etherscan_once, params)
+
+    def paginate_etherscan(self, params: dict, offset: int = 100) -> Iterator[List[dict]]:
+        """
+        Yield consecutive result pages of an Etherscan list query until a short or empty page.
+        Raises UpstreamError if a page still fails after all retries.
+        """
+        page = 1
+        while True:
+            rows = self.etherscan(dict(params, page=page, offset=offset))
+            if not rows:
+                return
+            yield rows
+            # If fewer rows than requested are returned, no more pages are available.
+            if len(rows) < offset:
+                return
+            page += 1
+
+
+_client: Optional[UpstreamClient] = None
+_client_lock = threading.Lock()
+
+
+def get_upstream_client() -> UpstreamClient:
+    """
+    Return the process-wide upstream client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                rate_limiters = {}
+                if settings.ETHERSCAN_RATE_LIMIT > 0:
+                    rate_limiters["etherscan"] = DatabaseTokenBucket(
+                        "etherscan", settings.ETHERSCAN_RATE_LIMIT, settings.ETHERSCAN_RATE_BURST)
+                _client = UpstreamClient(
+                    max_retries=settings.UPSTREAM_MAX_RETRIES,
+                    backoff_base=settings.UPSTREAM_BACKOFF_BASE,
+                    backoff_max=settings.UPSTREAM_BACKOFF_MAX,
+                    pool_size=settings.UPSTREAM_POOL_SIZE,
+                    timeouts={
+                        "etherscan": settings.ETHERSCAN_TIMEOUT,
+                        "binance": settings.BINANCE_TIMEOUT,
+                    },
+                    rate_limiters=rate_limiters,
+                )
+    return _client
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_upstream_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide pool of UPSTREAM_THREADS threads for blocking upstream calls of API
+    routes, creating it on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.UPSTREAM_THREADS, thread_name_prefix="upstream")
+    return _executor
+
+
+async def run_upstream(fn, *args, **kwargs):
+    """
+    Await a blocking upstream call from an async route. It runs on the upstream threads, so
+    requests waiting for a slow upstream do not occupy the threadpool that serves the others.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_upstream_executor(), functools.partial(fn, *args, **kwargs))
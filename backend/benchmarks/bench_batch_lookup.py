@@ -0,0 +1,96 @@
+"""
+Benchmark: reconciling a list of hashes through POST /transactions/swapprice/batch versus one
+GET /transactions/swapprice/{tx_hash} per hash, with none of the prices stored yet, and the
+time of POST /transactions/batch for the same hashes.
+
+The Ethereum node is simulated: every JSON-RPC HTTP request sleeps for the given latency before
+answering with a Swap receipt. The per-hash endpoint is timed on a sample and extrapolated.
+
+Run from the backend directory:
+    python benchmarks/bench_batch_lookup.py [number_of_hashes] [rpc_latency_seconds]    (default: 5000, 0.1)
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, database, models, rpc
+from app.config import settings
+from bench_compact import random_rows
+from tests.factories import FakeResponse, make_swap_receipt
+
+SAMPLE = 50
+
+
+class SlowNode:
+    """
+    requests.Session stand-in answering every batch after `latency` seconds.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    def post(self, url, json=None, timeout=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        receipt = make_swap_receipt(2 ** 96)
+        receipt["logs"][1]["address"] = settings.POOL_ADDRESS
+        return FakeResponse([{"jsonrpc": "2.0", "id": item["id"], "result": receipt} for item in json])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    database.engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+                                    connect_args={"check_same_thread": False})
+    database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+    # The routes use the sync engine on the threadpool rather than an async engine on MySQL.
+    database._async_sessionmaker, database._async_ready = None, True
+    models.Base.metadata.create_all(bind=database.engine)
+    rows = [dict(row, pool_address=settings.POOL_ADDRESS) for row in random_rows(count + SAMPLE)]
+    with database.SessionLocal() as db:
+        crud.bulk_create_transactions(db, rows)
+        db.commit()
+    node = SlowNode(latency)
+    client = rpc.get_rpc_client()
+    client.session = node
+
+    from fastapi.testclient import TestClient
+    from app.routers.transactions import router
+    from fastapi import FastAPI
+    api = FastAPI()
+    api.include_router(router)
+    http = TestClient(api)
+    hashes = [row["tx_hash"] for row in rows]
+
+    started = time.perf_counter()
+    for tx_hash in hashes[count:]:
+        assert http.get(f"/transactions/swapprice/{tx_hash}").status_code == 200
+    per_hash = (time.perf_counter() - started) / SAMPLE
+
+    node.requests = 0
+    started = time.perf_counter()
+    response = http.post("/transactions/swapprice/batch", json={"tx_hashes": hashes[:count]})
+    batch = time.perf_counter() - started
+    assert all(result["status"] == "decoded" for result in response.json())
+
+    started = time.perf_counter()
+    response = http.post("/transactions/batch", json={"tx_hashes": hashes[:count]})
+    transactions = time.perf_counter() - started
+    assert all(result["status"] == "found" for result in response.json())
+
+    print(f"{count} hashes, {latency * 1000:.0f} ms per RPC request, RPC_BATCH_SIZE={settings.RPC_BATCH_SIZE}, "
+          f"RPC_BATCH_CONCURRENCY={settings.RPC_BATCH_CONCURRENCY}")
+    print(f"  one GET per hash: {per_hash * 1000:7.1f} ms per hash, {per_hash * count:7.1f} s in total (extrapolated)")
+    print(f"  one batch POST:   {batch:7.2f} s, {node.requests} RPC requests")
+    print(f"  POST /transactions/batch of the same hashes: {transactions:5.2f} s")
+
+
+if __name__ == "__main__":
+    main()
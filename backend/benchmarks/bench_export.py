@@ -0,0 +1,63 @@
+"""
+Benchmark: throughput and peak Python memory of the streaming export (app.export) as the number
+of exported rows grows. A flat peak shows that memory depends on EXPORT_CHUNK_ROWS, not on the
+size of the range.
+
+Run from the backend directory:
+    python benchmarks/bench_export.py [largest_number_of_rows] [database_url]    (default: 200000, a temporary SQLite file)
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import database, export, models
+from bench_compact import BATCH, random_rows
+
+
+def fill(engine, count):
+    models.Base.metadata.create_all(bind=engine)
+    table = models.Transaction.__table__
+    rows = random_rows(count)
+    while True:
+        batch = [row for _, row in zip(range(BATCH), rows)]
+        if not batch:
+            break
+        with engine.begin() as connection:
+            connection.execute(table.insert(), batch)
+
+
+def measure(export_format, start_time, end_time):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in export.stream(export_format, start_time, end_time))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    url = sys.argv[2] if len(sys.argv) > 2 else f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    database.engine = create_engine(url)
+    # The block index reads its samples through SessionLocal.
+    database.SessionLocal = sessionmaker(bind=database.engine)
+    fill(database.engine, largest)
+    times = [row["time_stamp"] for row in random_rows(largest)]
+    formats = ["ndjson", "csv"] + (["parquet"] if export.parquet_available() else [])
+    for count in (largest // 16, largest // 4, largest):
+        for export_format in formats:
+            size, elapsed, peak = measure(export_format, times[0], times[count - 1])
+            print(f"{count:>8} rows {export_format:<8} {count / elapsed:>9.0f} rows/s  "
+                  f"{size / 2 ** 20:7.1f} MiB out  peak memory {peak / 2 ** 20:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: time to read and encode one page of GET /transactions at page sizes 50 to 1000, with
+the response_model path (ORM objects, a pydantic model per row, jsonable_encoder, json.dumps)
+versus FAST_JSON (the response columns only, encoded straight to JSON with orjson, and with the
+json module when orjson is not installed).
+
+Run from the backend directory:
+    python benchmarks/bench_fastjson.py [number_of_rows] [database_url]    (default: 20000, a temporary SQLite file)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, database, fastjson, models
+from bench_compact import random_rows
+from bench_export import fill
+
+PAGE_SIZES = (50, 100, 250, 500, 1000)
+
+
+def response_field():
+    from app.main import app
+    for route in app.routes:
+        if getattr(route, "path", None) == "/transactions/" and "GET" in route.methods:
+            return route.secure_cloned_response_field
+    raise RuntimeError("GET /transactions/ not found")
+
+
+def model_page(db, field, page_size):
+    transactions = crud.get_transactions(db, limit=page_size)
+    started = time.perf_counter()
+    content = asyncio.run(serialize_response(field=field, response_content=transactions))
+    body = JSONResponse(content).body
+    return body, started
+
+
+def fast_page(db, field, page_size):
+    rows = crud.get_transactions(db, limit=page_size, columns=fastjson.FIELDS)
+    started = time.perf_counter()
+    body = fastjson.FastJSONResponse(fastjson.transaction_dicts(rows)).body
+    return body, started
+
+
+def measure(page, field, page_size, repeat):
+    """
+    Return the mean seconds per page in total and spent encoding, over repeat pages.
+    """
+    total = encode = 0.0
+    for _ in range(repeat):
+        with database.SessionLocal() as db:
+            started = time.perf_counter()
+            body, encode_started = page(db, field, page_size)
+            finished = time.perf_counter()
+        total += finished - started
+        encode += finished - encode_started
+    return total / repeat, encode / repeat
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    url = sys.argv[2] if len(sys.argv) > 2 else f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    database.engine = create_engine(url)
+    database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+    fill(database.engine, count)
+    field = response_field()
+    orjson = fastjson.orjson
+    print(f"{count} rows; ms per page (encoding share in parentheses)")
+    print(f"{'page size':>9}  {'response_model':>18}  {'FAST_JSON orjson':>18}  {'FAST_JSON json':>18}  speedup")
+    for page_size in PAGE_SIZES:
+        repeat = max(5, 5000 // page_size)
+        model = measure(model_page, field, page_size, repeat)
+        fastjson.orjson = orjson
+        fast = measure(fast_page, field, page_size, repeat) if orjson is not None else None
+        fastjson.orjson = None
+        plain = measure(fast_page, field, page_size, repeat)
+        fastjson.orjson = orjson
+        columns = [model, fast, plain]
+        cells = [f"{t * 1000:8.2f} ({e * 1000:6.2f})" if t is not None else f"{'n/a':>18}"
+                 for t, e in (c if c is not None else (None, None) for c in columns)]
+        best = min(c[0] for c in columns if c is not None)
+        print(f"{page_size:>9}  {cells[0]:>18}  {cells[1]:>18}  {cells[2]:>18}  {model[0] / best:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Microbenchmark: per-log cost of the fast Swap decoder versus web3 contract event processing.
+
+Run from the backend directory:
+    python benchmarks/bench_swap_decoder.py [number_of_logs]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import swap_decoder
+from tests.factories import POOL_ADDRESS, SWAP_EVENT_ABI, random_swap_logs
+
+
+def report(name, seconds, count):
+    print(f"{name:<34} {seconds / count * 1e6:10.2f} us/log")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    logs = random_swap_logs(count)
+
+    seconds = min(timeit.repeat(lambda: [swap_decoder.decode_swap_log(log) for log in logs], number=1, repeat=5))
+    report("swap_decoder.decode_swap_log", seconds, count)
+    seconds = min(timeit.repeat(lambda: swap_decoder.decode_swap_logs(logs), number=1, repeat=5))
+    report("swap_decoder.decode_swap_logs", seconds, count)
+
+    try:
+        from web3 import Web3
+        from web3._utils.method_formatters import log_entry_formatter
+    except ImportError:
+        print("web3 is not installed; skipping the web3 baseline.")
+        return
+    contract = Web3().eth.contract(address=Web3.to_checksum_address(POOL_ADDRESS), abi=[SWAP_EVENT_ABI])
+    formatted = [log_entry_formatter(log) for log in logs]
+    swap = contract.events.Swap()
+    seconds = min(timeit.repeat(lambda: [swap.process_log(log) for log in formatted], number=1, repeat=3))
+    report("web3 Swap().process_log", seconds, count)
+
+
+if __name__ == "__main__":
+    main()
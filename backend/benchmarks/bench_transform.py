@@ -0,0 +1,49 @@
+"""
+Benchmark: per-row cost of the columnar transform versus the row-by-row pydantic conversion.
+
+Run from the backend directory:
+    python benchmarks/bench_transform.py [number_of_transactions ...]    (default: 10000 1000000)
+"""
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import tasks, transform
+from tests.factories import random_etherscan_rows
+
+ETH_PRICE = Decimal("3000.12345678")
+
+
+def report(name, seconds, count):
+    print(f"{name:<34} {seconds / count * 1e6:10.2f} us/row {seconds:10.2f} s")
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 1000000]
+    for count in counts:
+        transactions = tasks.select_transactions(random_etherscan_rows(2 * count), sharded=False)
+        repeat = 5 if count <= 100000 else 1
+        print(f"{count} transactions:")
+        seconds = best_of(lambda: [tasks.build_transaction_row(txn, ETH_PRICE) for txn in transactions], repeat)
+        report("row by row (pydantic)", seconds, len(transactions))
+        seconds = best_of(lambda: transform.to_row_tuples(transform.to_columns(transactions), ETH_PRICE), repeat)
+        report("transform.to_row_tuples", seconds, len(transactions))
+        seconds = best_of(lambda: transform.to_rows(transform.to_columns(transactions), ETH_PRICE), repeat)
+        report("transform.to_rows", seconds, len(transactions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Load test: requests per second and latency percentiles of the API under concurrent clients, with
+a simulated slow Ethereum node behind the swap price lookups.
+
+The server runs in a subprocess on a temporary SQLite database (the async routes through
+aiosqlite when it is installed), without the background tasks. A share of the requests (10% by
+default) asks for the swap prices of transactions that are not decoded yet, each of which waits
+for the node; the others are transaction pages (GET /transactions/) and lookups by hash, 7 to 2.
+
+Run from the backend directory:
+    python benchmarks/load_test.py [--concurrency 64] [--duration 10] [--rpc-latency 0.2] [--swap-share 0.1]
+
+To compare with another revision on the same machine, check it out next to this one and point
+--app-dir at its backend directory, e.g.:
+    git worktree add /tmp/before <commit> && python benchmarks/load_test.py --app-dir /tmp/before/backend
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ROWS = 20000
+UNDECODED_ROWS = 5000
+
+
+def transaction_rows(count, undecoded):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        yield dict(
+            tx_hash="0x%064x" % (i + 1), block_number=19000000 + i, time_stamp=start + timedelta(seconds=12 * i),
+            from_address="0x%040x" % (i + 1), to_address="0x%040x" % (i + 2), gas=200000, gas_price=10 ** 10,
+            gas_used=150000, fee_eth=Decimal("0.0015"), fee_usdt=Decimal("4.5"), created_at=start,
+            swap_price=None if i < undecoded else Decimal("3000"),
+        )
+
+
+def serve(args):
+    """
+    Run the API of args.app_dir on args.port against a fresh SQLite database.
+    """
+    sys.path.insert(0, args.app_dir)
+    import uvicorn
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import app.database as database
+    path = os.path.join(tempfile.mkdtemp(), "load.db")
+    database.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+    # Readers do not block the swap price updates in WAL mode (as with InnoDB).
+    with database.engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+    if hasattr(database, "create_async_sessionmaker"):
+        database._async_sessionmaker = database.create_async_sessionmaker(
+            f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 30})
+        database._async_ready = True
+
+    from app import crud, rpc
+    from app.swap_decoder import SWAP_EVENT_TOPIC
+    from app.config import settings
+    from app.main import app
+    app.router.on_startup.clear()
+    with database.SessionLocal() as db:
+        crud.bulk_create_transactions(db, list(transaction_rows(ROWS, UNDECODED_ROWS)))
+        db.commit()
+
+    latency = args.rpc_latency
+    # A Swap event of the pool at a price of 1 (sqrtPriceX96 = 2 ** 96).
+    words = [-5, 7, 2 ** 96, 10 ** 18, -200]
+    swap_log = {
+        "address": settings.POOL_ADDRESS,
+        "topics": [SWAP_EVENT_TOPIC, "0x" + "00" * 32, "0x" + "00" * 32],
+        "data": "0x" + b"".join(word.to_bytes(32, "big", signed=True) for word in words).hex(),
+    }
+
+    class SlowNode:
+        """
+        requests.Session stand-in answering every batch of receipts after the RPC latency.
+        """
+
+        def post(self, url, json=None, timeout=None):
+            time.sleep(latency)
+            return FakeResponse([{"jsonrpc": "2.0", "id": item["id"], "result": {"logs": [swap_log]}} for item in json])
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    rpc.get_rpc_client().session = SlowNode()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+async def run_clients(base_url, concurrency, duration, swap_share):
+    import httpx
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    undecoded = iter(range(UNDECODED_ROWS))
+    rng = random.Random(1)
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client):
+        while time.perf_counter() < deadline:
+            roll = rng.random()
+            if roll < swap_share:
+                kind, url = "swapprice", "/transactions/swapprice/0x%064x" % (next(undecoded) + 1)
+            elif roll < swap_share + (1 - swap_share) * 7 / 9:
+                kind, url = "page", f"/transactions/?page_size=50&page={rng.randint(1, 20)}"
+            else:
+                kind, url = "lookup", "/transactions/0x%064x" % rng.randint(UNDECODED_ROWS + 1, ROWS)
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[kind].append(time.perf_counter() - started)
+            else:
+                errors[kind] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def report(latencies, errors, elapsed):
+    total = sum(len(values) for values in latencies.values())
+    print(f"{total / elapsed:8.1f} requests/s overall")
+    for kind in ("page", "lookup", "swapprice"):
+        values = sorted(latencies[kind])
+        if not values:
+            continue
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        print(f"  {kind:<10} {len(values) / elapsed:8.1f} req/s  p50 {statistics.median(values) * 1000:7.1f} ms  "
+              f"p99 {p99 * 1000:7.1f} ms  errors {errors[kind]}")
+
+
+def report_cache(base_url):
+    import httpx
+
+    cache = httpx.get(f"{base_url}/metrics", timeout=30).json().get("response_cache")
+    if cache is not None:
+        print(f"  response cache: hit rate {cache['hit_rate']:.0%}, {cache['stale']} stale entries dropped")
+
+
+def wait_until_ready(base_url, process, timeout=120):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The server exited during startup.")
+        try:
+            httpx.get(f"{base_url}/transactions/?page_size=1", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("The server did not start.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="backend directory of the revision to serve")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--rpc-latency", type=float, default=0.2, help="seconds per JSON-RPC request")
+    parser.add_argument("--swap-share", type=float, default=0.1, help="share of swap price requests")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--app-dir", os.path.abspath(args.app_dir),
+               "--port", str(args.port), "--rpc-latency", str(args.rpc_latency)]
+    process = subprocess.Popen(command, cwd=args.app_dir)
+    try:
+        wait_until_ready(base_url, process)
+        print(f"{args.app_dir}: {args.concurrency} clients for {args.duration:.0f} s, "
+              f"{args.swap_share:.0%} swap prices, {args.rpc_latency * 1000:.0f} ms per RPC request")
+        report(*asyncio.run(run_clients(base_url, args.concurrency, args.duration, args.swap_share)))
+        report_cache(base_url)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,5 +14,126 @@ CREATE TABLE IF NOT EXISTS transactions (
     fee_eth DECIMAL(30, 18) NOT NULL,
     fee_usdt DECIMAL(30, 18) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
-    swap_price DECIMAL(30, 18) NULL
-);
\ No newline at end of file
+    swap_price DECIMAL(30, 18) NULL,
+    pool_address VARCHAR(42) NOT NULL DEFAULT '0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640',
+    INDEX ix_transactions_time_stamp_id (time_stamp, id),
+    INDEX ix_transactions_block_number (block_number),
+    INDEX ix_transactions_pool_time_stamp_id (pool_address, time_stamp, id)
+);
+
+-- Compact schema (COMPACT_SCHEMA=1), created by "python -m app.compact migrate":
+--   tx_hash BINARY(32) NOT NULL UNIQUE,
+--   from_address, to_address, pool_address BINARY(20) NOT NULL,
+--   fee_eth, fee_usdt DECIMAL(38, 0) UNSIGNED NOT NULL (10^-18 units; wei for fee_eth)
+
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    name VARCHAR(64) PRIMARY KEY,
+    tokens DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ingest_leases (
+    name VARCHAR(64) PRIMARY KEY,
+    holder VARCHAR(128) NOT NULL,
+    expires_at DOUBLE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ingest_queue (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    shard INT NOT NULL,
+    tx_hash VARCHAR(66) NOT NULL,
+    payload TEXT NOT NULL,
+    eth_price DECIMAL(30, 18) NOT NULL,
+    INDEX ix_ingest_queue_shard (shard)
+);
+
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    source VARCHAR(64) PRIMARY KEY,
+    last_block BIGINT NOT NULL,
+    updated_at DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS backfill_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    start_time DATETIME NOT NULL,
+    end_time DATETIME NOT NULL,
+    start_block BIGINT NULL,
+    end_block BIGINT NULL,
+    pool_address VARCHAR(42) NULL,
+    status VARCHAR(16) NOT NULL,
+    error TEXT NULL,
+    created_at DATETIME NOT NULL,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL
+);
+
+CREATE TABLE IF NOT EXISTS backfill_ranges (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id INT NOT NULL,
+    start_block BIGINT NOT NULL,
+    end_block BIGINT NOT NULL,
+    next_block BIGINT NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    rows_fetched BIGINT NOT NULL DEFAULT 0,
+    rows_inserted BIGINT NOT NULL DEFAULT 0,
+    INDEX ix_backfill_ranges_job_id (job_id),
+    FOREIGN KEY (job_id) REFERENCES backfill_jobs (id)
+);
+
+CREATE TABLE IF NOT EXISTS block_timestamps (
+    block_number BIGINT PRIMARY KEY,
+    time_stamp BIGINT NOT NULL,
+    INDEX ix_block_timestamps_time_stamp (time_stamp)
+);
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(64) PRIMARY KEY,
+    applied_at DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS fee_rollups (
+    bucket VARCHAR(8) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    tx_count BIGINT NOT NULL DEFAULT 0,
+    fee_eth DECIMAL(40, 18) NOT NULL DEFAULT 0,
+    fee_usdt DECIMAL(40, 18) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS price_quotes (
+    symbol VARCHAR(16) PRIMARY KEY,
+    price DECIMAL(30, 18) NOT NULL,
+    fetched_at DOUBLE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS price_candles (
+    symbol VARCHAR(16) NOT NULL,
+    open_time BIGINT NOT NULL,
+    close DECIMAL(30, 8) NOT NULL,
+    PRIMARY KEY (symbol, open_time)
+);
+
+CREATE TABLE IF NOT EXISTS price_candle_ranges (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    symbol VARCHAR(16) NOT NULL,
+    start_time BIGINT NOT NULL,
+    end_time BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS swap_decode_queue (
+    tx_hash VARCHAR(66) PRIMARY KEY,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DOUBLE NOT NULL DEFAULT 0,
+    claimed_by VARCHAR(160) NULL,
+    last_error TEXT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_swap_decode_queue_status (status),
+    INDEX ix_swap_decode_queue_next_attempt_at (next_attempt_at)
+);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(32) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL
+);
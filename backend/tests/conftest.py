@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import pytest
+from datetime import datetime
+
+# Add the project root to sys.path so that the "app" package can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+###############################################################################
+# Override the Database Engine to Use a Temporary SQLite Database for Testing
+###############################################################################
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Create a SQLite engine on a temporary database file. Every session gets its own connection,
+# as with MySQL, so background threads (pipeline stages, backfill workers) cannot roll back each
+# other's transactions the way they would on one shared in-memory connection.
+test_db_dir = tempfile.mkdtemp(prefix="uniswap-tests-")
+test_engine = create_engine(
+    f"sqlite:///{os.path.join(test_db_dir, 'test.db')}",
+    connect_args={"check_same_thread": False, "timeout": 30},
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+###############################################################################
+# Patch the Database Module to Use the Test Engine and Session
+###############################################################################
+
+import app.database as db_mod
+db_mod.engine = test_engine
+db_mod.SessionLocal = TestingSessionLocal
+
+# The API routes use an aiosqlite engine on the same file, or the sync engine on the threadpool
+# when aiosqlite is not installed.
+db_mod._async_sessionmaker = db_mod.create_async_sessionmaker(
+    f"sqlite+aiosqlite:///{os.path.join(test_db_dir, 'test.db')}", connect_args={"timeout": 30},
+)
+db_mod._async_ready = True
+
+###############################################################################
+# Patch the "created_at" Column Default in the Transaction Model for SQLite
+###############################################################################
+
+from app.models import Transaction
+from sqlalchemy.schema import ColumnDefault
+
+# Remove the server_default (which may return the literal string "CURRENT_TIMESTAMP")
+# and set a Python-side default wrapped in a ColumnDefault.
+if "created_at" in Transaction.__table__.columns:
+    Transaction.__table__.columns["created_at"].server_default = None
+    Transaction.__table__.columns["created_at"].default = ColumnDefault(datetime.utcnow)
+
+from app.database import Base
+from app import blockindex, klines, logsource, responsecache, scheduler, swapcache
+from app.config import settings
+
+# Read the data version on every request, so responses cached by one step of a test are not
+# served after the next step wrote to the database.
+settings.RESPONSE_CACHE_VERSION_TTL = 0
+
+###############################################################################
+# Fixtures
+###############################################################################
+
+@pytest.fixture(scope="module")
+def test_db():
+    """
+    Fixture: Set up and tear down the test database.
+    Uses a temporary SQLite database file that all sessions share.
+    Creates all tables before tests and drops them after tests.
+    """
+    Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(autouse=True)
+def clear_db(test_db):
+    """
+    Fixture: Clear the database between tests.
+    This fixture drops and re-creates all tables after each test to ensure test isolation.
+    """
+    yield
+    Base.metadata.drop_all(bind=test_engine)
+    Base.metadata.create_all(bind=test_engine)
+    # The block index, the kline store, the swap price cache, the log sources, the poll scheduler
+    # and the response cache keep state in memory; start every test from the (empty) tables again.
+    blockindex._index = None
+    klines._store = None
+    swapcache._cache = None
+    logsource._sources.clear()
+    scheduler._scheduler = None
+    responsecache._cache = None
@@ -0,0 +1,115 @@
+"""
+Generators of upstream data shared by the tests and the benchmarks: Etherscan tokentx rows,
+Swap logs and receipts, and a stand-in for a requests response.
+"""
+import random
+
+from app import swap_decoder
+
+T0 = 1704067200  # 2024-01-01 00:00:00 UTC
+
+POOL_ADDRESS = "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640"
+
+SWAP_EVENT_ABI = {
+    "anonymous": False,
+    "inputs": [
+        {"indexed": True, "internalType": "address", "name": "sender", "type": "address"},
+        {"indexed": True, "internalType": "address", "name": "recipient", "type": "address"},
+        {"indexed": False, "internalType": "int256", "name": "amount0", "type": "int256"},
+        {"indexed": False, "internalType": "int256", "name": "amount1", "type": "int256"},
+        {"indexed": False, "internalType": "uint160", "name": "sqrtPriceX96", "type": "uint160"},
+        {"indexed": False, "internalType": "uint128", "name": "liquidity", "type": "uint128"},
+        {"indexed": False, "internalType": "int24", "name": "tick", "type": "int24"},
+    ],
+    "name": "Swap",
+    "type": "event",
+}
+
+
+def make_swap_log(amount0, amount1, sqrt_price_x96, liquidity, tick):
+    """
+    Build a raw JSON-RPC Swap log with the given non-indexed arguments.
+    """
+    words = [amount0, amount1, sqrt_price_x96, liquidity, tick]
+    data = b"".join(word.to_bytes(32, "big", signed=True) for word in words)
+    return {
+        "address": POOL_ADDRESS,
+        "topics": [
+            swap_decoder.SWAP_EVENT_TOPIC,
+            "0x" + "00" * 12 + "11" * 20,
+            "0x" + "00" * 12 + "22" * 20,
+        ],
+        "data": "0x" + data.hex(),
+        "blockNumber": "0x10",
+        "blockHash": "0x" + "33" * 32,
+        "transactionHash": "0x" + "44" * 32,
+        "transactionIndex": "0x0",
+        "logIndex": "0x0",
+        "removed": False,
+    }
+
+
+def random_swap_logs(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        make_swap_log(
+            rng.randint(-2 ** 255, 2 ** 255 - 1),
+            rng.randint(-2 ** 255, 2 ** 255 - 1),
+            rng.randint(0, 2 ** 160 - 1),
+            rng.randint(0, 2 ** 128 - 1),
+            rng.randint(-2 ** 23, 2 ** 23 - 1),
+        )
+        for _ in range(count)
+    ]
+
+
+def random_etherscan_rows(count, seed=1):
+    """
+    Build raw Etherscan tokentx rows; every swap has two transfer rows with the same hash.
+    """
+    rng = random.Random(seed)
+    rows = []
+    block_number, time_stamp = 18900000, T0
+    while len(rows) < count:
+        if rng.random() < 0.3:
+            block_number += 1
+            time_stamp += 12
+        row = {
+            "hash": "0x%064x" % rng.getrandbits(256),
+            "blockNumber": str(block_number),
+            "timeStamp": str(time_stamp),
+            "from": "0x%040x" % rng.getrandbits(160),
+            "to": "0x%040x" % rng.getrandbits(160),
+            "gas": str(rng.randint(21000, 500000)),
+            "gasPrice": str(rng.randint(10 ** 9, 500 * 10 ** 9)),
+            "gasUsed": str(rng.randint(21000, 300000)),
+        }
+        rows.append(row)
+        rows.append(dict(row))
+    return rows[:count]
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def make_swap_receipt(sqrt_price_x96):
+    words = [-5, 7, sqrt_price_x96, 10 ** 18, -200]
+    data = b"".join(word.to_bytes(32, "big", signed=True) for word in words)
+    return {
+        "logs": [
+            {"address": "0x0000000000000000000000000000000000000001", "topics": [swap_decoder.SWAP_EVENT_TOPIC], "data": "0x"},
+            {
+                "address": POOL_ADDRESS,
+                "topics": [swap_decoder.SWAP_EVENT_TOPIC, "0x" + "00" * 32, "0x" + "00" * 32],
+                "data": "0x" + data.hex(),
+            },
+        ]
+    }
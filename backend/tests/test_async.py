@@ -0,0 +1,52 @@
+import threading
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database
+from app.main import app
+from tests.test_batch import QueryCounter
+from tests.test_pagination import store_transactions
+
+client = TestClient(app)
+
+
+def test_routes_query_through_the_async_engine(test_db):
+    pytest.importorskip("aiosqlite")
+    store_transactions(test_db, 3)
+    async_engine = database.get_async_sessionmaker().kw["bind"]
+    assert async_engine.dialect.is_async
+    with QueryCounter([database.engine]) as sync_counter, QueryCounter([async_engine.sync_engine]) as async_counter:
+        response = client.get("/transactions/", params={"page_size": 2})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert (sync_counter.statements, async_counter.statements) == ([], ["SELECT"])
+
+
+def test_routes_fall_back_to_the_threadpool(monkeypatch, test_db):
+    monkeypatch.setattr(database, "_async_sessionmaker", None)
+    store_transactions(test_db, 3)
+    response = client.get("/transactions/", params={"page_size": 2})
+    assert response.status_code == 200
+    assert [txn["tx_hash"] for txn in response.json()] == [f"0x{2:064x}", f"0x{1:064x}"]
+    assert client.get(f"/transactions/0x{0:064x}").json()["block_number"] == 100
+    assert client.get("/summary").status_code == 200
+
+
+def test_swap_price_decodes_on_the_upstream_threads(monkeypatch, test_db):
+    store_transactions(test_db, 1)
+    threads = []
+
+    def fake_decode_swap_prices(tx_hashes):
+        threads.append(threading.current_thread().name)
+        return {tx_hash: Decimal("3000") for tx_hash in tx_hashes}
+    monkeypatch.setattr("app.tasks.decode_swap_prices", fake_decode_swap_prices)
+
+    response = client.get(f"/transactions/swapprice/0x{0:064x}")
+    assert response.status_code == 200
+    assert Decimal(str(response.json()["swap_price"])) == 3000
+    assert len(threads) == 1 and threads[0].startswith("upstream")
+    # Stored by the route's session: the next lookup needs no decode.
+    assert client.get(f"/transactions/swapprice/0x{0:064x}").status_code == 200
+    assert len(threads) == 1
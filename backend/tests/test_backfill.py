@@ -0,0 +1,182 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app import backfill, crud, database, models, tasks
+from app.config import settings
+from app.klines import get_kline_store
+from app.main import app
+from tests.test_ingest import make_etherscan_row
+
+client = TestClient(app)
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 1, 2)
+IN_RANGE = int(datetime(2024, 1, 1, 12).timestamp())
+TOO_LATE = int(datetime(2024, 1, 3).timestamp())
+
+
+@pytest.fixture(autouse=True)
+def backfill_settings(monkeypatch):
+    monkeypatch.setattr(settings, "BACKFILL_WORKERS", 2)
+    monkeypatch.setattr(settings, "BACKFILL_RANGE_BLOCKS", 50)
+    monkeypatch.setattr(settings, "BACKFILL_FETCH_KLINES", False)
+    monkeypatch.setattr(tasks, "resolve_block_range", lambda start_time, end_time: (1000, 1099))
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "decode_swap_prices", lambda hashes, pools=None: {h: Decimal("0") for h in hashes})
+
+
+def block_row(block_number, timestamp=IN_RANGE):
+    row = make_etherscan_row(f"0x{block_number:064x}", block_number=block_number)
+    row["timeStamp"] = str(timestamp)
+    return row
+
+
+def fake_pages(calls):
+    def iter_block_pages(start_block, end_block=None, offset=100, pool=None):
+        calls.append((start_block, end_block))
+        yield [block_row(block) for block in range(start_block, start_block + 10)]
+        yield [block_row(block) for block in range(start_block + 10, end_block)] + [block_row(end_block, TOO_LATE)]
+    return iter_block_pages
+
+
+def test_split_block_range():
+    assert backfill.split_block_range(1000, 1099, 50) == [(1000, 1049), (1050, 1099)]
+    assert backfill.split_block_range(1000, 1000, 50) == [(1000, 1000)]
+    assert backfill.split_block_range(1, 10, 4) == [(1, 4), (5, 8), (9, 10)]
+
+
+def test_run_job_processes_all_ranges(monkeypatch, test_db):
+    calls = []
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_pages(calls))
+    job = backfill.create_job(test_db, START, END)
+
+    backfill.run_job(job.id)
+
+    test_db.expire_all()
+    status = backfill.job_status(test_db, backfill.get_job(test_db, job.id))
+    assert status["status"] == "completed"
+    assert sorted(calls) == [(1000, 1049), (1050, 1099)]
+    assert status["ranges_total"] == status["ranges_completed"] == 2
+    assert status["progress"] == 1.0
+    assert status["rows_fetched"] == 100
+    # The last block of each range lies outside the time window.
+    assert status["rows_inserted"] == 98
+    assert test_db.query(models.Transaction).count() == 98
+
+
+def test_run_job_prices_fees_at_block_time(monkeypatch, test_db):
+    calls = []
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_pages(calls))
+    # Only the minute of IN_RANGE has a candle; everything is in that minute.
+    get_kline_store().store([(IN_RANGE - IN_RANGE % 60, 2000 * 10 ** 8)])
+    job = backfill.create_job(test_db, START, END)
+
+    backfill.run_job(job.id)
+
+    prices = {
+        round(t.fee_usdt / t.fee_eth) for t in test_db.query(models.Transaction)
+    }
+    assert prices == {2000}
+
+
+def test_run_job_resumes_from_range_cursor(monkeypatch, test_db):
+    calls = []
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_pages(calls))
+    job = models.BackfillJob(start_time=START, end_time=END, start_block=1000, end_block=1099, status="running")
+    test_db.add(job)
+    test_db.commit()
+    test_db.add_all([
+        models.BackfillRange(job_id=job.id, start_block=1000, end_block=1049, next_block=1050,
+                             status="completed", rows_fetched=50, rows_inserted=49),
+        models.BackfillRange(job_id=job.id, start_block=1050, end_block=1099, next_block=1070,
+                             status="running", rows_fetched=20, rows_inserted=20),
+    ])
+    test_db.commit()
+
+    backfill.run_job(job.id)
+
+    assert calls == [(1070, 1099)]
+    test_db.expire_all()
+    status = backfill.job_status(test_db, backfill.get_job(test_db, job.id))
+    assert status["status"] == "completed"
+    assert status["rows_fetched"] == 50 + 20 + 30
+
+
+def test_failed_insert_fails_the_range_at_its_cursor(monkeypatch, test_db):
+    monkeypatch.setattr(settings, "BACKFILL_WORKERS", 1)
+    calls = []
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_pages(calls))
+    bulk_create = crud.bulk_create_transactions
+
+    def failing_second_page(db, rows, *args, **kwargs):
+        if rows[0]["block_number"] == 1010:
+            raise OperationalError("INSERT", {}, Exception("lost connection"))
+        return bulk_create(db, rows, *args, **kwargs)
+
+    monkeypatch.setattr(crud, "bulk_create_transactions", failing_second_page)
+    job = backfill.create_job(test_db, START, END)
+    backfill.run_job(job.id)
+
+    test_db.expire_all()
+    first = test_db.query(models.BackfillRange).filter(models.BackfillRange.start_block == 1000).one()
+    # The cursor stays after the first page, which was stored; the failed page was not skipped.
+    assert (first.status, first.next_block, first.rows_inserted) == ("failed", 1009, 10)
+    assert backfill.get_job(test_db, job.id).status == "failed"
+
+    # Resuming the job fetches the failed page again.
+    monkeypatch.setattr(crud, "bulk_create_transactions", bulk_create)
+    backfill.get_job(test_db, job.id).status = "running"
+    test_db.commit()
+    backfill.run_job(job.id)
+    assert calls[-1] == (1009, 1049)
+    test_db.expire_all()
+    assert backfill.get_job(test_db, job.id).status == "completed"
+    assert test_db.query(models.Transaction).count() == 98
+
+def test_cancelled_job_stops_after_current_page(monkeypatch, test_db):
+    monkeypatch.setattr(settings, "BACKFILL_WORKERS", 1)
+    job = backfill.create_job(test_db, START, END)
+
+    def iter_block_pages(start_block, end_block=None, offset=100, pool=None):
+        yield [block_row(start_block)]
+        db = database.SessionLocal()
+        try:
+            backfill.cancel_job(db, job.id)
+        finally:
+            db.close()
+        yield [block_row(start_block + 1)]
+
+    monkeypatch.setattr(tasks, "iter_block_pages", iter_block_pages)
+
+    backfill.run_job(job.id)
+
+    test_db.expire_all()
+    status = backfill.job_status(test_db, backfill.get_job(test_db, job.id))
+    assert status["status"] == "cancelled"
+    assert status["rows_inserted"] == 1
+    assert test_db.query(models.Transaction).count() == 1
+
+
+def test_historical_status_endpoints(monkeypatch, test_db):
+    started = []
+    monkeypatch.setattr(backfill, "start_job", started.append)
+
+    response = client.post("/transactions/historical", params={"start_time": START.isoformat(),
+                                                              "end_time": END.isoformat()})
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+    assert started == [job_id]
+
+    response = client.get(f"/transactions/historical/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+
+    response = client.post(f"/transactions/historical/{job_id}/cancel")
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+
+    assert client.get("/transactions/historical/999").status_code == 404
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import crud, database, models
+from app.config import settings
+from app.main import app
+from tests.test_pagination import store_transactions
+
+client = TestClient(app)
+
+
+class QueryCounter:
+    """
+    Counts the statements run against the transactions table while active.
+    """
+
+    def __init__(self, engines=None):
+        self.statements = []
+        if engines is None:
+            # The sync engine and, when aiosqlite is installed, the engine of the API routes.
+            factory = database.get_async_sessionmaker()
+            engines = [database.engine] + ([factory.kw["bind"].sync_engine] if factory is not None else [])
+        self.engines = engines
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if "transactions" in statement:
+            self.statements.append(statement.split()[0].upper())
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self)
+
+
+def test_transaction_batch_uses_one_query(test_db):
+    store_transactions(test_db, 4)
+    hashes = [f"0x{3:064x}", "0xmissing", f"0x{0:064x}", f"0x{3:064x}"]
+    with QueryCounter() as counter:
+        response = client.post("/transactions/batch", json={"tx_hashes": hashes})
+    assert response.status_code == 200
+    assert counter.statements == ["SELECT"]
+    results = response.json()
+    # One entry per distinct hash, in request order.
+    assert [(r["tx_hash"], r["status"]) for r in results] == [
+        (f"0x{3:064x}", "found"), ("0xmissing", "not_found"), (f"0x{0:064x}", "found")]
+    assert results[0]["transaction"] == client.get(f"/transactions/0x{3:064x}").json()
+    assert results[1]["transaction"] is None
+
+
+def test_swap_price_batch_decodes_missing_prices_once(monkeypatch, test_db):
+    store_transactions(test_db, 4)
+    crud.bulk_update_swap_prices(test_db, {f"0x{0:064x}": Decimal("2500")})
+    test_db.commit()
+    calls = []
+
+    def fake_decode_swap_prices(tx_hashes, pools=None):
+        calls.append((list(tx_hashes), pools))
+        return {tx_hash: Decimal("0") if tx_hash == f"0x{3:064x}" else Decimal("3000") for tx_hash in tx_hashes}
+    monkeypatch.setattr("app.tasks.decode_swap_prices", fake_decode_swap_prices)
+
+    hashes = [f"0x{i:064x}" for i in range(4)] + ["0xmissing"]
+    response = client.post("/transactions/swapprice/batch", json={"tx_hashes": hashes})
+    assert response.status_code == 200
+    assert [(r["status"], r["swap_price"]) for r in response.json()] == [
+        ("stored", 2500), ("decoded", 3000), ("decoded", 3000), ("undecodable", None), ("not_found", None)]
+    # Only the stored rows without a price are decoded, in one call, with their pools.
+    assert calls == [([f"0x{i:064x}" for i in (1, 2, 3)], {f"0x{i:064x}": settings.POOL_ADDRESS for i in (1, 2, 3)})]
+
+    # Decoded prices are stored; the failed decode is remembered by the cache.
+    response = client.post("/transactions/swapprice/batch", json={"tx_hashes": hashes})
+    assert [r["status"] for r in response.json()] == ["stored", "stored", "stored", "undecodable", "not_found"]
+    assert len(calls) == 1
+    test_db.expire_all()
+    assert crud.get_transaction_by_hash(test_db, f"0x{1:064x}").swap_price == 3000
+
+
+def test_batch_size_is_limited(monkeypatch, test_db):
+    monkeypatch.setattr(settings, "BATCH_LOOKUP_MAX_HASHES", 2)
+    for path in ("/transactions/batch", "/transactions/swapprice/batch"):
+        assert client.post(path, json={"tx_hashes": ["0x1", "0x2", "0x3"]}).status_code == 400
+        assert client.post(path, json={"tx_hashes": ["0x1", "0x2", "0x2"]}).status_code == 200
+    assert client.post("/transactions/batch", json={}).status_code == 422
+    assert test_db.query(models.Transaction).count() == 0
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app import blockindex, database, models
+from app.blockindex import BlockIndex, get_block_index
+from app.main import app
+from tests.test_ingest import make_etherscan_row
+
+client = TestClient(app)
+
+HEAD = 20000
+
+
+def block_time(block_number):
+    # Strictly increasing, but irregular block times.
+    return 1_600_000_000 + 12 * block_number + block_number % 7
+
+
+class FakeChain:
+    def __init__(self):
+        self.fetched = []
+
+    def header(self, block):
+        block_number = HEAD if block == "latest" else block
+        self.fetched.append(block)
+        return block_number, block_time(block_number)
+
+
+def brute_force_before(timestamp):
+    return max(n for n in range(HEAD + 1) if block_time(n) <= timestamp)
+
+
+def test_lookups_match_brute_force(test_db):
+    chain = FakeChain()
+    index = BlockIndex(fetch_header=chain.header)
+    for timestamp in (block_time(1234), block_time(1234) + 5, block_time(777) - 1, block_time(19999) + 11):
+        assert index.block_before(timestamp) == brute_force_before(timestamp)
+        expected_after = brute_force_before(timestamp)
+        if block_time(expected_after) != timestamp:
+            expected_after += 1
+        assert index.block_after(timestamp) == expected_after
+    # Interpolation keeps the number of probed headers far below a linear scan.
+    assert len(chain.fetched) < 60
+
+
+def test_cached_bracket_needs_no_headers(test_db):
+    chain = FakeChain()
+    index = BlockIndex(fetch_header=chain.header)
+    timestamp = block_time(5000) + 3
+    assert index.block_before(timestamp) == 5000
+    probes = len(chain.fetched)
+
+    assert index.block_before(timestamp) == 5000
+    assert index.block_after(timestamp) == 5001
+    assert len(chain.fetched) == probes
+
+
+def test_samples_are_persisted(test_db):
+    index = BlockIndex(fetch_header=FakeChain().header)
+    index.block_before(block_time(4321))
+    assert test_db.query(models.BlockTimestamp).count() == len(index)
+
+    chain = FakeChain()
+    reloaded = BlockIndex(fetch_header=chain.header)
+    assert reloaded.block_before(block_time(4321)) == 4321
+    assert chain.fetched == []
+
+
+def test_record_transactions_and_block_bounds(test_db):
+    index = BlockIndex(fetch_header=FakeChain().header, spacing=100)
+    rows = [make_etherscan_row(f"0x{n:064x}", block_number=n) for n in (1000, 1050, 2000)]
+    for row in rows:
+        row["timeStamp"] = str(block_time(int(row["blockNumber"])))
+    index.record_transactions(rows)
+    # Only the first and last row of a page are sampled.
+    assert list(index.blocks) == [1000, 2000]
+    # Samples closer than the spacing to a known one are dropped.
+    index.record_transactions(rows[1:2])
+    assert list(index.blocks) == [1000, 2000]
+
+    start = datetime.fromtimestamp(block_time(1200))
+    end = datetime.fromtimestamp(block_time(1500))
+    assert index.block_bounds(start, end) == (1000, 1999)
+    assert index.block_bounds(None, datetime.fromtimestamp(block_time(2500))) == (None, None)
+
+
+def test_other_workers_samples_are_picked_up_after_the_refresh_interval(test_db):
+    now = [0.0]
+    ours = BlockIndex(fetch_header=FakeChain().header, refresh_interval=60, clock=lambda: now[0])
+    other = BlockIndex(fetch_header=FakeChain().header)
+    ours.add_samples([(1000, block_time(1000))])
+    other.add_samples([(2000, block_time(2000))])
+    end = datetime.fromtimestamp(block_time(1500))
+    assert ours.block_bounds(None, end) == (None, None)
+
+    now[0] = 60
+    assert ours.stale
+    assert ours.block_bounds(None, end) == (None, 1999)
+    assert list(ours.blocks) == [1000, 2000] and not ours.stale
+
+def test_routes_load_the_index_off_the_event_loop(monkeypatch, test_db):
+    test_db.add_all([models.BlockTimestamp(block_number=n, time_stamp=block_time(n)) for n in (1000, 2000)])
+    test_db.commit()
+
+    def blocking_session():
+        raise AssertionError("the block index must be loaded through the request's session")
+
+    # The list route loads the samples with the request's async session (run_sync).
+    monkeypatch.setattr(database, "SessionLocal", blocking_session)
+    start = datetime.fromtimestamp(block_time(1200)).isoformat()
+    assert client.get("/transactions/", params={"start_time": start}).status_code == 200
+    assert list(get_block_index().blocks) == [1000, 2000]
+
+    # The export route loads them in a worker thread before streaming.
+    def load(self, db=None):
+        try:
+            asyncio.get_running_loop()
+            calls.append("event loop")
+        except RuntimeError:
+            calls.append("worker thread")
+
+    calls = []
+    monkeypatch.setattr(blockindex, "_index", None)
+    monkeypatch.setattr(BlockIndex, "load", load)
+    assert client.get("/transactions/export", params={"start_time": start}).status_code == 200
+    # The route loads the index; streaming (also in worker threads) only reads it.
+    assert calls and set(calls) == {"worker thread"}
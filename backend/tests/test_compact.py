@@ -0,0 +1,101 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import MetaData, create_engine, inspect
+from sqlalchemy.dialects import mysql
+
+from app import compact, crud, database
+from app.config import settings
+from app.sqltypes import COMPACT_TYPES
+
+HASHES = [f"0x{i:064x}" for i in range(1, 6)]
+SENDER = "0x" + "ab" * 20
+
+
+def store_transactions(db, hashes, first_id=1):
+    rows = [
+        dict(id=first_id + i, tx_hash=tx_hash, block_number=100 + i, time_stamp=datetime(2024, 1, 1, 0, i),
+             from_address=SENDER, to_address="0x" + "cd" * 20, gas=30000, gas_price=25 * 10 ** 9,
+             gas_used=21000 + i, fee_eth=Decimal(21000 + i) * 25 * 10 ** 9 / 10 ** 18,
+             fee_usdt=Decimal("1.575123"))
+        for i, tx_hash in enumerate(hashes)
+    ]
+    crud.bulk_create_transactions(db, rows)
+    db.commit()
+
+
+def test_compact_types_round_trip():
+    engine = create_engine("sqlite://")
+    table = compact.transaction_table(MetaData(), "transactions", COMPACT_TYPES)
+    table.create(bind=engine)
+    fee_eth = Decimal("123456789012345678").scaleb(-18)
+    with engine.begin() as connection:
+        connection.execute(table.insert().values(
+            id=1, tx_hash=HASHES[0].upper().replace("0X", "0x"), block_number=1, time_stamp=datetime(2024, 1, 1),
+            from_address=SENDER, to_address=SENDER, gas=1, gas_price=1, gas_used=1, fee_eth=fee_eth,
+            fee_usdt=Decimal("370.370370370370370371"), created_at=datetime(2024, 1, 1), pool_address=settings.POOL_ADDRESS))
+        row = connection.execute(table.select().where(table.c.tx_hash == HASHES[0])).one()
+        # Stored as raw bytes and integers, read back as hex strings and Decimals.
+        raw = connection.exec_driver_sql("SELECT tx_hash, from_address, fee_eth, fee_usdt FROM transactions").one()
+        # Malformed hashes simply find nothing.
+        assert connection.execute(table.select().where(table.c.tx_hash == "not-a-hash")).first() is None
+        with pytest.raises(Exception):
+            connection.execute(table.update().values(fee_eth=Decimal(10 ** 20)))
+    assert (row.tx_hash, row.from_address, row.pool_address) == (HASHES[0], SENDER, settings.POOL_ADDRESS)
+    # fee_usdt keeps all 18 decimals of the string schema.
+    assert (row.fee_eth, row.fee_usdt) == (fee_eth, Decimal("370.370370370370370371"))
+    assert (len(raw[0]), len(raw[1]), int(raw[2]), int(raw[3])) == (32, 20, 123456789012345678, 370370370370370370371)
+
+
+def test_compact_fees_above_the_64_bit_range():
+    # 25 ETH is 2.5 * 10^19 wei, more than a BIGINT UNSIGNED holds.
+    fee_eth = Decimal("25.000000000000000001")
+    engine = create_engine("sqlite://")
+    table = compact.transaction_table(MetaData(), "transactions", COMPACT_TYPES)
+    table.create(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(table.insert().values(
+            id=1, tx_hash=HASHES[0], block_number=1, time_stamp=datetime(2024, 1, 1), from_address=SENDER,
+            to_address=SENDER, gas=1, gas_price=1, gas_used=1, fee_eth=fee_eth, fee_usdt=Decimal("75000.5"),
+            created_at=datetime(2024, 1, 1), pool_address=settings.POOL_ADDRESS))
+        row = connection.execute(table.select()).one()
+    assert (row.fee_eth, row.fee_usdt) == (fee_eth, Decimal("75000.5"))
+
+    # On MySQL the column is DECIMAL(38, 0) and the wei are bound as an exact integer.
+    fee_type = COMPACT_TYPES.fee_eth
+    assert str(fee_type.load_dialect_impl(mysql.dialect()).compile(dialect=mysql.dialect())) == \
+        "DECIMAL(38, 0) UNSIGNED"
+    assert fee_type.process_bind_param(fee_eth, mysql.dialect()) == 25000000000000000001
+
+
+def test_migration_tool_copies_and_swaps(monkeypatch, test_db):
+    engine = database.engine
+    store_transactions(test_db, HASHES[:3])
+    assert compact.copy_rows(engine, batch_size=2) == 3
+    # Ingestion continues during the copy: a new row and a swap price decoded for a copied row.
+    store_transactions(test_db, HASHES[3:], first_id=4)
+    crud.bulk_update_swap_prices(test_db, {HASHES[0]: Decimal("2500.5")})
+    test_db.commit()
+
+    compact.swap_tables(engine, batch_size=2)
+    status = compact.status(engine)
+    assert status["transactions"]["schema"] == "compact"
+    assert status["transactions"]["rows"] == 5
+    assert status["transactions_legacy"] == dict(status["transactions_legacy"], schema="string", rows=5)
+    names = {index["name"] for index in inspect(engine).get_indexes("transactions")}
+    assert {"ix_transactions_tx_hash", "ix_transactions_time_stamp_id", "ix_transactions_pool_time_stamp_id"} <= names
+
+    table = compact.transaction_table(MetaData(), "transactions", COMPACT_TYPES)
+    with engine.connect() as connection:
+        rows = connection.execute(table.select().order_by(table.c.id)).fetchall()
+    assert [row.tx_hash for row in rows] == HASHES
+    assert rows[0].swap_price == Decimal("2500.5")
+    assert rows[1].fee_eth == Decimal("0.000525025")
+    assert rows[4].from_address == SENDER
+
+    with pytest.raises(RuntimeError):
+        compact.check_schema(engine)
+    monkeypatch.setattr(settings, "COMPACT_SCHEMA", True)
+    compact.check_schema(engine)
+    compact.drop_legacy(engine)
@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+from sqlalchemy.exc import OperationalError
+
+from app import coordination, crud, models, tasks
+from app.config import settings
+from tests.test_ingest import make_etherscan_row
+
+
+def test_lease_is_exclusive_until_it_expires(monkeypatch, test_db):
+    now = [1000.0]
+    monkeypatch.setattr(coordination.time, "time", lambda: now[0])
+
+    assert coordination.acquire_lease(test_db, "live_ingest", "worker-a", ttl=60)
+    assert not coordination.acquire_lease(test_db, "live_ingest", "worker-b", ttl=60)
+    # The holder renews its own lease.
+    now[0] += 30
+    assert coordination.acquire_lease(test_db, "live_ingest", "worker-a", ttl=60)
+    # Once the lease expires, another worker takes over.
+    now[0] += 61
+    assert coordination.acquire_lease(test_db, "live_ingest", "worker-b", ttl=60)
+    assert not coordination.acquire_lease(test_db, "live_ingest", "worker-a", ttl=60)
+
+    coordination.release_lease(test_db, "live_ingest", "worker-b")
+    assert coordination.acquire_lease(test_db, "live_ingest", "worker-a", ttl=60)
+
+
+def test_enqueue_partitions_rows_by_shard(test_db):
+    hashes = [f"0x{i:064x}" for i in range(9)]
+    transactions = [make_etherscan_row(h) for h in hashes for _ in range(2)]
+    assert coordination.enqueue_transactions(test_db, transactions, Decimal("3000"), total_shards=3) == 9
+    assert coordination.queue_depth(test_db) == {0: 3, 1: 3, 2: 3}
+    items = coordination.claim_shard_batch(test_db, 1, limit=10)
+    assert sorted(item.tx_hash for item in items) == [hashes[1], hashes[4], hashes[7]]
+
+
+def test_leader_mode_fetches_once_for_all_workers(monkeypatch, test_db):
+    """
+    With three workers polling in leader mode, the upstream is hit by the leader only and every
+    transaction is stored exactly once by the worker owning its shard.
+    """
+    hashes = [f"0x{i:064x}" for i in range(1, 10)]
+    fetches = []
+
+    def fake_iter_block_pages(start_block, end_block=None, offset=100, pool=None, sharded=False):
+        fetches.append(start_block)
+        yield [make_etherscan_row(h) for h in hashes]
+
+    monkeypatch.setattr(settings, "INGEST_COORDINATION", "leader")
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 3)
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_iter_block_pages)
+    monkeypatch.setattr(tasks, "latest_block_number", lambda: 150)
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "decode_swap_prices", lambda tx_hashes, pools=None: {h: Decimal("0") for h in tx_hashes})
+
+    for worker_id in range(3):
+        monkeypatch.setattr(settings, "WORKER_ID", worker_id)
+        monkeypatch.setattr(coordination, "worker_identity", lambda worker_id=worker_id: f"worker-{worker_id}")
+        tasks.poll_live_transactions(test_db)
+
+    assert len(fetches) == 1
+    assert coordination.queue_depth(test_db) == {}
+    assert crud.get_existing_hashes(test_db, hashes) == set(hashes)
+    assert test_db.query(models.Transaction).count() == 9
+
+
+def test_failed_queue_group_stays_queued(monkeypatch, test_db):
+    """
+    Entries whose insert fails are not acknowledged; the next drain stores them.
+    """
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+    monkeypatch.setattr(tasks, "decode_swap_prices", lambda tx_hashes, pools=None: {h: Decimal("0") for h in tx_hashes})
+    cheap = [make_etherscan_row(f"0x{i:064x}") for i in range(1, 3)]
+    dear = [make_etherscan_row(f"0x{i:064x}") for i in range(3, 5)]
+    coordination.enqueue_transactions(test_db, cheap, Decimal("3000"), total_shards=1)
+    coordination.enqueue_transactions(test_db, dear, Decimal("4000"), total_shards=1)
+    bulk_create = crud.bulk_create_transactions
+
+    def failing_dear_group(db, rows, *args, **kwargs):
+        if rows[0]["tx_hash"] == dear[0]["hash"]:
+            raise OperationalError("INSERT", {}, Exception("lock wait timeout"))
+        return bulk_create(db, rows, *args, **kwargs)
+
+    monkeypatch.setattr(crud, "bulk_create_transactions", failing_dear_group)
+    assert tasks.drain_work_queue(test_db) == 2
+    assert coordination.queue_depth(test_db) == {0: 2}
+
+    monkeypatch.setattr(crud, "bulk_create_transactions", bulk_create)
+    assert tasks.drain_work_queue(test_db) == 2
+    assert coordination.queue_depth(test_db) == {}
+    assert test_db.query(models.Transaction).count() == 4
@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app import crud, decodequeue, models, tasks
+from app.config import settings
+from app.decodequeue import SwapDecodeQueue
+from app.main import app
+from tests.test_ingest import make_etherscan_row
+from tests.factories import make_swap_log
+
+client = TestClient(app)
+
+HASHES = [f"0x{i:064x}" for i in range(1, 4)]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def store_transactions(monkeypatch, test_db):
+    monkeypatch.setattr(settings, "SWAP_DECODE_QUEUE", True)
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+
+    def unexpected_decode(tx_hashes):
+        raise AssertionError("swap prices must not be decoded during the insert")
+    monkeypatch.setattr(tasks, "decode_swap_prices", unexpected_decode)
+    inserted, _ = tasks.process_transactions([make_etherscan_row(h) for h in HASHES], Decimal("3000"), test_db)
+    assert inserted == 3
+
+
+def test_inserted_transactions_are_queued_and_decoded(monkeypatch, test_db):
+    store_transactions(monkeypatch, test_db)
+    assert test_db.query(models.Transaction).filter(models.Transaction.swap_price.is_(None)).count() == 3
+    assert decodequeue.backlog(test_db) == {"pending": 3, "dead": 0}
+
+    # A receipt with a Swap at price 1, one without a Swap, and one that is not available yet.
+    receipts = {HASHES[0]: {"logs": [make_swap_log(-1, 1, 2 ** 96, 1, 0)]}, HASHES[1]: {"logs": []}}
+    clock = FakeClock()
+    queue = SwapDecodeQueue(lambda tx_hashes: receipts, retry_base=10, clock=clock)
+    assert queue.drain() == 3
+
+    test_db.expire_all()
+    assert crud.get_transaction_by_hash(test_db, HASHES[0]).swap_price == Decimal("1")
+    assert crud.get_transaction_by_hash(test_db, HASHES[1]).swap_price is None
+    (retry,) = test_db.query(models.SwapDecodeItem).all()
+    assert (retry.tx_hash, retry.status, retry.attempts) == (HASHES[2], "pending", 1)
+    assert retry.next_attempt_at == clock.now + 10
+    assert retry.claimed_by is None
+    assert queue.metrics() == {"batches": 1, "decoded": 1, "no_swap": 1, "retries": 1, "dead_lettered": 0}
+
+    # Not due before the backoff has passed.
+    assert queue.drain() == 0
+    clock.now += 10
+    receipts[HASHES[2]] = {"logs": [make_swap_log(-1, 1, 2 ** 97, 1, 0)]}
+    assert queue.drain() == 1
+    test_db.expire_all()
+    assert crud.get_transaction_by_hash(test_db, HASHES[2]).swap_price == Decimal("4")
+    assert decodequeue.backlog(test_db) == {"pending": 0, "dead": 0}
+
+
+def test_entries_are_dead_lettered_after_max_attempts(monkeypatch, test_db):
+    store_transactions(monkeypatch, test_db)
+
+    def unavailable(tx_hashes):
+        raise RuntimeError("node unavailable")
+
+    clock = FakeClock()
+    queue = SwapDecodeQueue(unavailable, max_attempts=3, retry_base=1, retry_max=2, clock=clock)
+    for _ in range(3):
+        assert queue.drain() == 3
+        clock.now += 2
+    assert decodequeue.backlog(test_db) == {"pending": 0, "dead": 3}
+    dead = test_db.query(models.SwapDecodeItem).first()
+    assert dead.attempts == 3
+    assert "node unavailable" in dead.last_error
+    assert client.get("/metrics").json()["swap_decode_queue"]["backlog"] == {"pending": 0, "dead": 3}
+
+    assert decodequeue.requeue_dead(test_db) == 3
+    assert decodequeue.backlog(test_db) == {"pending": 3, "dead": 0}
+
+
+def test_claims_do_not_overlap(monkeypatch, test_db):
+    store_transactions(monkeypatch, test_db)
+    queue = SwapDecodeQueue(batch_size=2)
+
+    first_token, first = queue.claim(test_db)
+    second_token, second = queue.claim(test_db)
+    assert first_token != second_token
+    assert len(first) == 2 and len(second) == 1
+    assert set(first) | set(second) == set(HASHES)
+    assert queue.claim(test_db) == ("", [])
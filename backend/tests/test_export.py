@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import export
+from app.config import settings
+from app.main import app
+from tests.test_pagination import store_transactions
+
+client = TestClient(app)
+
+
+def test_ndjson_export_streams_all_rows_in_order(monkeypatch, test_db):
+    store_transactions(test_db, 7)
+    # Three rows per chunk: the export spans several cursor partitions.
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_ROWS", 3)
+
+    response = client.get("/transactions/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["tx_hash"] for row in rows] == [f"0x{i:064x}" for i in range(7)]
+    # Same fields and encoding as GET /transactions.
+    listed = {txn["tx_hash"]: txn for txn in client.get("/transactions/", params={"page_size": 10}).json()}
+    assert rows == [listed[row["tx_hash"]] for row in rows]
+
+
+def test_csv_export_filters_by_time(test_db):
+    store_transactions(test_db, 6)
+    response = client.get("/transactions/export", params={
+        "format": "csv", "start_time": "2024-01-01T00:00:01", "end_time": "2024-01-01T00:00:02"})
+    assert response.status_code == 200
+    assert 'filename="transactions.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["tx_hash"] for row in rows] == [f"0x{i:064x}" for i in range(2, 6)]
+    assert list(rows[0]) == export.FIELDS
+    # SQLite stores DECIMAL as a float; MySQL returns the exact value.
+    assert float(rows[0]["fee_eth"]) == 0.1
+    assert rows[0]["time_stamp"] == "2024-01-01T00:00:01"
+
+
+def test_export_rejects_invalid_ranges(test_db):
+    params = {"start_time": "2024-01-02T00:00:00", "end_time": "2024-01-01T00:00:00"}
+    assert client.get("/transactions/export", params=params).status_code == 400
+    assert client.get("/transactions/export", params={"format": "xml"}).status_code == 422
+
+
+def test_parquet_export(monkeypatch, test_db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    store_transactions(test_db, 5)
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_ROWS", 2)
+    response = client.get("/transactions/export", params={"format": "parquet"})
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column_names == export.FIELDS
+    assert table.column("tx_hash").to_pylist() == [f"0x{i:064x}" for i in range(5)]
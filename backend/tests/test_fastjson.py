@@ -0,0 +1,72 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud, fastjson
+from app.config import settings
+from app.main import app
+
+client = TestClient(app)
+
+
+def store_varied_transactions(db):
+    rows = [
+        dict(tx_hash=f"0x{i:064x}", block_number=19000000 + i, time_stamp=datetime(2024, 1, 1, 12, 0, i, 1000 * i),
+             from_address=f"0x{i:040x}", to_address="0xb", gas=300000 + i, gas_price=12345678901 * (i + 1),
+             gas_used=150000, fee_eth=fee_eth, fee_usdt=fee_usdt)
+        for i, (fee_eth, fee_usdt) in enumerate([
+            (Decimal("0.001523456789012345"), Decimal("4.56")),
+            (Decimal("0.00001"), Decimal("0")),
+            (Decimal("12.5"), Decimal("31234.987654")),
+            (Decimal("0.1"), Decimal("1")),
+        ])
+    ]
+    crud.bulk_create_transactions(db, rows)
+    crud.bulk_update_swap_prices(db, {f"0x{0:064x}": Decimal("3012.345678"), f"0x{2:064x}": Decimal("0.000001")})
+    db.commit()
+
+
+def get_both(monkeypatch, request):
+    """
+    Return the responses of request() with FAST_JSON off and on (built, not served from the
+    response cache).
+    """
+    monkeypatch.setattr(settings, "RESPONSE_CACHE", False)
+    monkeypatch.setattr(settings, "FAST_JSON", False)
+    slow = request()
+    monkeypatch.setattr(settings, "FAST_JSON", True)
+    fast = request()
+    assert slow.status_code == fast.status_code == 200
+    assert fast.headers["content-type"] == slow.headers["content-type"]
+    return slow, fast
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_json_matches_the_response_model_output(monkeypatch, test_db, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(fastjson, "orjson", None)
+    store_varied_transactions(test_db)
+
+    slow, fast = get_both(monkeypatch, lambda: client.get("/transactions/", params={"page_size": 3}))
+    assert fast.json() == slow.json()
+    assert [list(txn) for txn in fast.json()] == [list(txn) for txn in slow.json()]
+    assert fast.headers["X-Next-Cursor"] == slow.headers["X-Next-Cursor"]
+    if not use_orjson:
+        # The json module with starlette's options writes the same bytes.
+        assert fast.content == slow.content
+
+    hashes = {"tx_hashes": [f"0x{2:064x}", "0xmissing", f"0x{1:064x}"]}
+    slow, fast = get_both(monkeypatch, lambda: client.post("/transactions/batch", json=hashes))
+    assert fast.json() == slow.json()
+    assert fast.json()[1] == {"tx_hash": "0xmissing", "status": "not_found", "transaction": None}
+
+
+def test_last_page_has_no_cursor(test_db):
+    store_varied_transactions(test_db)
+    response = client.get("/transactions/", params={"page_size": 10})
+    assert len(response.json()) == 4
+    assert "X-Next-Cursor" not in response.headers
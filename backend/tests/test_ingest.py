@@ -0,0 +1,217 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import crud, models, tasks
+from app.config import settings
+
+
+def make_etherscan_row(txn_hash, block_number=100, gas_used=21000, gas_price=1000000000):
+    """
+    Build a raw Etherscan tokentx row as returned by the API.
+    """
+    return {
+        "hash": txn_hash,
+        "blockNumber": str(block_number),
+        "timeStamp": str(int(datetime(2024, 1, 1).timestamp())),
+        "from": "0xfrom",
+        "to": "0xto",
+        "gas": "30000",
+        "gasPrice": str(gas_price),
+        "gasUsed": str(gas_used),
+    }
+
+
+def test_bulk_create_transactions_skips_existing(test_db):
+    """
+    Rows whose hash is already stored are reported as skipped and not inserted twice.
+    """
+    rows = [
+        dict(tx_hash=f"0x{i:064x}", block_number=i, time_stamp=datetime(2024, 1, 1), from_address="0xa",
+             to_address="0xb", gas=1, gas_price=1, gas_used=1, fee_eth=Decimal("0.1"), fee_usdt=Decimal("1"))
+        for i in range(1, 6)
+    ]
+    result = crud.bulk_create_transactions(test_db, rows[:2])
+    test_db.commit()
+    assert (result.inserted, result.skipped) == (2, 0)
+
+    result = crud.bulk_create_transactions(test_db, rows)
+    test_db.commit()
+    assert (result.inserted, result.skipped) == (3, 2)
+    assert sorted(result.new_hashes) == sorted(row["tx_hash"] for row in rows[2:])
+    assert test_db.query(models.Transaction).count() == 5
+
+
+def test_bulk_create_transactions_chunks_inserts(monkeypatch, test_db):
+    """
+    Batches larger than INSERT_CHUNK_SIZE are split into several multi-row statements.
+    """
+    monkeypatch.setattr(settings, "INSERT_CHUNK_SIZE", 3)
+    rows = [
+        dict(tx_hash=f"0x{i:064x}", block_number=i, time_stamp=datetime(2024, 1, 1), from_address="0xa",
+             to_address="0xb", gas=1, gas_price=1, gas_used=1, fee_eth=Decimal("0.1"), fee_usdt=Decimal("1"))
+        for i in range(10)
+    ]
+    result = crud.bulk_create_transactions(test_db, rows)
+    test_db.commit()
+    assert result.inserted == 10
+    assert test_db.query(models.Transaction).count() == 10
+
+
+def test_process_transactions_batches_rows(monkeypatch, test_db):
+    """
+    process_transactions stores each hash once, reports counts and bulk-updates swap prices
+    (when swap prices are decoded inline rather than through the decode queue).
+    """
+    monkeypatch.setattr(settings, "SWAP_DECODE_QUEUE", False)
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+    monkeypatch.setattr(tasks, "decode_swap_prices", lambda tx_hashes, pools=None: {h: Decimal("2.5") for h in tx_hashes})
+    hashes = [f"0x{i:064x}" for i in range(1, 4)]
+    # Every swap appears twice in the tokentx feed (one row per token transfer).
+    transactions = [make_etherscan_row(h) for h in hashes for _ in range(2)]
+
+    inserted, skipped = tasks.process_transactions(transactions, Decimal("3000"), test_db)
+    assert (inserted, skipped) == (3, 0)
+    stored = crud.get_transaction_by_hash(test_db, hashes[0])
+    assert stored.fee_eth == Decimal("0.000021")
+    assert stored.swap_price == Decimal("2.5")
+
+    inserted, skipped = tasks.process_transactions(transactions, Decimal("3000"), test_db)
+    assert (inserted, skipped) == (0, 3)
+
+
+def test_iter_block_pages_reanchors_at_result_window(monkeypatch):
+    """
+    Once a query reaches Etherscan's result window, it is re-issued from the last block seen.
+    """
+    monkeypatch.setattr(settings, "ETHERSCAN_RESULT_WINDOW", 4)
+    rows = [make_etherscan_row(f"0x{i:064x}", block_number=100 + i // 2) for i in range(7)]
+    calls = []
+
+    def fake_iter_transaction_pages(sort, offset, start_block, end_block, pool=None):
+        calls.append(start_block)
+        matching = [row for row in rows if int(row["blockNumber"]) >= start_block]
+        for start in range(0, len(matching), offset):
+            yield matching[start:start + offset]
+
+    monkeypatch.setattr(tasks, "iter_transaction_pages", fake_iter_transaction_pages)
+    pages = list(tasks.iter_block_pages(100, offset=2))
+    assert calls == [100, 101, 102]
+    fetched = {row["hash"] for page in pages for row in page}
+    assert fetched == {row["hash"] for row in rows}
+
+
+def test_live_polling_resumes_from_checkpoint(monkeypatch, test_db):
+    """
+    Each poll only asks for blocks after the checkpoint (minus the overlap) and advances it.
+    """
+    monkeypatch.setattr(settings, "INGEST_COORDINATION", "shard")
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+    monkeypatch.setattr(settings, "CHECKPOINT_OVERLAP_BLOCKS", 2)
+    monkeypatch.setattr(settings, "INITIAL_LOOKBACK_BLOCKS", 50)
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "latest_block_number", lambda: 1000)
+    monkeypatch.setattr(tasks, "decode_swap_prices", lambda tx_hashes, pools=None: {h: Decimal("0") for h in tx_hashes})
+    chain = [make_etherscan_row(f"0x{i:064x}", block_number=960 + i) for i in range(5)]
+    requested = []
+
+    def fake_iter_block_pages(start_block, end_block=None, offset=100, pool=None, sharded=False):
+        requested.append(start_block)
+        matching = [row for row in chain if int(row["blockNumber"]) >= start_block]
+        if matching:
+            yield matching
+
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_iter_block_pages)
+
+    tasks.poll_live_transactions(test_db)
+    assert requested == [1000 - 50 + 1 - 2]
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(settings.POOL_ADDRESS, 0)) == 964
+    assert test_db.query(models.Transaction).count() == 5
+
+    chain.append(make_etherscan_row(f"0x{99:064x}", block_number=970))
+    tasks.poll_live_transactions(test_db)
+    assert requested[-1] == 964 + 1 - 2
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(settings.POOL_ADDRESS, 0)) == 970
+    assert test_db.query(models.Transaction).count() == 6
+
+
+def test_shard_workers_keep_their_own_live_checkpoints(monkeypatch, test_db):
+    """
+    In "shard" mode two workers poll in turn; neither skips the blocks the other has already
+    processed, so both shards of every block are stored.
+    """
+    monkeypatch.setattr(settings, "INGEST_COORDINATION", "shard")
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 2)
+    monkeypatch.setattr(settings, "CHECKPOINT_OVERLAP_BLOCKS", 0)
+    monkeypatch.setattr(settings, "INITIAL_LOOKBACK_BLOCKS", 50)
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "latest_block_number", lambda: 1000)
+    monkeypatch.setattr(tasks, "decode_swap_prices", lambda tx_hashes, pools=None: {h: Decimal("0") for h in tx_hashes})
+    chain = [make_etherscan_row(f"0x{i:064x}", block_number=960 + i) for i in range(4)]
+
+    def fake_iter_block_pages(start_block, end_block=None, offset=100, pool=None, sharded=False):
+        matching = [row for row in chain if int(row["blockNumber"]) >= start_block]
+        if matching:
+            yield matching
+
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_iter_block_pages)
+
+    def poll_as(worker_id):
+        monkeypatch.setattr(settings, "WORKER_ID", worker_id)
+        tasks.poll_live_transactions(test_db)
+
+    poll_as(0)
+    poll_as(1)
+    chain.extend(make_etherscan_row(f"0x{i:064x}", block_number=970 + i) for i in range(4, 8))
+    poll_as(0)
+    poll_as(1)
+    stored = {row.tx_hash for row in test_db.query(models.Transaction.tx_hash)}
+    assert stored == {f"0x{i:064x}" for i in range(8)}
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(settings.POOL_ADDRESS, 0)) == 977
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(settings.POOL_ADDRESS, 1)) == 977
+
+
+def test_failed_insert_keeps_the_checkpoint_before_the_page(monkeypatch, test_db):
+    """
+    A page whose insert fails is fetched again by the next poll instead of being skipped.
+    """
+    monkeypatch.setattr(settings, "INGEST_COORDINATION", "shard")
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+    monkeypatch.setattr(settings, "CHECKPOINT_OVERLAP_BLOCKS", 0)
+    monkeypatch.setattr(settings, "INITIAL_LOOKBACK_BLOCKS", 50)
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "latest_block_number", lambda: 1000)
+    monkeypatch.setattr(tasks, "decode_swap_prices", lambda tx_hashes, pools=None: {h: Decimal("0") for h in tx_hashes})
+    pages = [[make_etherscan_row(f"0x{i:064x}", block_number=960 + i)] for i in range(3)]
+    monkeypatch.setattr(tasks, "iter_block_pages",
+                        lambda start_block, end_block=None, offset=100, pool=None, sharded=False: iter(
+                            [page for page in pages if int(page[0]["blockNumber"]) >= start_block]))
+    bulk_create = crud.bulk_create_transactions
+
+    def failing_second_page(db, rows, *args, **kwargs):
+        if rows[0]["block_number"] == 961:
+            raise OperationalError("INSERT", {}, Exception("lost connection"))
+        return bulk_create(db, rows, *args, **kwargs)
+
+    monkeypatch.setattr(crud, "bulk_create_transactions", failing_second_page)
+    with pytest.raises(OperationalError):
+        tasks.poll_pool(settings.POOL_ADDRESS)
+    checkpoint = tasks.live_checkpoint(settings.POOL_ADDRESS, 0)
+    assert crud.get_checkpoint(test_db, checkpoint) == 959
+    assert test_db.query(models.Transaction).count() == 1
+
+    monkeypatch.setattr(crud, "bulk_create_transactions", bulk_create)
+    tasks.poll_pool(settings.POOL_ADDRESS)
+    assert crud.get_checkpoint(test_db, checkpoint) == 962
+    assert test_db.query(models.Transaction).count() == 3
+
+def test_checkpoint_never_moves_backwards(test_db):
+    crud.advance_checkpoint(test_db, "source", 10)
+    crud.advance_checkpoint(test_db, "source", 5)
+    assert crud.get_checkpoint(test_db, "source") == 10
+    assert crud.get_checkpoint(test_db, "other") is None
@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from app import klines, models, tasks
+from app.klines import KlineStore
+from tests.test_ingest import make_etherscan_row
+
+T0 = 1704067200  # 2024-01-01 00:00:00 UTC
+
+
+def kline(open_time, close):
+    # Binance kline layout: open time (ms), open, high, low, close, volume, close time, ...
+    return [open_time * 1000, "1", "1", "1", close, "0", open_time * 1000 + 59999]
+
+
+def test_price_at_finds_the_minute_candle():
+    store = KlineStore()
+    store.merge([(T0 + 120, 3002 * 10 ** 8), (T0, 3000 * 10 ** 8), (T0 + 60, 3001 * 10 ** 8)])
+    assert list(store.open_times) == [T0, T0 + 60, T0 + 120]
+    assert store.price_at(T0 + 59) == Decimal("3000")
+    assert store.price_at(T0 + 60) == Decimal("3001")
+    assert store.price_at(T0 - 1) is None
+    # No candle for the minute after the last one.
+    assert store.price_at(T0 + 180) is None
+
+    store.merge([(T0 + 60, klines.to_units("3001.5"))])
+    assert len(store) == 3
+    assert store.price_at(T0 + 61) == Decimal("3001.5")
+
+
+def test_import_csv_persists_candles(tmp_path, test_db):
+    path = tmp_path / "ETHUSDT-1m.csv"
+    rows = ["open_time,open,high,low,close,volume,close_time"]
+    # Newer exports give the open time in microseconds.
+    rows += [f"{(T0 + 60 * i) * 10 ** 6},1,1,1,{3000 + i}.25,0,0" for i in range(3)]
+    path.write_text("\n".join(rows) + "\n")
+
+    assert KlineStore().import_csv(str(path)) == 3
+    assert test_db.query(models.PriceCandle).count() == 3
+
+    reloaded = KlineStore()
+    assert reloaded.ensure_range(T0, T0 + 120, fetch=False)
+    assert reloaded.price_at(T0 + 130) == Decimal("3002.25")
+    assert not reloaded.ensure_range(T0, T0 + 600, fetch=False)
+
+
+def test_fetch_binance_pages_through_klines(monkeypatch, test_db):
+    requests = []
+
+    class FakeClient:
+        def get_json(self, endpoint, url, params=None):
+            requests.append(params["startTime"] // 1000)
+            start = params["startTime"] // 1000
+            end = params["endTime"] // 1000
+            return [kline(t, "3000") for t in range(start, end + 1, 60)][:2]
+
+    monkeypatch.setattr(klines, "get_upstream_client", lambda: FakeClient())
+    store = KlineStore()
+    assert store.ensure_range(T0, T0 + 240)
+    assert requests == [T0, T0 + 120, T0 + 240]
+    assert test_db.query(models.PriceCandle).count() == 5
+
+
+def test_downloaded_ranges_with_gaps_are_not_fetched_again(monkeypatch, test_db):
+    requests = []
+
+    class FakeClient:
+        def get_json(self, endpoint, url, params=None):
+            start, end = params["startTime"] // 1000, params["endTime"] // 1000
+            requests.append((start, end))
+            # No trades (and no candle) in the third minute.
+            return [kline(t, "3000") for t in range(start, end + 1, 60) if t != T0 + 120]
+
+    monkeypatch.setattr(klines, "get_upstream_client", lambda: FakeClient())
+    assert KlineStore().ensure_range(T0, T0 + 240)
+    assert requests == [(T0, T0 + 240)]
+    assert test_db.query(models.PriceCandle).count() == 4
+
+    # Another worker (or a later job) loads the recorded range instead of downloading it again,
+    # and only downloads the part of a larger range that is new.
+    store = KlineStore()
+    assert store.ensure_range(T0 + 60, T0 + 240)
+    assert store.ensure_range(T0, T0 + 420)
+    assert requests == [(T0, T0 + 240), (T0 + 300, T0 + 420)]
+    assert store.unfetched(T0, T0 + 420) == []
+
+def test_rows_are_priced_at_transaction_time():
+    store = KlineStore()
+    store.merge([(T0, 2000 * 10 ** 8)])
+    priced = make_etherscan_row(f"0x{1:064x}", gas_used=10 ** 6, gas_price=10 ** 12)
+    priced["timeStamp"] = str(T0 + 30)
+    unpriced = make_etherscan_row(f"0x{2:064x}", gas_used=10 ** 6, gas_price=10 ** 12)
+    unpriced["timeStamp"] = str(T0 + 3600)
+
+    rows = tasks.build_transaction_rows([priced, unpriced], Decimal("3000"), sharded=False, price_at=store.price_at)
+
+    assert [row["fee_usdt"] for row in rows] == [Decimal("2000"), Decimal("3000")]
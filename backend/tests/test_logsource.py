@@ -0,0 +1,166 @@
+import json
+import threading
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import decodequeue, models, tasks
+from app.config import settings
+from app.logsource import LogSource
+from app.rpc import RpcClient
+from tests.factories import POOL_ADDRESS, make_swap_log
+
+T0 = 1704067200  # 2024-01-01 00:00:00 UTC
+FIRST_BLOCK = 1000
+
+
+class ChainStub:
+    """
+    A local JSON-RPC node serving a small chain with Swap logs of the pool. eth_getLogs answers
+    with error -32005 (as Infura does) when a query would return more than max_logs logs.
+    """
+
+    def __init__(self, blocks=200, swaps_per_block=3, max_logs=50):
+        self.max_logs = max_logs
+        self.head = FIRST_BLOCK + blocks - 1
+        self.calls = []
+        self.logs, self.receipts, self.transactions = [], {}, {}
+        for block in range(FIRST_BLOCK, self.head + 1, 2):
+            for index in range(swaps_per_block):
+                tx_hash = "0x%064x" % (block * 100 + index)
+                swaps = 2 if index == 0 else 1
+                for log_index in range(swaps):
+                    log = make_swap_log(-1, 1, 2 ** 96 * (index + 1 + log_index), 1, 0)
+                    log.update(blockNumber=hex(block), transactionHash=tx_hash, logIndex=hex(index * 10 + log_index))
+                    self.logs.append(log)
+                self.receipts[tx_hash] = {
+                    "transactionHash": tx_hash, "blockNumber": hex(block), "from": "0x" + "aa" * 20,
+                    "to": "0x" + "bb" * 20, "gasUsed": hex(100000 + index), "effectiveGasPrice": hex(20 * 10 ** 9),
+                }
+                self.transactions[tx_hash] = {"hash": tx_hash, "gas": hex(300000), "gasPrice": hex(25 * 10 ** 9)}
+
+    def timestamp(self, block):
+        return T0 + 12 * (block - FIRST_BLOCK)
+
+    def handle(self, request):
+        method, params = request["method"], request["params"]
+        self.calls.append(method)
+        if method == "eth_blockNumber":
+            return {"result": hex(self.head)}
+        if method == "eth_getLogs":
+            query = params[0]
+            first, last = int(query["fromBlock"], 16), int(query["toBlock"], 16)
+            logs = [log for log in self.logs if first <= int(log["blockNumber"], 16) <= last
+                    and log["address"] == query["address"] and log["topics"][0] in query["topics"]]
+            if len(logs) > self.max_logs:
+                return {"error": {"code": -32005, "message": f"query returned more than {self.max_logs} results"}}
+            return {"result": logs}
+        if method == "eth_getTransactionReceipt":
+            return {"result": self.receipts.get(params[0])}
+        if method == "eth_getTransactionByHash":
+            return {"result": self.transactions.get(params[0])}
+        if method == "eth_getBlockByNumber":
+            block = int(params[0], 16)
+            return {"result": {"number": hex(block), "timestamp": hex(self.timestamp(block))}}
+        return {"error": {"code": -32601, "message": "method not found"}}
+
+
+@pytest.fixture
+def chain():
+    stub = ChainStub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if isinstance(payload, list):
+                answer = [dict(stub.handle(item), jsonrpc="2.0", id=item["id"]) for item in payload]
+            else:
+                answer = dict(stub.handle(payload), jsonrpc="2.0", id=payload["id"])
+            body = json.dumps(answer).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stub.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+def test_windows_shrink_at_the_result_limit_and_grow_again(chain):
+    source = LogSource(RpcClient(chain.url), POOL_ADDRESS, window=100, max_window=400, target_results=40)
+    windows = list(source.iter_windows(FIRST_BLOCK, chain.head))
+
+    assert windows[0][0] == FIRST_BLOCK and windows[-1][1] == chain.head
+    assert all(prev[1] + 1 == nxt[0] for prev, nxt in zip(windows, windows[1:]))
+    assert sum(len(logs) for _, _, logs in windows) == len(chain.logs)
+    assert all(len(logs) <= chain.max_logs for _, _, logs in windows)
+    metrics = source.metrics()
+    assert metrics["shrinks"] >= 1
+    assert metrics["windows"] == len(windows)
+
+
+def test_pages_carry_swap_prices_and_receipt_fees(chain):
+    source = LogSource(RpcClient(chain.url, batch_size=20), POOL_ADDRESS, window=30)
+    rows = [row for page in source.iter_pages(FIRST_BLOCK, offset=40) for row in page]
+
+    assert len(rows) == len(chain.receipts)
+    assert len({row["hash"] for row in rows}) == len(rows)
+    assert [int(row["blockNumber"]) for row in rows] == sorted(int(row["blockNumber"]) for row in rows)
+    first = dict(rows[0])
+    # The first swap of the transaction in the pool.
+    assert Decimal(first.pop("swapPrice")) == 1
+    assert first == {
+        "hash": "0x%064x" % (FIRST_BLOCK * 100),
+        "blockNumber": str(FIRST_BLOCK),
+        "timeStamp": str(T0),
+        "from": "0x" + "aa" * 20,
+        "to": "0x" + "bb" * 20,
+        "gas": "300000",
+        "gasPrice": str(20 * 10 ** 9),
+        "gasUsed": "100000",
+    }
+    assert Decimal(rows[1]["swapPrice"]) == 4
+    # Every receipt is fetched exactly once, although the first swap of a block has two logs.
+    assert chain.calls.count("eth_getTransactionReceipt") == len(rows)
+
+
+def test_log_source_ingests_complete_rows(monkeypatch, chain, test_db):
+    monkeypatch.setattr(settings, "INGEST_SOURCE", "logs")
+    monkeypatch.setattr(settings, "SWAP_DECODE_QUEUE", True)
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+    monkeypatch.setattr("app.logsource._sources", {
+        settings.POOL_ADDRESS: LogSource(RpcClient(chain.url), POOL_ADDRESS, window=50)})
+
+    for transactions in tasks.iter_block_pages(FIRST_BLOCK, FIRST_BLOCK + 9):
+        tasks.process_transactions(transactions, Decimal("3000"), test_db)
+
+    stored = test_db.query(models.Transaction).order_by(models.Transaction.block_number).all()
+    assert len(stored) == 15
+    assert stored[0].fee_eth == Decimal("0.002")
+    assert all(row.swap_price is not None for row in stored)
+    # Swap prices came with the logs, so nothing waits for a receipt decode.
+    assert decodequeue.backlog(test_db)["pending"] == 0
+
+
+def test_sharded_pages_fetch_only_the_own_shard(monkeypatch, chain):
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 3)
+    monkeypatch.setattr(settings, "WORKER_ID", 1)
+    source = LogSource(RpcClient(chain.url, batch_size=20), POOL_ADDRESS, window=30)
+    rows = [row for page in source.iter_pages(FIRST_BLOCK, sharded=True) for row in page]
+
+    owned = [tx_hash for tx_hash in chain.receipts if int(tx_hash, 16) % 3 == 1]
+    assert sorted(row["hash"] for row in rows) == sorted(owned)
+    # Receipts and transactions are only requested for the worker's own shard.
+    assert chain.calls.count("eth_getTransactionReceipt") == len(owned) < len(chain.receipts)
+    assert chain.calls.count("eth_getTransactionByHash") == len(owned)
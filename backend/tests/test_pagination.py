@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+
+from app import crud, database, models
+from app.main import app
+from app.migrations import MIGRATIONS, run_migrations
+
+client = TestClient(app)
+
+
+def store_transactions(db, count):
+    base = datetime(2024, 1, 1)
+    rows = [
+        # Pairs of transactions share a timestamp, so the id has to break ties.
+        dict(tx_hash=f"0x{i:064x}", block_number=100 + i, time_stamp=base + timedelta(seconds=i // 2),
+             from_address="0xa", to_address="0xb", gas=1, gas_price=1, gas_used=1,
+             fee_eth=Decimal("0.1"), fee_usdt=Decimal("1"))
+        for i in range(count)
+    ]
+    crud.bulk_create_transactions(db, rows)
+    db.commit()
+
+
+def test_cursor_pages_cover_all_rows_in_order(test_db):
+    store_transactions(test_db, 7)
+    expected = [
+        t.tx_hash for t in test_db.query(models.Transaction)
+        .order_by(models.Transaction.time_stamp.desc(), models.Transaction.id.desc())
+    ]
+
+    seen = []
+    params = {"page_size": 3}
+    while True:
+        response = client.get("/transactions/", params=params)
+        assert response.status_code == 200
+        seen.extend(t["tx_hash"] for t in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"page_size": 3, "cursor": cursor}
+
+    assert seen == expected
+
+
+def test_cursor_matches_offset_pages(test_db):
+    store_transactions(test_db, 6)
+    first = client.get("/transactions/", params={"page_size": 2})
+    by_cursor = client.get("/transactions/", params={"page_size": 2, "cursor": first.headers["X-Next-Cursor"]})
+    by_offset = client.get("/transactions/", params={"page_size": 2, "page": 2})
+    assert by_cursor.json() == by_offset.json()
+
+
+def test_invalid_cursor_is_rejected(test_db):
+    response = client.get("/transactions/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_migrations_create_indexes_once(test_db):
+    # clear_db recreates the tables from the models, which do not declare these indexes.
+    assert run_migrations(database.engine) == [version for version, _ in MIGRATIONS]
+    names = {index["name"] for index in inspect(database.engine).get_indexes("transactions")}
+    assert {"ix_transactions_time_stamp_id", "ix_transactions_block_number"} <= names
+    assert run_migrations(database.engine) == []
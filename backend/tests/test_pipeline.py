@@ -0,0 +1,116 @@
+import asyncio
+import random
+import time
+from decimal import Decimal
+
+import pytest
+
+from app import coordination, crud, models, pipeline, tasks
+from app.config import settings
+from tests.test_ingest import make_etherscan_row
+
+
+@pytest.fixture(autouse=True)
+def single_shard(monkeypatch):
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+    monkeypatch.setattr(settings, "INGEST_COORDINATION", "shard")
+    # These tests cover the inline decode stage; queued decoding is tested in test_decodequeue.
+    monkeypatch.setattr(settings, "SWAP_DECODE_QUEUE", False)
+
+
+def slow_decode(tx_hashes, pools=None):
+    # Finish pages out of order to exercise the in-order completion of callbacks.
+    time.sleep(random.uniform(0, 0.02))
+    return {tx_hash: Decimal("1.5") for tx_hash in tx_hashes}
+
+
+def make_pages(count, per_page=3):
+    return [
+        [make_etherscan_row(f"0x{page * 100 + i:064x}", block_number=1000 + page) for i in range(per_page)]
+        for page in range(count)
+    ]
+
+
+def test_pipeline_writes_pages_and_completes_in_order(monkeypatch, test_db):
+    monkeypatch.setattr(tasks, "decode_swap_prices", slow_decode)
+    completed = []
+    items = [
+        pipeline.PipelineItem(page, Decimal("3000"), lambda index=index: completed.append(index))
+        for index, page in enumerate(make_pages(6))
+    ]
+    ingest = pipeline.IngestPipeline(decode_workers=4, queue_size=2, write_batch_rows=5)
+
+    metrics = asyncio.run(ingest.run(iter(items)))
+
+    assert completed == list(range(6))
+    assert metrics["pages"] == 6
+    assert metrics["inserted"] == 18
+    assert test_db.query(models.Transaction).count() == 18
+    # Swap prices are decoded before the insert, so rows are complete without an UPDATE.
+    assert test_db.query(models.Transaction).filter(models.Transaction.swap_price.is_(None)).count() == 0
+
+
+def test_pipeline_stops_callbacks_at_first_failed_page(monkeypatch, test_db):
+    def failing_decode(tx_hashes, pools=None):
+        if f"0x{200:064x}" in tx_hashes:
+            raise RuntimeError("node unavailable")
+        return {tx_hash: Decimal("0") for tx_hash in tx_hashes}
+
+    monkeypatch.setattr(tasks, "decode_swap_prices", failing_decode)
+    completed = []
+    items = [
+        pipeline.PipelineItem(page, Decimal("3000"), lambda index=index: completed.append(index))
+        for index, page in enumerate(make_pages(4))
+    ]
+    metrics = asyncio.run(pipeline.IngestPipeline(decode_workers=1).run(iter(items)))
+
+    assert completed == [0, 1]
+    assert metrics["failed_pages"] == 1
+
+
+def test_pipeline_cycle_advances_live_checkpoint(monkeypatch, test_db):
+    pages = make_pages(3)
+    monkeypatch.setattr(tasks, "decode_swap_prices", slow_decode)
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "latest_block_number", lambda: 1010)
+    monkeypatch.setattr(tasks, "iter_block_pages", lambda start_block, end_block=None, offset=100, pool=None, sharded=False: iter(pages))
+
+    asyncio.run(pipeline.IngestPipeline().run_cycle())
+
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(settings.POOL_ADDRESS, settings.WORKER_ID)) == 1002
+    assert test_db.query(models.Transaction).count() == 9
+
+
+def test_leader_pages_flow_through_the_pipeline(monkeypatch, test_db):
+    """
+    In leader mode the lease holder's pages go through the pipeline stages: its own shard is
+    written directly and the other shards' rows are queued as the pages are fetched.
+    """
+    pages = make_pages(2)
+    hashes = [row["hash"] for page in pages for row in page]
+    monkeypatch.setattr(settings, "INGEST_COORDINATION", "leader")
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 2)
+    monkeypatch.setattr(tasks, "decode_swap_prices", slow_decode)
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "latest_block_number", lambda: 1010)
+    monkeypatch.setattr(tasks, "iter_block_pages", lambda start_block, end_block=None, offset=100, pool=None, sharded=False: iter(pages))
+    fetched = []
+    monkeypatch.setattr(pipeline, "_enqueue_other_shards",
+                        lambda transactions, eth_price, enqueue=pipeline._enqueue_other_shards: (
+                            fetched.append(len(transactions)), enqueue(transactions, eth_price)))
+
+    for worker_id in range(2):
+        monkeypatch.setattr(settings, "WORKER_ID", worker_id)
+        monkeypatch.setattr(coordination, "worker_identity", lambda worker_id=worker_id: f"worker-{worker_id}")
+        asyncio.run(pipeline.IngestPipeline().run_cycle())
+        if worker_id == 0:
+            # The leader queued only the other shard and wrote its own.
+            owned = {h for h in hashes if coordination.hash_shard(h, 2) == 0}
+            assert set(coordination.queue_depth(test_db)) == {1}
+            assert crud.get_existing_hashes(test_db, hashes) == owned
+
+    assert fetched == [3, 3]
+    assert coordination.queue_depth(test_db) == {}
+    assert crud.get_existing_hashes(test_db, hashes) == set(hashes)
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(settings.POOL_ADDRESS)) == 1001
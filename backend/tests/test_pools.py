@@ -0,0 +1,168 @@
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+
+from app import crud, database, migrations, models, tasks
+from app.config import settings
+from app.main import app
+from app.scheduler import PollScheduler
+from tests.test_decodequeue import FakeClock
+from tests.test_ingest import make_etherscan_row
+
+client = TestClient(app)
+
+POOL_A = "0x" + "a1" * 20
+POOL_B = "0x" + "b2" * 20
+
+
+def test_scheduler_polls_busy_pools_more_often():
+    clock = FakeClock()
+    scheduler = PollScheduler([POOL_A, POOL_B], min_interval=10, max_interval=80, busy_rows=100, clock=clock)
+    assert scheduler.due() == [POOL_A, POOL_B]
+
+    # POOL_A is busy, POOL_B quiet: their intervals move apart, within the bounds.
+    for _ in range(4):
+        scheduler.record(POOL_A, 250)
+        scheduler.record(POOL_B, 0)
+    metrics = scheduler.metrics()
+    assert metrics[POOL_A]["interval_seconds"] == 10
+    assert metrics[POOL_B]["interval_seconds"] == 80
+    assert scheduler.wait_time() == 10
+
+    clock.now += 10
+    assert scheduler.due() == [POOL_A]
+    # A failed poll keeps the interval.
+    scheduler.record(POOL_A, None)
+    assert scheduler.metrics()[POOL_A]["failures"] == 1
+    assert scheduler.metrics()[POOL_A]["interval_seconds"] == 10
+
+    clock.now += 70
+    assert scheduler.due() == [POOL_A, POOL_B]
+
+
+def test_scheduler_run_records_every_pool():
+    scheduler = PollScheduler([POOL_A, POOL_B], busy_rows=2, clock=FakeClock())
+
+    def poll(pool):
+        if pool == POOL_B:
+            raise RuntimeError("upstream down")
+        return 5
+
+    assert scheduler.run(poll, [POOL_A, POOL_B]) == {POOL_A: 5, POOL_B: None}
+    metrics = scheduler.metrics()
+    assert (metrics[POOL_A]["polls"], metrics[POOL_A]["last_rows"]) == (1, 5)
+    assert (metrics[POOL_B]["polls"], metrics[POOL_B]["failures"]) == (1, 1)
+
+
+def test_live_polling_polls_a_busy_pool_before_poll_interval(monkeypatch):
+    clock = FakeClock()
+    scheduler = PollScheduler([POOL_A, POOL_B], min_interval=12, max_interval=600, busy_rows=100, clock=clock)
+    polls = []
+
+    class StopPolling(Exception):
+        pass
+
+    def poll_live_transactions(db, pools):
+        polls.append((clock.now, list(pools)))
+        for pool in pools:
+            scheduler.record(pool, 250 if pool == POOL_A else 0)
+
+    def sleep(seconds):
+        if len(polls) == 3:
+            raise StopPolling()
+        clock.now += seconds
+
+    monkeypatch.setattr(settings, "POLL_INTERVAL", 60)
+    monkeypatch.setattr(tasks, "get_poll_scheduler", lambda: scheduler)
+    monkeypatch.setattr(tasks, "SessionLocal", lambda: type("Session", (), {"close": lambda self: None})())
+    monkeypatch.setattr(tasks, "poll_live_transactions", poll_live_transactions)
+    monkeypatch.setattr(tasks.time, "sleep", sleep)
+
+    try:
+        tasks.live_transaction_polling()
+    except StopPolling:
+        pass
+
+    # The busy pool comes round again after its own interval, well before POLL_INTERVAL.
+    assert [(at - polls[0][0], pools) for at, pools in polls] == [
+        (0, [POOL_A, POOL_B]),
+        (12, [POOL_A]),
+        (24, [POOL_A, POOL_B]),
+    ]
+
+
+def test_scheduler_keeps_poll_interval_for_a_single_pool():
+    clock = FakeClock()
+    scheduler = PollScheduler([POOL_A], min_interval=12, clock=clock)
+    assert scheduler.next_cycle_in(scheduler.due(), 60, 5) == 55
+    # Pools left unpolled (another instance leads) are not due again straight away.
+    scheduler = PollScheduler([POOL_A, POOL_B], min_interval=12, clock=clock)
+    assert scheduler.next_cycle_in(scheduler.due(), 60, 0) > 0
+
+
+def test_pools_are_polled_with_their_own_cursors(monkeypatch, test_db):
+    monkeypatch.setattr(settings, "POOL_ADDRESSES", [POOL_A, POOL_B])
+    # One pool at a time, so which pool stores the shared transaction is deterministic.
+    monkeypatch.setattr(settings, "POOL_POLL_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "INGEST_COORDINATION", "shard")
+    monkeypatch.setattr(settings, "TOTAL_WORKERS", 1)
+    monkeypatch.setattr(settings, "WORKER_ID", 0)
+    monkeypatch.setattr(settings, "CHECKPOINT_OVERLAP_BLOCKS", 0)
+    monkeypatch.setattr(tasks, "fetch_eth_price", lambda: Decimal("3000"))
+    monkeypatch.setattr(tasks, "latest_block_number", lambda: 1000)
+    crud.advance_checkpoint(test_db, tasks.live_checkpoint(POOL_A, 0), 900)
+    crud.advance_checkpoint(test_db, tasks.live_checkpoint(POOL_B, 0), 950)
+    chains = {
+        POOL_A: [make_etherscan_row(f"0x{i:064x}", block_number=901 + i) for i in range(3)],
+        # The last transaction of POOL_B was routed through POOL_A as well.
+        POOL_B: [make_etherscan_row(f"0x{i + 10:064x}", block_number=951 + i) for i in range(2)]
+        + [make_etherscan_row(f"0x{2:064x}", block_number=903)],
+    }
+    requested = []
+
+    def fake_iter_block_pages(start_block, end_block=None, offset=100, pool=None, sharded=False):
+        requested.append((pool, start_block))
+        page = [dict(row, pool=pool) for row in chains[pool] if int(row["blockNumber"]) >= start_block]
+        if page:
+            yield page
+
+    monkeypatch.setattr(tasks, "iter_block_pages", fake_iter_block_pages)
+    tasks.poll_live_transactions(test_db)
+
+    assert sorted(requested) == [(POOL_A, 901), (POOL_B, 951)]
+    test_db.expire_all()
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(POOL_A, 0)) == 903
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(POOL_B, 0)) == 952
+    # Every transaction is stored once, under the pool it was first seen in.
+    assert test_db.query(models.Transaction).count() == 5
+    assert test_db.query(models.Transaction).filter(models.Transaction.pool_address == POOL_B).count() == 2
+
+    response = client.get("/transactions/", params={"pool": POOL_B.upper().replace("0X", "0x")})
+    assert response.status_code == 200
+    assert {txn["tx_hash"] for txn in response.json()} == {f"0x{10:064x}", f"0x{11:064x}"}
+    assert all(txn["pool_address"] == POOL_B for txn in response.json())
+
+
+def test_historical_rejects_unknown_pools(monkeypatch, test_db):
+    monkeypatch.setattr(settings, "POOL_ADDRESSES", [POOL_A])
+    monkeypatch.setattr("app.backfill.start_job", lambda job_id: None)
+    params = {"start_time": "2024-01-01T00:00:00", "end_time": "2024-01-01T01:00:00"}
+    assert client.post("/transactions/historical", params=dict(params, pool=POOL_B)).status_code == 400
+
+    response = client.post("/transactions/historical", params=dict(params, pool=POOL_A))
+    assert response.status_code == 200
+    status = client.get(f"/transactions/historical/{response.json()['job_id']}").json()
+    assert status["pool_address"] == POOL_A
+
+
+def test_pool_migration_keeps_the_live_cursor(test_db):
+    crud.advance_checkpoint(test_db, tasks.LIVE_INGEST_CHECKPOINT, 1234)
+    with database.engine.begin() as connection:
+        migrations.add_pools(connection)
+        # Idempotent: the column and the index exist now.
+        migrations.add_pools(connection)
+    names = {index["name"] for index in inspect(database.engine).get_indexes("transactions")}
+    assert "ix_transactions_pool_time_stamp_id" in names
+    test_db.expire_all()
+    assert crud.get_checkpoint(test_db, tasks.live_checkpoint(settings.POOL_ADDRESS)) == 1234
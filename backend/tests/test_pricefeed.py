@@ -0,0 +1,66 @@
+import threading
+import time
+from decimal import Decimal
+
+from app import models
+from app.pricefeed import PriceFeed, PriceQuote
+
+
+class CountingFetch:
+    def __init__(self, price="3000"):
+        self.price = Decimal(price)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(0.01)
+        return self.price
+
+
+def test_readers_use_cached_quote(test_db):
+    fetch = CountingFetch()
+    feed = PriceFeed(fetch=fetch, refresh_interval=10, max_age=60)
+    assert feed.quote() is None
+
+    assert feed.price() == Decimal("3000")
+    assert feed.price() == Decimal("3000")
+    assert fetch.calls == 1
+    assert feed.quote().age() < 1
+
+
+def test_concurrent_callers_trigger_one_fetch(test_db):
+    fetch = CountingFetch()
+    feed = PriceFeed(fetch=fetch, shared=False)
+    threads = [threading.Thread(target=feed.price) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fetch.calls == 1
+
+
+def test_stale_quote_is_refreshed_and_kept_on_failure(test_db):
+    fetch = CountingFetch("3100")
+    feed = PriceFeed(fetch=fetch, refresh_interval=10, max_age=60, shared=False)
+    feed.set_quote(PriceQuote(Decimal("3000"), time.time() - 120))
+    assert feed.price() == Decimal("3100")
+
+    def failing_fetch():
+        raise ConnectionError("binance unavailable")
+
+    feed = PriceFeed(fetch=failing_fetch, shared=False)
+    feed.set_quote(PriceQuote(Decimal("3000"), time.time() - 120))
+    assert feed.price() == Decimal("3000")
+    assert feed.metrics()["failures"] == 1
+
+
+def test_workers_share_quotes_through_the_database(test_db):
+    first = CountingFetch("3000")
+    PriceFeed(fetch=first).refresh()
+    assert test_db.query(models.PriceQuote).count() == 1
+
+    second = CountingFetch("9999")
+    other_worker = PriceFeed(fetch=second)
+    assert other_worker.price() == Decimal("3000")
+    assert second.calls == 0
+    assert other_worker.metrics()["shared_hits"] == 1
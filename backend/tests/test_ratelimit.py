@@ -0,0 +1,79 @@
+import pytest
+
+from app import models, ratelimit, upstream
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "time", clock.time)
+    monkeypatch.setattr(ratelimit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_refill_is_capped():
+    assert ratelimit.refill(0, 0, 1, rate=5, capacity=10) == 5
+    assert ratelimit.refill(8, 0, 10, rate=5, capacity=10) == 10
+
+
+def test_bucket_allows_burst_then_waits(clock, test_db):
+    bucket = ratelimit.DatabaseTokenBucket("etherscan", rate=5, capacity=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    # The third call has to wait for one token at 5 tokens per second.
+    assert bucket.acquire() == pytest.approx(0.2)
+    metrics = bucket.metrics()
+    assert metrics["acquired"] == 3
+    assert metrics["waits"] == 1
+    assert metrics["wait_seconds"] == pytest.approx(0.2)
+
+
+def test_bucket_state_is_shared_through_the_database(clock, test_db):
+    """
+    Two limiter instances (e.g. two workers) draw from the same bucket row.
+    """
+    first = ratelimit.DatabaseTokenBucket("etherscan", rate=1, capacity=1)
+    second = ratelimit.DatabaseTokenBucket("etherscan", rate=1, capacity=1)
+    assert first.try_acquire() == 0
+    assert second.try_acquire() == pytest.approx(1)
+    test_db.expire_all()
+    bucket = test_db.query(models.RateLimitBucket).filter_by(name="etherscan").one()
+    assert bucket.tokens == pytest.approx(0)
+
+
+def test_upstream_client_acquires_before_each_attempt(monkeypatch):
+    class CountingLimiter:
+        calls = 0
+
+        def acquire(self):
+            self.calls += 1
+            return 0.0
+
+        def metrics(self):
+            return {"acquired": self.calls}
+
+    monkeypatch.setattr(upstream.time, "sleep", lambda seconds: None)
+    limiter = CountingLimiter()
+    client = upstream.UpstreamClient(max_retries=2, rate_limiters={"etherscan": limiter})
+    attempts = iter([upstream.RetryableUpstreamError("busy"), ["ok"]])
+
+    def flaky():
+        result = next(attempts)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert client.call("etherscan", flaky) == ["ok"]
+    assert limiter.calls == 2
+    assert client.metrics()["etherscan.rate_limit_acquired"] == 2
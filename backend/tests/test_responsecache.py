@@ -0,0 +1,100 @@
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app import crud, database
+from app.main import app
+from app.responsecache import ResponseCache, etag_matches, get_response_cache
+from tests.test_batch import QueryCounter
+from tests.test_pagination import store_transactions
+
+client = TestClient(app)
+
+
+def test_list_is_served_from_the_cache_until_the_data_changes(test_db):
+    store_transactions(test_db, 3)
+    first = client.get("/transactions/", params={"page_size": 2})
+    # A default parameter spelled out normalizes to the same key.
+    with QueryCounter() as counter:
+        second = client.get("/transactions/", params={"page_size": 2, "page": 1})
+    assert counter.statements == []
+    assert second.content == first.content
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+    # A committed write (here a swap price update) bumps the data version and drops the entry.
+    crud.bulk_update_swap_prices(test_db, {f"0x{2:064x}": Decimal("3000")})
+    test_db.commit()
+    with QueryCounter() as counter:
+        third = client.get("/transactions/", params={"page_size": 2})
+    assert counter.statements == ["SELECT"]
+    assert third.json()[0]["swap_price"] == 3000
+    assert third.headers["ETag"] != first.headers["ETag"]
+
+    metrics = client.get("/metrics").json()["response_cache"]
+    assert metrics["endpoints"]["transactions"]["hits"] == 1
+    assert metrics["endpoints"]["transactions"]["misses"] == 2
+    assert metrics["stale"] == 1
+
+
+def test_if_none_match_gets_304(test_db):
+    store_transactions(test_db, 1)
+    response = client.get(f"/transactions/0x{0:064x}")
+    etag = response.headers["ETag"]
+    not_modified = client.get(f"/transactions/0x{0:064x}", headers={"If-None-Match": f'"other", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    # Missing transactions are not cached.
+    assert client.get("/transactions/0xmissing").status_code == 404
+
+    store_transactions(test_db, 2)
+    summary = client.get("/summary")
+    assert summary.headers["ETag"].startswith("W/")
+    assert client.get("/summary", headers={"If-None-Match": summary.headers["ETag"]}).status_code == 304
+    # New transactions change the totals and with them the ETag.
+    crud.bulk_create_transactions(test_db, [dict(
+        tx_hash="0xnew", block_number=500, time_stamp=datetime(2024, 1, 2), from_address="0xa", to_address="0xb",
+        gas=1, gas_price=1, gas_used=1, fee_eth=Decimal("1"), fee_usdt=Decimal("2"))])
+    test_db.commit()
+    changed = client.get("/summary", headers={"If-None-Match": summary.headers["ETag"]})
+    assert changed.status_code == 200
+    assert Decimal(str(changed.json()["total_fee_eth"])) == Decimal("1.2")
+
+    metrics = get_response_cache().metrics()
+    assert metrics["not_modified"] == 2
+    assert metrics["endpoints"]["summary"]["not_modified"] == 1
+
+
+def test_cache_is_bounded_and_rereads_the_version_after_its_ttl():
+    now = [0.0]
+    cache = ResponseCache(maxsize=2, version_ttl=1.0, clock=lambda: now[0])
+    for name in ("a", "b", "c"):
+        cache.put(("page", name), 1, name)
+    assert cache.get(("page", "a"), 1) is None
+    assert cache.get(("page", "c"), 1) == "c"
+    assert cache.get(("page", "c"), 2) is None
+    assert cache.metrics()["evictions"] == 1
+
+    cache.set_version(5)
+    now[0] = 0.5
+    assert cache.known_version() == 5
+    now[0] = 1.5
+    assert cache.known_version() is None
+
+    assert etag_matches('W/"x"', '"x"') and etag_matches("*", '"x"')
+    assert not etag_matches('"y"', '"x"') and not etag_matches(None, '"x"')
+
+
+def test_other_workers_writes_invalidate_through_the_database(test_db):
+    store_transactions(test_db, 1)
+    before = client.get(f"/transactions/0x{0:064x}").json()
+    # Another worker stores the swap price with its own session.
+    db = database.SessionLocal()
+    try:
+        crud.update_swap_price(db, f"0x{0:064x}", Decimal("2500"))
+    finally:
+        db.close()
+    after = client.get(f"/transactions/0x{0:064x}").json()
+    assert before["swap_price"] is None and after["swap_price"] == 2500
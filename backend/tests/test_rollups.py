@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app import crud, models, rollups, schemas
+from app.main import app
+
+client = TestClient(app)
+
+BASE = datetime(2024, 1, 1, 10, 0)
+
+
+def make_row(i, time_stamp, fee_eth="0.1", fee_usdt="300"):
+    return dict(tx_hash=f"0x{i:064x}", block_number=100 + i, time_stamp=time_stamp, from_address="0xa",
+                to_address="0xb", gas=1, gas_price=1, gas_used=1, fee_eth=Decimal(fee_eth), fee_usdt=Decimal(fee_usdt))
+
+
+def rollup_rows(db, bucket):
+    return [
+        (row.bucket_start, row.tx_count, round(row.fee_eth, 6), round(row.fee_usdt, 6))
+        for row in rollups.get_series(db, bucket)
+    ]
+
+
+def test_bulk_insert_updates_rollups(test_db):
+    rows = [make_row(i, BASE + timedelta(minutes=25 * i)) for i in range(4)]
+    crud.bulk_create_transactions(test_db, rows)
+    test_db.commit()
+
+    assert rollup_rows(test_db, "hour") == [
+        (datetime(2024, 1, 1, 10), 3, Decimal("0.3"), Decimal("900")),
+        (datetime(2024, 1, 1, 11), 1, Decimal("0.1"), Decimal("300")),
+    ]
+    assert rollup_rows(test_db, "day") == [(datetime(2024, 1, 1), 4, Decimal("0.4"), Decimal("1200"))]
+    assert len(rollup_rows(test_db, "minute")) == 4
+    total_eth, total_usdt = crud.get_summary(test_db)
+    assert round(total_eth, 6) == Decimal("0.4") and round(total_usdt, 6) == Decimal("1200")
+
+
+def test_create_transaction_updates_rollups(test_db):
+    crud.create_transaction(test_db, schemas.TransactionCreate(**make_row(1, BASE)))
+    assert rollup_rows(test_db, "day") == [(datetime(2024, 1, 1), 1, Decimal("0.1"), Decimal("300"))]
+
+
+def test_partially_ignored_chunk_adds_only_its_own_rows(monkeypatch, test_db):
+    # Another writer stored one of the rows (and added it to the rollups) between the existence
+    # check and the insert.
+    other = make_row(0, BASE, fee_eth="1")
+    test_db.execute(models.Transaction.__table__.insert().values(other))
+    rollups.add_transactions(test_db, [other])
+    # Increments of a writer whose rows this transaction cannot see must be kept as well.
+    rollups.add_transactions(test_db, [make_row(9, BASE + timedelta(hours=1), fee_eth="0.05")])
+    test_db.commit()
+    monkeypatch.setattr(crud, "get_existing_hashes", lambda db, hashes: set())
+
+    result = crud.bulk_create_transactions(test_db, [make_row(i, BASE) for i in range(3)])
+    test_db.commit()
+
+    assert (result.inserted, result.skipped) == (2, 1)
+    assert test_db.query(models.Transaction).count() == 3
+    assert rollup_rows(test_db, "day") == [(datetime(2024, 1, 1), 4, Decimal("1.25"), Decimal("1200"))]
+
+
+def test_rebuild_restores_rollups(test_db):
+    crud.bulk_create_transactions(test_db, [make_row(i, BASE + timedelta(days=i)) for i in range(3)])
+    test_db.commit()
+    expected = rollup_rows(test_db, "day")
+    test_db.query(models.FeeRollup).delete()
+    test_db.add(models.FeeRollup(bucket="day", bucket_start=datetime(2023, 1, 1), tx_count=5, fee_eth=1, fee_usdt=1))
+    test_db.commit()
+
+    rollups.main(["rebuild"])
+
+    test_db.expire_all()
+    assert rollup_rows(test_db, "day") == expected
+
+
+def test_summary_series_endpoint(test_db):
+    crud.bulk_create_transactions(test_db, [make_row(i, BASE + timedelta(minutes=25 * i)) for i in range(4)])
+    test_db.commit()
+
+    response = client.get("/summary/series", params={"bucket": "hour", "start": "2024-01-01T10:30:00"})
+    assert response.status_code == 200
+    data = response.json()
+    assert [bucket["tx_count"] for bucket in data] == [3, 1]
+    assert Decimal(str(data[0]["avg_fee_usdt"])).quantize(Decimal("1")) == Decimal("300")
+
+    assert client.get("/summary/series", params={"bucket": "week"}).status_code == 422
@@ -0,0 +1,68 @@
+import threading
+from decimal import Decimal
+
+from app import rpc, tasks
+from tests.factories import FakeResponse, make_swap_receipt
+
+
+class FakeSession:
+    """
+    Stand-in for requests.Session that answers JSON-RPC batches from a dict of receipts.
+    """
+
+    def __init__(self, receipts):
+        self.receipts = receipts
+        self.payloads = []
+
+    def post(self, url, json=None, timeout=None):
+        self.payloads.append(json)
+        # Answer in reverse order to make sure results are matched by id, not position.
+        return FakeResponse([
+            {"jsonrpc": "2.0", "id": item["id"], "result": self.receipts.get(item["params"][0])}
+            for item in reversed(json)
+        ])
+
+
+def test_batch_call_splits_into_batches():
+    """
+    batch_call sends at most batch_size calls per HTTP request and keeps the input order.
+    """
+    client = rpc.RpcClient("http://node", batch_size=2)
+    client.session = FakeSession({"0xa": {"n": 1}, "0xb": {"n": 2}, "0xc": {"n": 3}})
+    results = client.batch_call("eth_getTransactionReceipt", [["0xa"], ["0xb"], ["0xc"], ["0xmissing"]])
+    assert results == [{"n": 1}, {"n": 2}, {"n": 3}, None]
+    assert [len(payload) for payload in client.session.payloads] == [2, 2]
+
+
+def test_decode_swap_prices_uses_batched_receipts(monkeypatch):
+    """
+    decode_swap_prices decodes every hash from one batch of receipts and maps failures to 0.
+    """
+    client = rpc.RpcClient("http://node", batch_size=10)
+    client.session = FakeSession({"0xswap": make_swap_receipt(2 ** 96), "0xnoswap": {"logs": []}})
+    monkeypatch.setattr(tasks, "get_rpc_client", lambda: client)
+
+    prices = tasks.decode_swap_prices(["0xswap", "0xnoswap", "0xmissing"])
+    assert prices == {"0xswap": Decimal(1), "0xnoswap": Decimal(0), "0xmissing": Decimal(0)}
+    assert len(client.session.payloads) == 1
+
+
+def test_batch_call_sends_batches_concurrently():
+    """
+    With concurrency > 1 the batches of one batch_call are in flight together; results keep the input order.
+    """
+    client = rpc.RpcClient("http://node", batch_size=2, concurrency=3)
+    receipts = {f"0x{i}": {"n": i} for i in range(6)}
+    session = FakeSession(receipts)
+    in_flight = []
+    barrier = threading.Barrier(3, timeout=5)
+
+    def post(url, json=None, timeout=None):
+        in_flight.append(len(json))
+        barrier.wait()
+        return FakeSession.post(session, url, json=json, timeout=timeout)
+
+    client.session = type("ConcurrentSession", (), {"post": staticmethod(post)})()
+    results = client.batch_call("eth_getTransactionReceipt", [[f"0x{i}"] for i in range(6)])
+    assert results == [{"n": i} for i in range(6)]
+    assert in_flight == [2, 2, 2]
@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+import pytest
+
+from app import swap_decoder
+from tests.factories import POOL_ADDRESS, SWAP_EVENT_ABI, make_swap_log, random_swap_logs
+
+
+def test_decode_swap_log_extracts_all_fields():
+    log = make_swap_log(-1000, 2000, 2 ** 96, 12345, -887272)
+    event = swap_decoder.decode_swap_log(log)
+    assert event == swap_decoder.SwapEvent(-1000, 2000, 2 ** 96, 12345, -887272)
+    assert swap_decoder.swap_price(event.sqrt_price_x96) == Decimal(1)
+
+
+def test_decode_swap_logs_matches_single_decoding():
+    logs = random_swap_logs(50)
+    assert swap_decoder.decode_swap_logs(logs) == [swap_decoder.decode_swap_log(log) for log in logs]
+    assert swap_decoder.decode_swap_logs([]) == []
+
+
+def test_decode_swap_data_rejects_wrong_size():
+    with pytest.raises(ValueError):
+        swap_decoder.decode_swap_data("0x" + "00" * 64)
+
+
+def test_is_swap_log_checks_topic_and_pool():
+    log = make_swap_log(1, 1, 1, 1, 1)
+    assert swap_decoder.is_swap_log(log, POOL_ADDRESS.upper().replace("0X", "0x"))
+    assert not swap_decoder.is_swap_log(dict(log, address="0x" + "00" * 20), POOL_ADDRESS)
+    assert not swap_decoder.is_swap_log(dict(log, topics=["0x" + "00" * 32]), POOL_ADDRESS)
+
+
+def test_parity_with_web3_decoder():
+    """
+    The fast decoder returns exactly what web3's contract event processing returns.
+    """
+    web3 = pytest.importorskip("web3")
+    from web3._utils.method_formatters import log_entry_formatter
+
+    w3 = web3.Web3()
+    assert w3.keccak(text="Swap(address,address,int256,int256,uint160,uint128,int24)").hex() == \
+        swap_decoder.SWAP_EVENT_TOPIC
+    contract = w3.eth.contract(address=web3.Web3.to_checksum_address(POOL_ADDRESS), abi=[SWAP_EVENT_ABI])
+    logs = random_swap_logs(200) + [make_swap_log(0, 0, 0, 0, 0), make_swap_log(-1, -1, 1, 1, -1)]
+    for log, event in zip(logs, swap_decoder.decode_swap_logs(logs)):
+        args = contract.events.Swap().process_log(log_entry_formatter(log))["args"]
+        assert event == swap_decoder.SwapEvent(
+            args["amount0"], args["amount1"], args["sqrtPriceX96"], args["liquidity"], args["tick"]
+        )
@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud, schemas
+from app.main import app
+from app.swapcache import SwapPriceCache
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_prices_and_failures_expire_after_their_ttl():
+    calls = []
+    prices = {"0xgood": Decimal("3000.5"), "0xbad": Decimal("0")}
+
+    def decode(tx_hash):
+        calls.append(tx_hash)
+        return prices[tx_hash]
+
+    clock = FakeClock()
+    cache = SwapPriceCache(decode, ttl=100, negative_ttl=10, clock=clock)
+    for _ in range(3):
+        assert cache.get("0xgood") == Decimal("3000.5")
+        assert cache.get("0xbad") == 0
+    assert calls == ["0xgood", "0xbad"]
+
+    clock.now += 11
+    cache.get("0xgood")
+    cache.get("0xbad")
+    assert calls == ["0xgood", "0xbad", "0xbad"]
+
+    metrics = cache.metrics()
+    assert metrics["hits"] == 3
+    assert metrics["negative_hits"] == 2
+    assert metrics["misses"] == 3
+    assert metrics["size"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SwapPriceCache(lambda tx_hash: Decimal("1"), maxsize=2)
+    cache.get("0xa")
+    cache.get("0xb")
+    cache.get("0xa")
+    cache.get("0xc")
+    assert len(cache) == 2
+    assert cache.metrics()["evictions"] == 1
+    cache.get("0xa")
+    assert cache.metrics()["hits"] == 2
+
+
+def test_concurrent_lookups_share_one_decode():
+    release = threading.Event()
+    calls = []
+
+    def decode(tx_hash):
+        calls.append(tx_hash)
+        release.wait(5)
+        return Decimal("42")
+
+    cache = SwapPriceCache(decode)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get, "0xhash") for _ in range(8)]
+        while cache.metrics()["shared"] < 7:
+            time.sleep(0.01)
+        release.set()
+        assert [future.result() for future in futures] == [Decimal("42")] * 8
+    assert calls == ["0xhash"]
+
+
+def test_decode_errors_reach_every_caller_and_are_not_cached():
+    outcomes = [RuntimeError("infura down"), Decimal("7")]
+
+    def decode(tx_hash):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    cache = SwapPriceCache(decode)
+    with pytest.raises(RuntimeError):
+        cache.get("0xhash")
+    assert cache.get("0xhash") == Decimal("7")
+    assert cache.metrics()["decode_errors"] == 1
+
+
+def test_swap_price_endpoint_remembers_failed_decodes(monkeypatch, test_db):
+    crud.create_transaction(test_db, schemas.TransactionCreate(
+        tx_hash="0xundecodable", block_number=1, time_stamp=datetime(2024, 1, 1),
+        from_address="0xfrom", to_address="0xto", gas=21000, gas_price=1, gas_used=21000,
+        fee_eth=Decimal("0.000021"), fee_usdt=Decimal("0.063"),
+    ))
+    calls = []
+
+    def dummy_decode_swap_prices(tx_hashes):
+        calls.extend(tx_hashes)
+        return {tx_hash: Decimal("0") for tx_hash in tx_hashes}
+    monkeypatch.setattr("app.tasks.decode_swap_prices", dummy_decode_swap_prices)
+
+    for _ in range(3):
+        assert client.get("/transactions/swapprice/0xundecodable").status_code == 400
+    assert calls == ["0xundecodable"]
+    assert client.get("/metrics").json()["swap_price_cache"]["negative_hits"] == 2
@@ -1,89 +1,20 @@
-import os
-import sys
 import pytest
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
-# Add the project root to sys.path so that the "app" package can be imported.
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-###############################################################################
-# Override the Database Engine to Use In-Memory SQLite with StaticPool for Testing
-###############################################################################
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-# Create an in-memory SQLite engine that uses a StaticPool.
-# This ensures that all connections share the same underlying in-memory database.
-test_engine = create_engine(
-    "sqlite:///:memory:",
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
-
-###############################################################################
-# Patch the Database Module to Use the Test Engine and Session
-###############################################################################
-
-import app.database as db_mod
-db_mod.engine = test_engine
-db_mod.SessionLocal = TestingSessionLocal
-
-###############################################################################
-# Patch the "created_at" Column Default in the Transaction Model for SQLite
-###############################################################################
-
-from app.models import Transaction
-from sqlalchemy.schema import ColumnDefault
-
-# Remove the server_default (which may return the literal string "CURRENT_TIMESTAMP")
-# and set a Python-side default wrapped in a ColumnDefault.
-if "created_at" in Transaction.__table__.columns:
-    Transaction.__table__.columns["created_at"].server_default = None
-    Transaction.__table__.columns["created_at"].default = ColumnDefault(datetime.utcnow)
-
 ###############################################################################
 # Import Application Modules and Create the Test Client
 ###############################################################################
 
 from app.main import app
-from app.database import Base
 from app import crud, schemas
+from app.pricefeed import PriceQuote, get_price_feed
 from fastapi.testclient import TestClient
 
 # Create a TestClient instance for the FastAPI application.
 client = TestClient(app)
 
-###############################################################################
-# Fixtures
-###############################################################################
-
-@pytest.fixture(scope="module")
-def test_db():
-    """
-    Fixture: Set up and tear down the test database.
-    Uses an in-memory SQLite database (with StaticPool) so that all sessions share the same data.
-    Creates all tables before tests and drops them after tests.
-    """
-    Base.metadata.create_all(bind=test_engine)
-    db = TestingSessionLocal()
-    yield db
-    db.close()
-    Base.metadata.drop_all(bind=test_engine)
-
-@pytest.fixture(autouse=True)
-def clear_db(test_db):
-    """
-    Fixture: Clear the database between tests.
-    This fixture drops and re-creates all tables after each test to ensure test isolation.
-    """
-    yield
-    Base.metadata.drop_all(bind=test_engine)
-    Base.metadata.create_all(bind=test_engine)
-
 ###############################################################################
 # Helper Function for Decimal Rounding
 ###############################################################################
@@ -185,6 +116,8 @@ def test_get_summary(test_db):
     )
     crud.create_transaction(test_db, tx1)
     crud.create_transaction(test_db, tx2)
+    # /summary reads the price kept by the background price feed; seed it instead of calling Binance.
+    get_price_feed().set_quote(PriceQuote(Decimal("3000"), time.time()))
 
     # Call the GET /summary endpoint.
     response = client.get("/summary")
@@ -200,6 +133,7 @@ def test_get_summary(test_db):
     assert actual_fee_usdt == quantize_decimal(expected_fee_usdt), "Total fee (USDT) does not match"
     # Ensure the current ETH price is a positive value.
     assert Decimal(data["current_eth_price"]) > Decimal("0"), "Current ETH price should be greater than 0"
+    assert data["price_age_seconds"] is not None and data["price_age_seconds"] < 60, "Price age should be reported"
 
 def test_historical_endpoint(test_db):
     """
@@ -238,10 +172,10 @@ def test_get_swap_price(monkeypatch, test_db):
     )
     crud.create_transaction(test_db, test_tx)
 
-    # Monkey-patch the decode_swap_price function in app.tasks to return a dummy value.
-    def dummy_decode_swap_price(tx_hash: str) -> Decimal:
-        return Decimal("0.00123")
-    monkeypatch.setattr("app.tasks.decode_swap_price", dummy_decode_swap_price)
+    # Monkey-patch the decode_swap_prices function in app.tasks to return a dummy value.
+    def dummy_decode_swap_prices(tx_hashes):
+        return {tx_hash: Decimal("0.00123") for tx_hash in tx_hashes}
+    monkeypatch.setattr("app.tasks.decode_swap_prices", dummy_decode_swap_prices)
 
     # Call the GET /transactions/swapprice/{tx_hash} endpoint.
     response = client.get("/transactions/swapprice/0xsomethingsimulated")
@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+from app import tasks, transform
+from tests.factories import T0, random_etherscan_rows
+
+
+def rowwise(transactions, eth_price, price_at=None):
+    return [tasks.build_transaction_row(txn, eth_price, price_at) for txn in tasks.select_transactions(transactions)]
+
+
+def test_columnar_rows_match_row_by_row_conversion():
+    transactions = random_etherscan_rows(500)
+    prices = {T0 + 12 * i: Decimal("3000") + i for i in range(0, 200, 3)}
+
+    for price_at in (None, prices.get):
+        rows = tasks.build_transaction_rows(transactions, Decimal("2500.5"), price_at=price_at)
+        assert rows == rowwise(transactions, Decimal("2500.5"), price_at)
+    assert len(rows) == 250
+
+
+def test_fee_is_exact_beyond_64_bits():
+    row = random_etherscan_rows(1)[0]
+    row.update(gasUsed="30000000", gasPrice=str(10 ** 15))
+
+    columns = transform.to_columns([row])
+    assert columns.fee_wei == [3 * 10 ** 22]
+    (tuple_row,) = transform.to_row_tuples(columns, Decimal("3000.01"))
+    assert dict(zip(transform.FIELDS, tuple_row))["fee_eth"] == Decimal("30000")
+    assert tuple_row[transform.FIELDS.index("fee_usdt")] == Decimal("90000300")
+
+
+def test_malformed_rows_fall_back_to_row_by_row():
+    transactions = random_etherscan_rows(6)
+    transactions[2]["gasUsed"] = "not a number"
+
+    rows = tasks.build_transaction_rows(transactions, Decimal("3000"))
+    assert [row["tx_hash"] for row in rows] == [transactions[0]["hash"], transactions[4]["hash"]]
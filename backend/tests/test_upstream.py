@@ -0,0 +1,89 @@
+import pytest
+
+from app import upstream
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """
+    Stand-in for requests.Session that replays a scripted list of responses.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(dict(params or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(upstream.time, "sleep", lambda seconds: None)
+    return upstream.UpstreamClient(max_retries=2, backoff_base=0.01)
+
+
+def etherscan_page(rows):
+    return FakeResponse(data={"status": "1", "message": "OK", "result": rows})
+
+
+def test_get_json_retries_transient_errors(client):
+    client.session = FakeSession([FakeResponse(503), FakeResponse(429), FakeResponse(data={"price": "1"})])
+    assert client.get_json("binance", "http://binance") == {"price": "1"}
+    metrics = client.metrics()
+    assert metrics["binance.requests"] == 3
+    assert metrics["binance.retries"] == 2
+
+
+def test_get_json_gives_up_after_max_retries(client):
+    client.session = FakeSession([FakeResponse(500)] * 3)
+    with pytest.raises(upstream.UpstreamError):
+        client.get_json("binance", "http://binance")
+    assert client.metrics()["binance.failures"] == 1
+
+
+def test_get_json_does_not_retry_client_errors(client):
+    client.session = FakeSession([FakeResponse(404)])
+    with pytest.raises(upstream.UpstreamError):
+        client.get_json("binance", "http://binance")
+    assert client.metrics()["binance.requests"] == 1
+
+
+def test_etherscan_retries_rate_limit_message(client):
+    client.session = FakeSession([
+        FakeResponse(data={"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}),
+        etherscan_page([{"hash": "0x1"}]),
+    ])
+    assert client.etherscan({"action": "tokentx"}) == [{"hash": "0x1"}]
+
+
+def test_paginate_etherscan_stops_on_short_page(client):
+    client.session = FakeSession([
+        etherscan_page([{"hash": "0x1"}, {"hash": "0x2"}]),
+        FakeResponse(502),
+        etherscan_page([{"hash": "0x3"}]),
+    ])
+    pages = list(client.paginate_etherscan({"action": "tokentx"}, offset=2))
+    assert pages == [[{"hash": "0x1"}, {"hash": "0x2"}], [{"hash": "0x3"}]]
+    assert [call["page"] for call in client.session.calls] == [1, 2, 2]
+
+
+def test_paginate_etherscan_treats_no_transactions_as_end(client):
+    client.session = FakeSession([FakeResponse(data={"status": "0", "message": "No transactions found", "result": []})])
+    assert list(client.paginate_etherscan({"action": "tokentx"})) == []
+
+
+def test_backoff_is_bounded(client):
+    for attempt in range(10):
+        assert 0 <= client.backoff(attempt) <= client.backoff_max
+    assert client.backoff(0, retry_after=3) == 3